@@ -1,5 +1,9 @@
+import numpy as np
 import pyvisa
+from pyvisa import constants
 from functools import wraps
+import io_trace
+from io_trace import tracer
 
 
 class GPIB_Handler:
@@ -18,9 +22,10 @@ class GPIB_Handler:
         try:
             _instrument = self.rm.open_resource(adress)
             self.devices[alias] = _instrument
-            print(f"Device '{alias}' added at adress '{adress}'.")
+            if tracer.level >= io_trace.IO:
+                tracer.record(io_trace.IO, "open", alias, adress)
         except pyvisa.VisaIOError as e:
-            print(f"Failed to add device '{alias}' at adress '{adress}':{e}")
+            tracer.record(io_trace.ERROR, "open", alias, adress, e)
 
     def remove_device(self, alias: str):
         """
@@ -30,28 +35,73 @@ class GPIB_Handler:
         if alias in self.devices:
             self.devices[alias].close()
             del self.devices[alias]
-            print(f"Device '{alias}' removed.")
+            if tracer.level >= io_trace.IO:
+                tracer.record(io_trace.IO, "close", alias)
         else:
-            print(f"Device '{alias}' not found.")
+            tracer.record(io_trace.ERROR, "close", alias, None,
+                          "device not found")
 
     def clear(self, alias: str):
         """
         ステータスクリア処理
         pyvisaのclear()が適用可能かどうかで処理を分ける
         """
+        if alias not in self.devices:
+            tracer.record(io_trace.ERROR, "clear", alias, None,
+                          "device not found")
+            return
         if alias == "LI5650":
             self.write(alias, "*CLS")  #LI5650のステータスクリアコマンド
         else:
-            self.devices[alias].clear()  #pyvisa搭載のクリアコマンド
+            try:
+                self.devices[alias].clear()  #pyvisa搭載のクリアコマンド
+            except pyvisa.VisaIOError as e:
+                tracer.record(io_trace.ERROR, "clear", alias, None, e)
 
     def busy_check(self, alias: str):
         """
-        機器のビジーチェックを行う
+        機器のビジーチェックを行い、ステータスをクリアする
         """
-        _stb = self.devices[alias].read_stb()
+        _stb = self.read_stb(alias)
         self.clear(alias)
         return _stb
 
+    def enable_srq(self, alias: str) -> bool:
+        """
+        サービスリクエスト(SRQ)イベントの受信を有効にする
+        alias:対象デバイスのエイリアス名
+        戻り値:有効にできた場合はTrue、インターフェースが対応していない場合はFalse
+        """
+        if alias not in self.devices:
+            return False
+        try:
+            self.devices[alias].enable_event(
+                constants.EventType.service_request,
+                constants.EventMechanism.queue)
+            return True
+        except (pyvisa.VisaIOError, NotImplementedError, AttributeError) as e:
+            tracer.record(io_trace.ERROR, "enable_srq", alias, None, e)
+            return False
+
+    def wait_for_srq(self, alias: str, timeout_ms: int) -> bool:
+        """
+        サービスリクエスト(SRQ)イベントを待機する
+        alias:対象デバイスのエイリアス名
+        timeout_ms:最大待機時間(ms)
+        戻り値:SRQを受信した場合はTrue、タイムアウトした場合はFalse
+        """
+        if alias not in self.devices:
+            return False
+        try:
+            _response = self.devices[alias].wait_on_event(
+                constants.EventType.service_request,
+                int(timeout_ms),
+                capture_timeout=True)
+            return not _response.timed_out
+        except pyvisa.VisaIOError as e:
+            tracer.record(io_trace.ERROR, "wait_srq", alias, None, e)
+            return False
+
     def _alias_check(func):
         """
         デバイスエイリアスが有効かをチェックし、エラーハンドリングを行うデコレータ
@@ -60,16 +110,29 @@ class GPIB_Handler:
         @wraps(func)
         def wrapper(self, alias: str, *args, **kwargs):
             if alias not in self.devices:
-                print(f"Device '{alias}' not found.")
+                tracer.record(io_trace.ERROR, func.__name__, alias,
+                              args[0] if args else None, "device not found")
                 return None
             try:
-                return func(self, alias, *args, *kwargs)
+                return func(self, alias, *args, **kwargs)
             except pyvisa.VisaIOError as e:
-                print(f"Error interacting with device '{alias}':{e}")
+                tracer.record(io_trace.ERROR, func.__name__, alias,
+                              args[0] if args else None, e)
                 return None
 
         return wrapper
 
+    @_alias_check
+    def read_stb(self, alias: str):
+        """
+        ステータスバイトを読み取る (クリアはしない)
+        alias:対象デバイスのエイリアス名
+        """
+        _stb = self.devices[alias].read_stb()
+        if tracer.level >= io_trace.VERBOSE:
+            tracer.record(io_trace.VERBOSE, "read_stb", alias, None, _stb)
+        return _stb
+
     @_alias_check
     def write(self, alias: str, command: str):
         """
@@ -78,7 +141,8 @@ class GPIB_Handler:
         command:送信するコマンド文字列
         """
         self.devices[alias].write(command)
-        print(f"Command '{command}' sent to device '{alias}'.")
+        if tracer.level >= io_trace.IO:
+            tracer.record(io_trace.IO, "write", alias, command)
 
     @_alias_check
     def read(self, alias: str):
@@ -87,7 +151,8 @@ class GPIB_Handler:
         alias:対象デバイスのエイリア名
         """
         _response = self.devices[alias].read()
-        print(f"Response from device '{alias}':{_response}")
+        if tracer.level >= io_trace.IO:
+            tracer.record(io_trace.IO, "read", alias, None, _response)
         return _response
 
     @_alias_check
@@ -97,12 +162,10 @@ class GPIB_Handler:
         alias:対象デバイスのエイリアス名
         command:送信するコマンド文字列
         """
-        _response = self.devices[alias].query(command)
-        print(
-            f"Query '{command}' to device '{alias}' received response:{_response}"
-        )
-
-        return _response.strip()
+        _response = self.devices[alias].query(command).strip()
+        if tracer.level >= io_trace.IO:
+            tracer.record(io_trace.IO, "query", alias, command, _response)
+        return _response
 
     @_alias_check
     def query_bytes(self, alias: str, command: str, bytes: int):
@@ -115,12 +178,33 @@ class GPIB_Handler:
         self.devices[alias].write(command)
         _response = self.devices[alias].read_bytes(bytes)
         self.clear(alias)
-        _response.decode('utf-8')
-        _response.strip()
-        print(
-            f"Query '{command}' to device '{alias}' received response:{float(_response)}"
-        )
-        return float(_response)
+        _value = float(_response)
+        if tracer.level >= io_trace.IO:
+            tracer.record(io_trace.IO, "query_bytes", alias, command, _value)
+        return _value
+
+    @_alias_check
+    def query_binary_values(self,
+                            alias: str,
+                            command: str,
+                            datatype: str = 'd',
+                            is_big_endian: bool = False):
+        """
+        デバイスにコマンドを送信し、バイナリブロックの応答をNumPy配列として受信
+        alias:対象デバイスのエイリアス名
+        command:送信するコマンド文字列
+        datatype:要素のデータ型(structモジュールの書式 例:'d'=float64, 'f'=float32)
+        is_big_endian:ビッグエンディアンで送られてくる場合はTrue
+        """
+        _response = self.devices[alias].query_binary_values(
+            command,
+            datatype=datatype,
+            is_big_endian=is_big_endian,
+            container=np.array)
+        if tracer.level >= io_trace.IO:
+            tracer.record(io_trace.IO, "query_binary_values", alias, command,
+                          len(_response))
+        return _response
 
     def list_devices(self):
         """
@@ -139,7 +223,6 @@ class GPIB_Handler:
         """
         for alias in list(self.devices.keys()):
             self.remove_device(alias)
-        print("All devices closed.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+import queue
+import threading
+
+from phase_timer import PhaseTimer
+
+
+class DiskWriterWorker:
+    """
+    測定データのファイル書き込みを別スレッドで行うクラス。
+    測定スレッドは「新しい行が増えた」という通知をキューに積むだけで、
+    実際の書き込みはワーカースレッドがData_Containerの順序どおりに行う。
+    """
+
+    _STOP = object()
+
+    def __init__(self,
+                 save_manager,
+                 data_container,
+                 maxsize: int = 64,
+                 phase_timer: PhaseTimer = None):
+        """
+        Args:
+            save_manager (SaveManager): 書き込みセッションを開いたSaveManager
+            data_container (Data_Container): 測定データを保持するコンテナ
+            maxsize (int): 通知キューの上限 (書き込みが追いつかない場合は測定側が待つ)
+            phase_timer (PhaseTimer): 書き込み時間を記録するPhaseTimer
+        """
+        self.save_manager = save_manager
+        self.data_container = data_container
+        self.phase_timer = phase_timer or PhaseTimer(enabled=False)
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run,
+                                        name="DiskWriterWorker",
+                                        daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self):
+        """新しい行が追加されたことを通知する。"""
+        self._queue.put(None)
+
+    def close(self):
+        """キューに残った通知をすべて処理してからスレッドを終了する。"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            #溜まっている通知はまとめて1回の追記で処理する
+            stop = item is self._STOP
+            while not stop:
+                try:
+                    stop = self._queue.get_nowait() is self._STOP
+                except queue.Empty:
+                    break
+            with self.phase_timer.span("save"):
+                self.save_manager.append_data_to_file(self.data_container)
+            if stop:
+                return
+
+
+class PlotRefresher:
+    """
+    グラフの更新をTkのメインループ上で一定間隔ごとに行うクラス。
+    測定スレッドからは更新要求を出すだけで、複数の要求は最新の1回にまとめられる。
+    """
+
+    def __init__(self, widget, plot_manager, interval_ms: int = 100):
+        """
+        Args:
+            widget: afterを呼び出すためのウィジェット (メインスレッドで生成されたもの)
+            plot_manager (PlotManager): 描画を行うPlotManager
+            interval_ms (int): 更新要求を確認する間隔 (ms)
+        """
+        self.widget = widget
+        self.plot_manager = plot_manager
+        self.interval_ms = interval_ms
+        #描画時間を記録するPhaseTimer (測定ごとに差し替える)
+        self.phase_timer = PhaseTimer(enabled=False)
+        self._lock = threading.Lock()
+        self._source = None
+        #掃引の平均を表示する場合のSweepAverager (Noneなら測定データをそのまま表示)
+        self._average = None
+        self._reset_pending = False
+        self._update_pending = False
+        self.widget.after(self.interval_ms, self._refresh)
+
+    def set_source(self, data_container, x_key: str, y_key: str, x_min,
+                   x_max):
+        """
+        描画するデータと軸範囲を設定し、次回の更新でグラフをクリアする。
+        どのスレッドからでも呼び出せる。
+        """
+        with self._lock:
+            self._source = (data_container, x_key, y_key, x_min, x_max)
+            self._average = None
+            self._reset_pending = True
+            self._update_pending = False
+
+    def set_average(self, averager):
+        """
+        測定データの代わりに、掃引の平均と標準誤差の帯を表示する。
+        set_sourceの後に呼び出す。どのスレッドからでも呼び出せる。
+
+        Args:
+            averager (SweepAverager): 平均を計算しているSweepAverager
+        """
+        with self._lock:
+            self._average = averager
+            self._update_pending = True
+
+    def request_update(self):
+        """グラフの更新を要求する。どのスレッドからでも呼び出せる。"""
+        self._update_pending = True
+
+    def _refresh(self):
+        """一定間隔で呼ばれ、要求があればグラフを更新する (メインスレッド専用)。"""
+        try:
+            self.sync()
+        except Exception as e:
+            print(f"グラフの更新中にエラーが発生しました: {e}")
+        finally:
+            self.widget.after(self.interval_ms, self._refresh)
+
+    def sync(self):
+        """保留中のクリア・更新要求をただちに反映する。"""
+        with self._lock:
+            source = self._source
+            average = self._average
+            reset = self._reset_pending
+            update = self._update_pending
+            self._reset_pending = False
+            self._update_pending = False
+        if source is None:
+            return
+        data_container, x_key, y_key, x_min, x_max = source
+        if reset:
+            self.plot_manager.reset_plot(x_min, x_max)
+        if update:
+            with self.phase_timer.span("plot"):
+                if average is not None:
+                    x, mean, stderr = average.plot_data()
+                    self.plot_manager.plot_average(x, mean, stderr, x_min,
+                                                   x_max)
+                    return
+                x, y = data_container.get_plot_data(x_key, y_key)
+                self.plot_manager.plot_data(x, y, x_min, x_max)
+
+
+class AcquisitionPipeline:
+    """
+    測定スレッド(機器操作)と、グラフ描画・ファイル保存の各ステージをつなぐクラス。
+    測定スレッドは1点測定するごとにpublishを呼ぶだけで、描画と保存は
+    それぞれメインループとワーカースレッドで行われるため、
+    その間に分光器は次の波長へ移動できる。
+    """
+
+    def __init__(self,
+                 save_manager,
+                 data_container,
+                 plot_refresher: PlotRefresher = None,
+                 maxsize: int = 64,
+                 phase_timer: PhaseTimer = None):
+        self.plot_refresher = plot_refresher
+        self.disk_writer = DiskWriterWorker(save_manager,
+                                            data_container,
+                                            maxsize=maxsize,
+                                            phase_timer=phase_timer)
+
+    def start(self):
+        self.disk_writer.start()
+
+    def publish(self):
+        """新しいデータポイントが追加されたことを各ステージに通知する。"""
+        if self.plot_refresher is not None:
+            self.plot_refresher.request_update()
+        self.disk_writer.submit()
+
+    def close(self):
+        """残りのデータをすべて書き込み、グラフの最終更新を要求する。"""
+        self.disk_writer.close()
+        if self.plot_refresher is not None:
+            self.plot_refresher.request_update()
@@ -0,0 +1,178 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from scan_plan import ScanPlan
+
+
+class AdaptiveSampler:
+    """
+    ScanPlanのグリッドから、測定する点を測定値を見ながら選ぶクラス。
+    まず各区間を測定間隔のfactor倍の粗い刻みで測定し、隣り合う粗い点の間で
+    信号が大きく変わった(しきい値を横切った)区間や、曲率が大きい点の両側の区間だけを
+    元の測定間隔(最小刻み)で埋める。選ぶ点はすべてグリッド上の点なので、
+    結果は波長順に並べればそのまま1本のスペクトルになる。
+
+    使い方:
+        sampler = AdaptiveSampler(plan, factor=8)
+        index = sampler.next_index()
+        while index is not None:
+            value, sigma = (plan.wavelengths[index]を測定)
+            sampler.add(index, value, sigma)
+            index = sampler.next_index()
+    """
+
+    #標準誤差が分からない場合に、雑音の大きさを見積もるのに必要な粗い点の数
+    MIN_NOISE_POINTS = 5
+
+    def __init__(self,
+                 plan: ScanPlan,
+                 factor: int,
+                 tolerance: Optional[float] = None,
+                 noise_k: float = 4.0,
+                 relative_tolerance: float = 0.02):
+        """
+        Args:
+            plan (ScanPlan): 最小刻みのグリッド
+            factor (int): 粗い刻みが最小刻みの何倍か (1なら全点を測定する)
+            tolerance (float): 変化とみなす信号の差。Noneなら測定値から自動で決める
+            noise_k (float): 自動の場合、測定値の標準誤差の何倍を変化とみなすか
+            relative_tolerance (float): 自動の場合、これまでの信号の幅に対する
+                しきい値の下限 (雑音の見積もりが小さすぎても細かくしすぎないため)
+        """
+        self.plan = plan
+        self.factor = max(1, int(factor))
+        self.tolerance = tolerance
+        self.noise_k = noise_k
+        self.relative_tolerance = relative_tolerance
+        # 粗い刻みで測定するグリッド上の番号 (各区間の先頭から刻み、区間の最後の点も含める)
+        coarse = []
+        for segment in plan.segments:
+            last = segment.first + segment.count - 1
+            coarse.extend(range(segment.first, last + 1, self.factor))
+            coarse.append(last)
+        self.coarse_indices: List[int] = sorted(set(coarse))
+        self._coarse_set = set(self.coarse_indices)
+        self._next_coarse = 0
+        # 細かく埋める予定のグリッド上の番号 (昇順)
+        self._pending: List[int] = []
+        # 測定済みの値と標準誤差
+        self._values: Dict[int, float] = {}
+        self._sigmas: List[float] = []
+        # 測定済みの粗い点の番号と、変化を調べ終えた粗い点の数
+        self._coarse_done: List[int] = []
+        self._checked = 0
+
+    def __len__(self) -> int:
+        """測定済みの点数。"""
+        return len(self._values)
+
+    def next_index(self) -> Optional[int]:
+        """次に測定するグリッド上の番号を返す。すべて終わった場合はNone。"""
+        while self._pending:
+            index = self._pending.pop(0)
+            if index not in self._values:
+                return index
+        while self._next_coarse < len(self.coarse_indices):
+            index = self.coarse_indices[self._next_coarse]
+            self._next_coarse += 1
+            if index not in self._values:
+                return index
+        return None
+
+    def add(self, index: int, value: float, sigma: float = 0.0):
+        """
+        測定結果を登録する。粗い点であれば直前の区間に変化がないかを調べ、
+        変化があればその区間の間の点を細かく埋める予定に加える。
+
+        Args:
+            index (int): グリッド上の番号
+            value (float): 測定値
+            sigma (float): 測定値の標準誤差 (分からなければ0)
+        """
+        self._values[index] = float(value)
+        if sigma > 0:
+            self._sigmas.append(float(sigma))
+        if index not in self._coarse_set:
+            return
+        self._coarse_done.append(index)
+        tolerance = self.current_tolerance()
+        if tolerance is None:
+            # 雑音の大きさが分かるまでは判定を保留し、分かった時点でまとめて調べる
+            return
+        while self._checked < len(self._coarse_done) - 1:
+            self._checked += 1
+            self._check(self._checked, tolerance)
+
+    def _check(self, k: int, tolerance: float):
+        """
+        k-1番目とk番目の粗い点の間に変化がないか、k-1番目の点の曲率が
+        大きくないかを調べ、変化があれば両側の区間を細かく埋める予定に加える。
+        """
+        done = self._coarse_done
+        x = self.plan.wavelengths
+        b, c = done[k - 1], done[k]
+        # 隣り合う粗い点の差がしきい値を超えたら、その間を細かく測定する
+        if abs(self._values[c] - self._values[b]) > tolerance:
+            self._refine(b, c)
+        if k < 2:
+            return
+        a = done[k - 2]
+        # 中央の点での傾きの変化(曲率)を、粗い刻み1つ分の信号の変化に換算して比べる
+        slope_ab = (self._values[b] - self._values[a]) / (x[b] - x[a])
+        slope_bc = (self._values[c] - self._values[b]) / (x[c] - x[b])
+        step = min(x[b] - x[a], x[c] - x[b])
+        if abs(slope_bc - slope_ab) * step > tolerance:
+            self._refine(a, b)
+            self._refine(b, c)
+
+    def current_tolerance(self) -> Optional[float]:
+        """
+        現在のしきい値を返す。自動の場合、雑音の大きさがまだ分からなければNone。
+        標準誤差が報告されていればその中央値を、なければ粗い点の差の
+        ばらつき(中央絶対偏差)から見積もった雑音を使う。
+        """
+        if self.tolerance is not None:
+            return self.tolerance
+        values = np.array([self._values[i] for i in self._coarse_done])
+        if self._sigmas:
+            noise = float(np.median(self._sigmas))
+        elif len(values) >= self.MIN_NOISE_POINTS:
+            diffs = np.diff(values)
+            mad = np.median(np.abs(diffs - np.median(diffs)))
+            #差の標準偏差 (1.4826 * MAD) を1点あたりの雑音に換算する
+            noise = float(1.4826 * mad / np.sqrt(2))
+        else:
+            return None
+        span = float(values.max() - values.min()) if len(values) else 0.0
+        return max(self.noise_k * noise, self.relative_tolerance * span)
+
+    def _refine(self, start: int, end: int):
+        """グリッド上の番号start, endの間の未測定の点を、細かく埋める予定に加える。"""
+        indices = [
+            i for i in range(start + 1, end)
+            if i not in self._values and i not in self._pending
+        ]
+        if indices:
+            self._pending = sorted(self._pending + indices)
+
+    def merged(self) -> Tuple[np.ndarray, np.ndarray]:
+        """測定済みの点を波長順に並べた (グリッド上の番号, 測定値) を返す。"""
+        indices = np.array(sorted(self._values), dtype=int)
+        return indices, np.array([self._values[i] for i in indices])
+
+
+def premove_for(previous: Optional[float], target: float, backlash: float):
+    """
+    短波長側から到着させるために寄せる波長を返す。寄せが不要な場合はNone。
+
+    Args:
+        previous (float): 現在の分光器の波長 (不明ならNone)
+        target (float): 次の測定波長
+        backlash (float): 寄せる量(nm)。0以下なら寄せない
+    """
+    if backlash <= 0:
+        return None
+    if previous is not None and previous <= target:
+        return None
+    return target - backlash
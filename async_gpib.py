@@ -0,0 +1,97 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+
+class AsyncGPIBHandler:
+    """
+    GPIB_Handler(またはシミュレータ)をasyncioから使うためのクラス。
+    機器(エイリアス)ごとに専用のスレッド1本のセッションを持ち、
+    同じ機器への操作は順番に、別の機器への操作は並行して実行される。
+    LI5650(GPIB)とDMM6500(USB)のように別のバスにある機器の読み取りを
+    重ねることで、1点あたりの待ち時間を足し算ではなく最大値にできる。
+    """
+
+    def __init__(self, gpib_handler):
+        """
+        Args:
+            gpib_handler: GPIB_Handler(またはシミュレータ)のインスタンス
+        """
+        self.gpib = gpib_handler
+        self._sessions: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+        #同期コードから使うためのイベントループ (必要になったときに起動する)
+        self._loop = None
+        self._loop_thread = None
+
+    def _session(self, alias: str) -> ThreadPoolExecutor:
+        """エイリアスに対応するセッション(スレッド1本のExecutor)を返す。"""
+        with self._lock:
+            session = self._sessions.get(alias)
+            if session is None:
+                session = ThreadPoolExecutor(max_workers=1,
+                                             thread_name_prefix=f"GPIB-{alias}")
+                self._sessions[alias] = session
+            return session
+
+    async def run(self, alias: str, func, *args, **kwargs):
+        """
+        任意の処理を機器aliasのセッション上で実行する。
+        LockinAmpHandler.measureのように複数のコマンドからなる処理を
+        他の機器の処理と並行させたい場合に使う。
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._session(alias), functools.partial(func, *args, **kwargs))
+
+    async def write(self, alias: str, command: str):
+        """コマンドを送信する。"""
+        return await self.run(alias, self.gpib.write, alias, command)
+
+    async def query(self, alias: str, command: str):
+        """クエリを送信し、応答を返す。"""
+        return await self.run(alias, self.gpib.query, alias, command)
+
+    async def query_binary_values(self, alias: str, command: str, **kwargs):
+        """バイナリブロックのクエリを送信し、数値の配列を返す。"""
+        return await self.run(alias, self.gpib.query_binary_values, alias,
+                              command, **kwargs)
+
+    async def gather(self, *awaitables, return_exceptions: bool = False):
+        """複数の機器への操作を並行して実行し、結果を順番どおりに返す。"""
+        return await asyncio.gather(*awaitables,
+                                    return_exceptions=return_exceptions)
+
+    def run_sync(self, coroutine):
+        """
+        コルーチンを専用のイベントループで実行し、完了まで待って結果を返す。
+        測定スレッドなど、イベントループの外から呼び出すためのもの。
+        """
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="AsyncGPIBLoop",
+                    daemon=True)
+                self._loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def gather_sync(self, *coroutines, return_exceptions: bool = False):
+        """gatherを同期的に実行する。"""
+        return self.run_sync(
+            self.gather(*coroutines, return_exceptions=return_exceptions))
+
+    def close(self):
+        """イベントループとすべてのセッションを終了する。"""
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop_thread.join()
+                self._loop.close()
+                self._loop = None
+            for session in self._sessions.values():
+                session.shutdown(wait=True)
+            self._sessions = {}
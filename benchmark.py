@@ -0,0 +1,411 @@
+"""
+測定ループのベンチマーク。
+
+シミュレータ(gpib_simulator)を接続したControllerを、非表示のTkウィンドウ上で
+ヘッドレスに動かし、各測定モードを決まった点数で実行する。
+1点ごとの経過時間からシミュレータが計上した機器の時間 (通信・波長送り・
+待機時間・DMM6500の積分待ち) を差し引いた残りを「自前のオーバーヘッド」
+(Python, Tk, matplotlib, ディスク) として集計し、JSONファイルに書き出す。
+
+各条件は別プロセスで実行するため、ピークRSSとI/Oバイト数は条件ごとの値になる。
+
+使い方:
+    python benchmark.py
+    python benchmark.py --modes raman ef_raman --points 100 1000 --output result.json
+    python benchmark.py --latency-scale 1.0 --timeout 600
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+#ベンチマーク名と測定モード名の対応
+MODES = {
+    "raman": "ラマン",
+    "ef_raman": "電場変調ラマン",
+    "modulation": "変調信号探索",
+}
+DEFAULT_POINTS = (100, 1000, 10000, 100000)
+#点数がちょうどになるように、2進数で割り切れる刻みを使う
+WAVELENGTH_START = 400.0
+WAVELENGTH_STEP = 1 / 64
+
+
+class OverheadRecorder:
+    """
+    測定点が追加された時刻と、その時点までに機器側で費やした時間を記録するクラス。
+    Data_Containerと各ハンドラの待機メソッドをインスタンス単位でラップする。
+    """
+
+    def __init__(self, engine, simulator, nominal_wait: float = 0.0):
+        """
+        Args:
+            engine (MeasurementEngine): 計測対象の測定エンジン
+            simulator (Simulated_GPIB_Handler): 接続したシミュレータ
+            nominal_wait (float): ラップできない待機(time.sleep)の1点あたりの時間(s)
+        """
+        self.simulator = simulator
+        self.nominal_wait = nominal_wait
+        self._wait_time = 0.0
+        self.start_time = None
+        self.timestamps = []
+        self.instrument_times = []
+        self.counts = []
+
+        self._wrap_wait(engine, "interruptible_sleep")
+        self._wrap_wait(engine.ct25_handler, "wait_for_move")
+        self._wrap_wait(engine.dmm_handler, "read_window")
+        container = engine.data_container
+        self._wrap_add(container, "add_point", lambda args, kwargs: 1)
+        self._wrap_add(
+            container, "add_columns",
+            lambda args, kwargs: len(next(iter(kwargs.values()), ())))
+
+    def instrument_time(self) -> float:
+        """これまでに機器側で費やした時間(s)の合計。"""
+        return self._wait_time + self.simulator.io_time
+
+    def _wrap_wait(self, target, name: str):
+        """待機メソッドの所要時間を、その間の通信時間を除いて計上する。"""
+        original = getattr(target, name)
+
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            io_before = self.simulator.io_time
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self._wait_time += (time.perf_counter() - started) - (
+                    self.simulator.io_time - io_before)
+
+        setattr(target, name, wrapper)
+
+    def _wrap_add(self, target, name: str, count):
+        """データ追加メソッドが呼ばれた時刻と機器時間を記録する。"""
+        original = getattr(target, name)
+
+        def wrapper(*args, **kwargs):
+            result = original(*args, **kwargs)
+            n = count(args, kwargs)
+            self._wait_time += self.nominal_wait * n
+            self.timestamps.append(time.perf_counter())
+            self.instrument_times.append(self.instrument_time())
+            self.counts.append(n)
+            return result
+
+        setattr(target, name, wrapper)
+
+    def per_point_overhead(self) -> np.ndarray:
+        """1点あたりのオーバーヘッド(s)の配列を返す。"""
+        if not self.timestamps:
+            return np.array([])
+        timestamps = np.array([self.start_time] + self.timestamps)
+        instrument = np.array([0.0] + self.instrument_times)
+        counts = np.array(self.counts, dtype=float)
+        overhead = (np.diff(timestamps) - np.diff(instrument)) / np.maximum(
+            counts, 1)
+        return np.repeat(overhead, self.counts)
+
+
+def peak_rss_bytes():
+    """このプロセスのピークRSS(バイト)を返す。取得できない場合はNone。"""
+    try:
+        import psutil
+        memory = psutil.Process().memory_info()
+        peak = getattr(memory, "peak_wset", None)
+        if peak is not None:
+            return peak
+    except ImportError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #LinuxはKB単位、macOSはバイト単位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def process_io_bytes():
+    """このプロセスの読み書きバイト数 (read, write) を返す。取得できない場合はNone。"""
+    try:
+        import psutil
+        counters = psutil.Process().io_counters()
+        return counters.read_bytes, counters.write_bytes
+    except (ImportError, AttributeError):
+        pass
+    try:
+        with open("/proc/self/io") as f:
+            values = dict(line.split(":") for line in f if ":" in line)
+        return int(values["rchar"]), int(values["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def directory_size(path: str) -> int:
+    """ディレクトリ内のファイルサイズの合計(バイト)を返す。"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(dirpath, filename))
+    return total
+
+
+def configure_settings(setting_parms, mode: str, points: int, args):
+    """指定した点数になるように測定条件を設定する。"""
+    setting_parms.measurement_name = f"benchmark_{mode}_{points}"
+    setting_parms.measurement_notes = "benchmark.py"
+    setting_parms.measurement = MODES[mode]
+    setting_parms.time_constant = str(args.settle_ms)
+    setting_parms.time_constant_multiplier = "1"
+    wavelength_end = WAVELENGTH_START + (points - 1) * WAVELENGTH_STEP
+    setting_parms.measurement_wavelength = [
+        str(WAVELENGTH_START),
+        str(wavelength_end), "", "", ""
+    ]
+    setting_parms.measurement_section = [str(WAVELENGTH_STEP), "", "", ""]
+    setting_parms.total_duration = str(points * args.modulation_interval)
+    setting_parms.measurement_interval = str(args.modulation_interval)
+
+
+def summarize(values: np.ndarray) -> dict:
+    """オーバーヘッドの統計 (ms) を返す。"""
+    if len(values) == 0:
+        return {}
+    values_ms = values * 1e3
+    return {
+        "mean": float(values_ms.mean()),
+        "p50": float(np.percentile(values_ms, 50)),
+        "p90": float(np.percentile(values_ms, 90)),
+        "p99": float(np.percentile(values_ms, 99)),
+        "max": float(values_ms.max()),
+    }
+
+
+def run_single(mode: str, points: int, args) -> dict:
+    """1条件のベンチマークをこのプロセスで実行し、結果を返す。"""
+    import customtkinter as ctk
+    from gpib_simulator import Simulated_GPIB_Handler
+    from main_controller import Controller
+    from model import MsrState
+
+    output_dir = tempfile.mkdtemp(prefix="ea_benchmark_")
+    root = ctk.CTk()
+    root.withdraw()
+    simulator = Simulated_GPIB_Handler(
+        latency_scale=args.latency_scale,
+        dmm_integration_time=args.dmm_integration_time,
+        seed=0)
+    controller = Controller(root, gpib_handler=simulator)
+    #機器の接続はバックグラウンドで行われるため、完了を待つ
+    if not controller.wait_until_ready(timeout=60):
+        raise RuntimeError("シミュレータへの接続が完了しませんでした")
+    controller.save_manager.base_directory = output_dir
+    configure_settings(controller.model.setting_parms, mode, points, args)
+
+    #データメモリへの取り込みを使わない変調信号探索では、測定間隔の待機を機器時間とみなす
+    nominal_wait = 0.0
+    if (mode == "modulation" and args.modulation_interval >=
+            controller.engine.capture_interval_threshold):
+        nominal_wait = args.modulation_interval
+    recorder = OverheadRecorder(controller.engine, simulator, nominal_wait)
+    #起動時の通信時間は含めない
+    simulator.io_time = 0.0
+
+    io_before = process_io_bytes()
+    controller.state_handler.update_state(MsrState.measure)
+    thread = threading.Thread(target=controller.start_measurement_thread,
+                              daemon=True)
+    truncated = False
+    recorder.start_time = time.perf_counter()
+    thread.start()
+    deadline = recorder.start_time + args.timeout
+    while thread.is_alive():
+        root.update()
+        if (not truncated and time.perf_counter() > deadline
+                and controller.state_handler.msrstate == MsrState.measure):
+            controller.state_handler.update_state(MsrState.cancel)
+            truncated = True
+        time.sleep(0.005)
+    wall_time = time.perf_counter() - recorder.start_time
+    io_after = process_io_bytes()
+    root.update()
+
+    measured = len(controller.model.data_container)
+    overhead = recorder.per_point_overhead()
+    instrument_time = recorder.instrument_time()
+    result = {
+        "mode": mode,
+        "points_requested": points,
+        "points": measured,
+        "truncated": truncated,
+        "wall_time_s": wall_time,
+        "instrument_time_s": instrument_time,
+        "overhead_time_s": wall_time - instrument_time,
+        "points_per_second": measured / wall_time if wall_time > 0 else None,
+        "overhead_per_point_ms": summarize(overhead),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "io_read_bytes": None,
+        "io_write_bytes": None,
+        "output_bytes": directory_size(output_dir),
+    }
+    if io_before is not None and io_after is not None:
+        result["io_read_bytes"] = io_after[0] - io_before[0]
+        result["io_write_bytes"] = io_after[1] - io_before[1]
+    if not args.keep_output:
+        import shutil
+        shutil.rmtree(output_dir, ignore_errors=True)
+    else:
+        result["output_dir"] = output_dir
+    root.destroy()
+    return result
+
+
+def run_subprocess(mode: str, points: int, args) -> dict:
+    """1条件のベンチマークを別プロセスで実行し、結果を返す。"""
+    fd, result_file = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    command = [
+        sys.executable,
+        os.path.abspath(__file__), "--single", mode,
+        str(points), "--result-file", result_file, "--latency-scale",
+        str(args.latency_scale), "--dmm-integration-time",
+        str(args.dmm_integration_time), "--settle-ms",
+        str(args.settle_ms), "--modulation-interval",
+        str(args.modulation_interval), "--timeout",
+        str(args.timeout)
+    ]
+    if args.keep_output:
+        command.append("--keep-output")
+    try:
+        completed = subprocess.run(command,
+                                   cwd=os.path.dirname(
+                                       os.path.abspath(__file__)),
+                                   stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE,
+                                   text=True)
+        if completed.returncode != 0:
+            return {
+                "mode": mode,
+                "points_requested": points,
+                "error": completed.stderr.strip().splitlines()[-1:]
+            }
+        with open(result_file, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(result_file)
+
+
+def git_revision():
+    """現在のコミットのハッシュを返す。取得できない場合はNone。"""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True,
+                              text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(result: dict):
+    if "error" in result:
+        print(f"{result['mode']:>10} {result['points_requested']:>7}  "
+              f"エラー: {result['error']}")
+        return
+    overhead = result["overhead_per_point_ms"]
+    print(f"{result['mode']:>10} {result['points']:>7} "
+          f"{result['points_per_second']:>10.1f} pt/s  "
+          f"overhead p50={overhead.get('p50', float('nan')):.3f} ms "
+          f"p99={overhead.get('p99', float('nan')):.3f} ms  "
+          f"RSS={(result['peak_rss_bytes'] or 0) / 2**20:.1f} MiB"
+          f"{'  (打ち切り)' if result['truncated'] else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="測定ループのベンチマーク")
+    parser.add_argument("--modes",
+                        nargs="+",
+                        choices=list(MODES),
+                        default=list(MODES),
+                        help="実行する測定モード")
+    parser.add_argument("--points",
+                        nargs="+",
+                        type=int,
+                        default=list(DEFAULT_POINTS),
+                        help="測定点数")
+    parser.add_argument("--latency-scale",
+                        type=float,
+                        default=0.0,
+                        help="シミュレータの通信・波長送り時間の倍率 (0で待機なし)")
+    parser.add_argument("--dmm-integration-time",
+                        type=float,
+                        default=1e-3,
+                        help="シミュレータのDMM6500の積分時間(s)")
+    parser.add_argument("--settle-ms",
+                        type=float,
+                        default=1.0,
+                        help="ラマン測定の時定数(ms) (待機時間 = 時定数 × 1)")
+    parser.add_argument("--modulation-interval",
+                        type=float,
+                        default=1e-3,
+                        help="変調信号探索の測定間隔(s)")
+    parser.add_argument("--timeout",
+                        type=float,
+                        default=3600.0,
+                        help="1条件あたりの上限時間(s)。超えたら測定を中止して集計する")
+    parser.add_argument("--output",
+                        default=None,
+                        help="結果を書き出すJSONファイル")
+    parser.add_argument("--keep-output",
+                        action="store_true",
+                        help="測定データの出力ディレクトリを残す")
+    parser.add_argument("--single", nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        mode, points = args.single[0], int(args.single[1])
+        result = run_single(mode, points, args)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    results = []
+    for mode in args.modes:
+        for points in args.points:
+            result = run_subprocess(mode, points, args)
+            print_result(result)
+            results.append(result)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "settings": {
+            "latency_scale": args.latency_scale,
+            "dmm_integration_time": args.dmm_integration_time,
+            "settle_ms": args.settle_ms,
+            "modulation_interval": args.modulation_interval,
+            "timeout": args.timeout,
+        },
+        "results": results,
+    }
+    output = args.output or datetime.now().strftime(
+        "benchmark_%Y%m%d_%H%M%S.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"結果を保存しました: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+測定データを列ごとのバイナリファイルとして保存する形式 (output.txtと並べて保存する)。
+
+測定フォルダ内に次のようなフォルダを作り、MeasurementPointの列ごとに
+NumPy標準の.npyファイルを1つずつ書き込む。
+
+    output_columns/
+        attrs.json       測定設定(settings.json)と列名・行数などの属性
+        wavelength.npy
+        dmm_value.npy
+        ...
+
+各.npyファイルは一定の大きさのヘッダーの後ろにfloat64の値を追記していき、
+追記のたびにヘッダーの行数だけを書き換える。値を書き込んでからヘッダーを
+更新するため、途中で異常終了しても最後に更新した行数までは常に読み込める。
+読み込みはnp.load(path, mmap_mode="r")でメモリマップでき、load_columnsを使うと
+列をまとめてメモリマップしたまま必要な範囲だけを取り出せる。
+"""
+import json
+import os
+import struct
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+#列ファイルをまとめるフォルダ名の接尾辞 (output.txt -> output_columns)
+COLUMN_STORE_SUFFIX = "_columns"
+#属性(測定設定など)を保存するファイル名
+ATTRS_FILENAME = "attrs.json"
+#.npyファイルのヘッダーの大きさ (行数が増えても書き換えられるよう固定長にする)
+NPY_HEADER_SIZE = 128
+#列のデータ型
+COLUMN_DTYPE = np.dtype("<f8")
+
+
+def column_store_path(text_file_path: str) -> str:
+    """テキストファイルのパスから、対応する列ファイルのフォルダのパスを返す。"""
+    return os.path.splitext(text_file_path)[0] + COLUMN_STORE_SUFFIX
+
+
+def _npy_header(rows: int) -> bytes:
+    """行数rowsの1次元float64配列を表す、固定長の.npyヘッダー(バージョン1.0)を返す。"""
+    header = ("{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" %
+              (COLUMN_DTYPE.str, rows))
+    #マジック文字列(6) + バージョン(2) + ヘッダー長(2) の後ろに、改行で終わるヘッダーを置く
+    header_length = NPY_HEADER_SIZE - 10
+    header = header.ljust(header_length - 1) + "\n"
+    return (b"\x93NUMPY\x01\x00" + struct.pack("<H", header_length) +
+            header.encode("latin1"))
+
+
+class ColumnStoreWriter:
+    """
+    Data_Containerの行を、列ごとの.npyファイルへ追記していく書き込みセッション。
+    DataStreamWriterと同じく、列は最初の書き込み時に決め(NaNでない値を持つ列)、
+    以降は未書き込みの行だけを追記する。
+    """
+
+    def __init__(self, directory: str, attrs: Optional[dict] = None):
+        """
+        Args:
+            directory (str): 列ファイルを書き込むフォルダ (既存の列ファイルは作り直す)
+            attrs (dict): attrs.jsonに保存する属性 (測定設定など)
+        """
+        self.directory = directory
+        self.attrs = dict(attrs or {})
+        self.headers: List[str] = []
+        self.rows_written = 0
+        self._files = {}
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".npy"):
+                os.remove(os.path.join(directory, name))
+        self._write_attrs()
+
+    def write_rows(self, data_container):
+        """
+        data_containerのうち、まだ書き込んでいない末尾の行を各列の末尾に追記する。
+        """
+        size = len(data_container)
+        if size <= self.rows_written:
+            return
+
+        if not self.headers:
+            self.headers = data_container.present_fields()
+            for header in self.headers:
+                f = open(os.path.join(self.directory, f"{header}.npy"), "w+b")
+                f.write(_npy_header(0))
+                self._files[header] = f
+            self._write_attrs()
+
+        #値をすべて書き込んでから、ヘッダーの行数を更新する
+        for header, f in self._files.items():
+            chunk = data_container.column(header)[self.rows_written:size]
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(chunk, dtype=COLUMN_DTYPE).tobytes())
+            f.flush()
+        for f in self._files.values():
+            f.seek(0)
+            f.write(_npy_header(size))
+            f.flush()
+        self.rows_written = size
+
+    def _write_attrs(self):
+        """属性・列名・データ型をattrs.jsonに書き込む。"""
+        attrs = dict(self.attrs)
+        attrs["columns"] = list(self.headers)
+        attrs["dtype"] = COLUMN_DTYPE.str
+        path = os.path.join(self.directory, ATTRS_FILENAME)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(attrs, f, ensure_ascii=False, indent=4)
+        os.replace(path + ".tmp", path)
+
+    def close(self):
+        """列ファイルを閉じる。"""
+        for f in self._files.values():
+            if not f.closed:
+                f.close()
+
+
+class ColumnStore:
+    """
+    load_columnsで開いた列ファイルのまとまり。
+    store["wavelength"]で列をメモリマップした配列として取り出せる。
+    """
+
+    def __init__(self, directory: str, attrs: dict,
+                 columns: Dict[str, np.ndarray]):
+        self.directory = directory
+        self.attrs = attrs
+        self.columns = columns
+
+    @property
+    def settings(self) -> dict:
+        """保存時の測定設定 (settings.jsonと同じ内容)。"""
+        return self.attrs.get("settings", {})
+
+    def __len__(self) -> int:
+        if not self.columns:
+            return 0
+        return min(len(column) for column in self.columns.values())
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        #途中で異常終了した場合に列ごとの行数がずれていても、そろえて返す
+        return self.columns[name][:len(self)]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def keys(self) -> List[str]:
+        return list(self.columns)
+
+
+def load_columns(directory: str, mmap_mode: Optional[str] = "r") -> ColumnStore:
+    """
+    列ファイルのフォルダを開く。
+
+    Args:
+        directory (str): 列ファイルのフォルダ (output_columns) または測定フォルダ
+        mmap_mode (str): np.loadのmmap_mode。Noneならすべてメモリに読み込む
+
+    Raises:
+        FileNotFoundError: attrs.jsonがない場合
+    """
+    if not os.path.exists(os.path.join(directory, ATTRS_FILENAME)):
+        #測定フォルダが渡された場合は、その中のoutput_columnsを開く
+        candidate = os.path.join(directory, "output" + COLUMN_STORE_SUFFIX)
+        if os.path.exists(os.path.join(candidate, ATTRS_FILENAME)):
+            directory = candidate
+    with open(os.path.join(directory, ATTRS_FILENAME), "r",
+              encoding="utf-8") as f:
+        attrs = json.load(f)
+    columns = {
+        name: np.load(os.path.join(directory, f"{name}.npy"),
+                      mmap_mode=mmap_mode)
+        for name in attrs.get("columns", [])
+    }
+    return ColumnStore(directory, attrs, columns)
+
+
+def settings_attrs(settings_data) -> dict:
+    """Setting_Parmsなどのdataclassを、列ファイルの属性にする辞書に変換する。"""
+    if settings_data is None:
+        return {}
+    return {"settings": asdict(settings_data)}
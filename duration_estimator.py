@@ -0,0 +1,383 @@
+"""
+過去の測定で記録した処理時間(phase_timing.json)から、ラマン測定・電場変調ラマン測定の
+所要時間を見積もるモジュール。
+
+保存先フォルダ(outputdata/)にある最近の測定を読み込み、1点あたりの時間を
+次のフェーズに分けて学習する。
+
+    移動    start_move + scan      = 移動1回の固定時間 + 距離(nm) × 1 nmあたりの時間
+                                     (開始位置の分からない最初の移動は平均)
+    待機    settle                 = 待機時間の設定値 × 倍率 + 固定時間 (待機方法ごと)
+    読み取り read                   = 測定の種類ごとの平均
+    その他  store, publish, logなど = 平均
+    測定全体 (計測していない時間)    = 固定時間 + 点数 × 1点あたりの時間
+
+測定前には学習した値から所要時間と95%の信頼区間を見積もり、測定中はETATrackerが
+実際にかかった時間で見積もりを補正しながら残り時間を更新する。
+学習できる測定がない場合は、既定値(DEFAULT_*)で見積もる。
+"""
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+
+from scan_plan import DEFAULT_MOVE_OVERHEAD, DEFAULT_SCAN_SPEED
+
+#学習に使う最近の測定の数
+HISTORY_RUNS = 20
+#信頼区間の幅 (標準正規分布の97.5%点, 95%信頼区間)
+CONFIDENCE_Z = 1.96
+#学習できる測定がない場合の既定値
+DEFAULT_INITIAL_MOVE = 1.0  #開始位置の分からない最初の移動(s)
+DEFAULT_SETTLE_OFFSET = 0.05  #待機時間の設定値に加わる時間(s)
+DEFAULT_READ = 0.1  #読み取り(s)
+DEFAULT_OTHER = 0.01  #格納・描画・ログ(s)
+DEFAULT_FIXED = 1.0  #測定全体の準備・後処理(s)
+DEFAULT_RELATIVE_SD = 0.3  #測定ごとのばらつき (見積もりに対する比)
+#学習した測定が少ない場合でも、測定ごとのばらつきをこれより小さく見積もらない
+MIN_RELATIVE_SD = 0.05
+
+#移動に含めるフェーズ
+MOVE_PHASES = ("start_move", "scan")
+#見積もりの対象とする測定の種類
+ESTIMATED_MEASUREMENTS = ("ラマン", "電場変調ラマン")
+
+
+def wait_seconds_from(settings: dict) -> float:
+    """設定の時定数と倍率から、各点の待機時間(s)を計算する。"""
+    return (float(settings.get("time_constant") or 0) * 10E-4 *
+            float(settings.get("time_constant_multiplier") or 0))
+
+
+@dataclass
+class TimingRun:
+    """学習に使う過去の測定1回分の記録。"""
+    directory: str  #測定フォルダ
+    measurement: str  #測定の種類
+    settle_mode: str  #待機方法
+    wait_seconds: float  #各点の待機時間の設定値(s)
+    wall_time: float  #測定ループ全体の時間(s)
+    distances: np.ndarray  #各点の移動距離(nm) (不明ならNaN)
+    phases: dict  #フェーズ名をキーとした各点の所要時間(s) (記録がなければNaN)
+
+    def __len__(self) -> int:
+        return len(self.distances)
+
+    def phase(self, *names: str) -> np.ndarray:
+        """各点のフェーズnamesの合計時間(s)を返す (記録のないフェーズは0とする)。"""
+        total = np.zeros(len(self))
+        for name in names:
+            if name in self.phases:
+                total += np.nan_to_num(self.phases[name])
+        return total
+
+    def other_phases(self) -> List[str]:
+        """移動・待機・読み取り以外のフェーズ名を返す。"""
+        return [
+            name for name in self.phases
+            if name not in MOVE_PHASES and name not in ("settle", "read")
+        ]
+
+
+def load_timing_run(directory: str) -> Optional[TimingRun]:
+    """
+    測定フォルダのphase_timing.jsonとsettings.jsonを読み込む。
+    見積もりの対象でない測定や、読み込めない場合はNoneを返す。
+    """
+    try:
+        with open(os.path.join(directory, "settings.json"), "r",
+                  encoding="utf-8") as f:
+            settings = json.load(f)
+        if settings.get("measurement") not in ESTIMATED_MEASUREMENTS:
+            return None
+        with open(os.path.join(directory, "phase_timing.json"), "r",
+                  encoding="utf-8") as f:
+            timing = json.load(f)
+        points = timing["points"]
+        if not points["index"]:
+            return None
+        distances = np.array(
+            [np.nan if d is None else d for d in points["move_distance"]],
+            dtype=float)
+        phases = {
+            name: np.array([np.nan if v is None else v / 1e3 for v in values],
+                           dtype=float)
+            for name, values in points["phases_ms"].items()
+        }
+        return TimingRun(directory=directory,
+                         measurement=settings["measurement"],
+                         settle_mode=settings.get("settle_mode") or "fixed",
+                         wait_seconds=wait_seconds_from(settings),
+                         wall_time=float(timing["wall_time_s"]),
+                         distances=distances,
+                         phases=phases)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def load_history(base_directory: str,
+                 limit: int = HISTORY_RUNS) -> List[TimingRun]:
+    """保存先フォルダから、最近の測定(最大limit回)の記録を古い順に読み込む。"""
+    try:
+        names = sorted(os.listdir(base_directory))
+    except OSError:
+        return []
+    runs = []
+    for name in reversed(names):
+        run = load_timing_run(os.path.join(base_directory, name))
+        if run is not None:
+            runs.append(run)
+            if len(runs) >= limit:
+                break
+    runs.reverse()
+    return runs
+
+
+@dataclass
+class DurationEstimate:
+    """所要時間の見積もりと95%の信頼区間(s)。"""
+    seconds: float
+    low: float
+    high: float
+    runs: int  #学習に使った測定の数 (0なら既定値による見積もり)
+
+    def describe(self) -> str:
+        """ログ用の1行の説明を返す。"""
+        source = (f"過去{self.runs}回の測定から学習" if self.runs else "既定値")
+        return (f"{format_duration(self.seconds)} "
+                f"(95%: {format_duration(self.low)} ～ "
+                f"{format_duration(self.high)}, {source})")
+
+    def end_times(self, start: datetime = None) -> tuple:
+        """(予想終了時刻, 早い場合, 遅い場合) を返す。"""
+        start = start or datetime.now()
+        return tuple(start + timedelta(seconds=seconds)
+                     for seconds in (self.seconds, self.low, self.high))
+
+
+def format_duration(seconds: float) -> str:
+    """秒数を「1時間 02分」「3分 20秒」のような表記にする。"""
+    seconds = int(round(max(seconds, 0)))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}時間 {minutes:02d}分"
+    if minutes:
+        return f"{minutes}分 {seconds:02d}秒"
+    return f"{seconds}秒"
+
+
+@dataclass
+class PhaseCosts:
+    """学習した各フェーズの時間(s)。"""
+    move_overhead: float = DEFAULT_MOVE_OVERHEAD  #移動1回の固定時間
+    move_per_nm: float = 1 / DEFAULT_SCAN_SPEED  #移動1 nmあたりの時間
+    initial_move: float = DEFAULT_INITIAL_MOVE  #開始位置の分からない最初の移動
+    settle_ratio: float = 1.0  #待機時間の設定値に対する倍率
+    settle_offset: float = DEFAULT_SETTLE_OFFSET  #待機に加わる固定時間
+    read: float = DEFAULT_READ  #読み取り
+    other: float = DEFAULT_OTHER  #格納・描画・ログ
+    fixed: float = DEFAULT_FIXED  #測定全体の計測していない時間
+    per_point: float = 0.0  #1点ごとの計測していない時間
+    point_sd: float = 0.0  #1点の時間のばらつき (標準偏差)
+    relative_sd: float = DEFAULT_RELATIVE_SD  #測定ごとのばらつき (見積もりに対する比)
+    runs: int = 0  #学習に使った測定の数
+
+    @classmethod
+    def fit(cls, runs: List[TimingRun], measurement: str,
+            settle_mode: str) -> "PhaseCosts":
+        """
+        過去の測定の記録から各フェーズの時間を学習する。
+        読み取りは同じ測定の種類、待機は同じ待機方法の測定だけから学習する。
+        """
+        costs = cls()
+        if not runs:
+            return costs
+        costs.runs = len(runs)
+
+        #移動: 距離の分かる点で、時間 = 固定時間 + 距離 × 1 nmあたりの時間
+        distances = np.concatenate([run.distances for run in runs])
+        moves = np.concatenate([run.phase(*MOVE_PHASES) for run in runs])
+        known = ~np.isnan(distances)
+        if known.sum() >= 3 and np.ptp(distances[known]) > 0:
+            slope, intercept = np.polyfit(distances[known], moves[known], 1)
+            costs.move_per_nm = max(float(slope), 0.0)
+            costs.move_overhead = max(float(intercept), 0.0)
+        elif known.any():
+            costs.move_overhead = max(
+                float(np.mean(moves[known] -
+                              costs.move_per_nm * distances[known])), 0.0)
+        if (~known).any():
+            costs.initial_move = float(np.mean(moves[~known]))
+
+        #待機: 固定時間の待機は設定値どおり、adaptiveは設定値に対する倍率を学習する
+        settle_runs = [run for run in runs if run.settle_mode == settle_mode]
+        if settle_runs:
+            waits = np.concatenate(
+                [np.full(len(run), run.wait_seconds) for run in settle_runs])
+            settles = np.concatenate(
+                [run.phase("settle") for run in settle_runs])
+            if settle_mode == "adaptive":
+                costs.settle_offset = 0.0
+                valid = waits > 0
+                if valid.any():
+                    costs.settle_ratio = float(
+                        np.mean(settles[valid] / waits[valid]))
+            else:
+                costs.settle_offset = float(np.mean(settles - waits))
+
+        #読み取り: 同じ測定の種類の平均 (なければすべての測定の平均)
+        read_runs = ([run for run in runs if run.measurement == measurement]
+                     or runs)
+        costs.read = float(
+            np.mean(np.concatenate([run.phase("read") for run in read_runs])))
+        costs.other = float(
+            np.mean(
+                np.concatenate(
+                    [run.phase(*run.other_phases()) for run in runs])))
+
+        #計測していない時間: 点数の異なる測定があれば、点数に比例する分と固定分に分ける
+        counts = np.array([len(run) for run in runs], dtype=float)
+        untracked = np.array([
+            run.wall_time - sum(np.nansum(values)
+                                for values in run.phases.values())
+            for run in runs
+        ])
+        if len(runs) >= 2 and np.ptp(counts) > 0:
+            slope, intercept = np.polyfit(counts, untracked, 1)
+            costs.per_point = max(float(slope), 0.0)
+            costs.fixed = max(float(intercept), 0.0)
+        else:
+            costs.per_point = 0.0
+            costs.fixed = max(float(np.mean(untracked)), 0.0)
+
+        #ばらつき: 1点ごとの残差と、測定全体での見積もりとの比
+        residuals = []
+        ratios = []
+        for run in runs:
+            predicted = costs.point_costs(run.distances, run.wait_seconds)
+            if run.settle_mode != settle_mode:
+                #待機方法の異なる測定は、実際の待機時間で置き換えて比べる
+                predicted += run.phase("settle") - (
+                    costs.settle_ratio * run.wait_seconds +
+                    costs.settle_offset)
+            actual = sum(run.phase(name) for name in run.phases)
+            residuals.append(actual - predicted)
+            total = costs.fixed + float(predicted.sum())
+            if total > 0:
+                ratios.append(run.wall_time / total)
+        residuals = np.concatenate(residuals)
+        costs.point_sd = float(np.std(residuals)) if len(residuals) else 0.0
+        if len(ratios) >= 2:
+            costs.relative_sd = max(float(np.std(ratios, ddof=1)),
+                                    MIN_RELATIVE_SD)
+        return costs
+
+    def point_costs(self, distances: np.ndarray,
+                    wait_seconds: float) -> np.ndarray:
+        """
+        各点の見積もり時間(s)の配列を返す。
+
+        Args:
+            distances (np.ndarray): 各点の前の点からの移動距離(nm)。
+                開始位置が分からない点はNaN
+            wait_seconds (float): 各点の待機時間の設定値(s)
+        """
+        distances = np.asarray(distances, dtype=float)
+        per_point = (self.settle_ratio * wait_seconds + self.settle_offset +
+                     self.read + self.other + self.per_point)
+        moves = np.where(distances > 0,
+                         self.move_overhead + self.move_per_nm * distances,
+                         0.0)
+        moves[np.isnan(distances)] = self.initial_move
+        return moves + per_point
+
+    def estimate(self, distances: np.ndarray,
+                 wait_seconds: float) -> DurationEstimate:
+        """測定全体の所要時間と95%の信頼区間を見積もる。"""
+        costs = self.point_costs(distances, wait_seconds)
+        seconds = self.fixed + float(costs.sum())
+        sd = np.sqrt(len(costs) * self.point_sd**2 +
+                     (self.relative_sd * seconds)**2)
+        return DurationEstimate(seconds=seconds,
+                                low=max(seconds - CONFIDENCE_Z * sd, 0.0),
+                                high=seconds + CONFIDENCE_Z * sd,
+                                runs=self.runs)
+
+
+class ETATracker:
+    """
+    測定中の残り時間を、各点の見積もり時間と実際にかかった時間から更新するクラス。
+    見積もりと実際の比を、測定した点が少ないうちは1に近づけて(PRIOR_POINTS点分の
+    見積もりどおりの点があるものとして)求め、残りの点の見積もりに掛ける。
+    """
+
+    #補正の強さを抑えるための、見積もりどおりとみなす仮の点数
+    PRIOR_POINTS = 5
+    #残り時間をログに出力する間隔 (全体の点数に対する割合)
+    LOG_FRACTION = 0.1
+
+    def __init__(self, point_costs: np.ndarray):
+        """
+        Args:
+            point_costs (np.ndarray): これから測定する各点の見積もり時間(s)
+        """
+        self.point_costs = np.asarray(point_costs, dtype=float)
+        self.done = 0
+        self._actual = 0.0
+        self._predicted = 0.0
+        self._last = time.perf_counter()
+        self._next_log = self.LOG_FRACTION
+
+    def __len__(self) -> int:
+        return len(self.point_costs)
+
+    def start(self):
+        """最初の点の測定を始めるときに呼び出す。"""
+        self._last = time.perf_counter()
+
+    def point_done(self):
+        """1点の測定が終わるたびに呼び出す。"""
+        now = time.perf_counter()
+        self._actual += now - self._last
+        self._last = now
+        if self.done < len(self.point_costs):
+            self._predicted += self.point_costs[self.done]
+        self.done += 1
+
+    def factor(self) -> float:
+        """実際にかかった時間と見積もりの比 (測定した点が少ないうちは1に近い)。"""
+        if not len(self.point_costs):
+            return 1.0
+        prior = self.PRIOR_POINTS * float(self.point_costs.mean())
+        if prior + self._predicted <= 0:
+            return 1.0
+        return (self._actual + prior) / (self._predicted + prior)
+
+    def remaining(self) -> float:
+        """残りの点の測定にかかる時間(s)の見積もりを返す。"""
+        return self.factor() * float(self.point_costs[self.done:].sum())
+
+    def end_time(self) -> datetime:
+        """予想終了時刻を返す。"""
+        return datetime.now() + timedelta(seconds=self.remaining())
+
+    def progress_message(self) -> Optional[str]:
+        """
+        前回のログから全体のLOG_FRACTION以上進んだ場合に、進捗と残り時間の
+        ログメッセージを返す。それ以外はNone。
+        """
+        if not len(self.point_costs):
+            return None
+        progress = self.done / len(self.point_costs)
+        if progress < self._next_log or self.done >= len(self.point_costs):
+            return None
+        while self._next_log <= progress:
+            self._next_log += self.LOG_FRACTION
+        return (f"進捗 {progress:.0%} ({self.done}/{len(self.point_costs)}点), "
+                f"残り {format_duration(self.remaining())}, "
+                f"予想終了時刻: {self.end_time().strftime('%H:%M:%S')}")
@@ -0,0 +1,453 @@
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import io_trace
+from io_trace import tracer
+
+
+@dataclass
+class LatencyModel:
+    """
+    1回の通信にかかる時間の分布 (正規分布を0で打ち切ったもの)。
+    """
+    mean: float  #平均(s)
+    jitter: float = 0.0  #標準偏差(s)
+
+    def sample(self) -> float:
+        if self.jitter <= 0:
+            return max(0.0, self.mean)
+        return max(0.0, random.gauss(self.mean, self.jitter))
+
+
+#機器ごと・操作ごとの既定の通信時間
+DEFAULT_LATENCIES: Dict[str, Dict[str, LatencyModel]] = {
+    "CT-25": {
+        "write": LatencyModel(0.008, 0.002),
+        "query": LatencyModel(0.015, 0.004),
+        "busy_check": LatencyModel(0.004, 0.001),
+        "clear": LatencyModel(0.003, 0.001),
+    },
+    "DM6500": {
+        "write": LatencyModel(0.002, 0.0005),
+        "query": LatencyModel(0.004, 0.001),
+        "binary": LatencyModel(0.006, 0.002),
+        "clear": LatencyModel(0.002, 0.0005),
+    },
+    "LI5650": {
+        "write": LatencyModel(0.006, 0.002),
+        "query": LatencyModel(0.012, 0.003),
+        "binary": LatencyModel(0.015, 0.004),
+        "clear": LatencyModel(0.004, 0.001),
+    },
+}
+
+
+@dataclass
+class RamanSpectrum:
+    """
+    ローレンツ型のピークとベースラインからなるラマンスペクトル。
+    peaksは (中心波長nm, 半値全幅nm, 強度) のリスト。
+    """
+    peaks: List[Tuple[float, float, float]] = field(default_factory=list)
+    baseline: float = 0.02  #ベースライン強度
+    slope: float = 0.0  #ベースラインの傾き(/nm)
+    reference_wavelength: float = 600.0  #傾きの基準波長(nm)
+
+    @classmethod
+    def from_raman_shifts(cls,
+                          excitation_wavelength: float,
+                          shifts: List[Tuple[float, float, float]],
+                          resolution: float = 0.3,
+                          **kwargs) -> "RamanSpectrum":
+        """
+        励起波長とラマンシフトのピーク (シフトcm-1, 半値全幅cm-1, 強度) から
+        波長軸のスペクトルを作る。分光器の分解能(nm)より細いピークは分解能まで広げる。
+        """
+        excitation_wavenumber = 1e7 / excitation_wavelength
+        peaks = []
+        for shift, fwhm, amplitude in shifts:
+            center = 1e7 / (excitation_wavenumber - shift)
+            width = center**2 * fwhm * 1e-7
+            peaks.append((center, max(width, resolution), amplitude))
+        kwargs.setdefault("reference_wavelength", excitation_wavelength)
+        return cls(peaks=peaks, **kwargs)
+
+    def intensity(self, wavelength):
+        """波長(nmの数値または配列)におけるスペクトル強度を返す。"""
+        wavelength = np.asarray(wavelength, dtype=float)
+        value = self.baseline + self.slope * (wavelength -
+                                              self.reference_wavelength)
+        for center, fwhm, amplitude in self.peaks:
+            half = fwhm / 2.0
+            value = value + amplitude * half**2 / (
+                (wavelength - center)**2 + half**2)
+        return value
+
+
+def default_spectrum() -> RamanSpectrum:
+    """HeNe(632.8 nm)励起のSiを模したスペクトル。"""
+    return RamanSpectrum.from_raman_shifts(632.8, [
+        (520.7, 4.0, 1.0),  #Si TOフォノン
+        (302.0, 30.0, 0.04),  #2TA
+        (960.0, 60.0, 0.08),  #2TO
+    ],
+                                           baseline=0.02,
+                                           slope=1e-4)
+
+
+class Simulated_GPIB_Handler:
+    """
+    GPIB_Handlerと同じインターフェースを持つ機器シミュレータ。
+    実機なしで性能評価ができるように、次の点を模擬する。
+    - 機器・操作ごとの通信時間の分布 (latency_scaleで一括して伸縮できる)
+    - 移動距離に比例するCT-25の波長送り時間とビジー状態
+    - 時定数に従うロックインアンプ出力の一次遅れ応答
+    - 指令波長に対するラマンスペクトル (ローレンツ型ピーク + 積分時間に応じたノイズ)
+    - DMM6500のリーディングバッファとLI5650のデータメモリ
+    """
+
+    def __init__(self,
+                 latencies: Optional[Dict[str, Dict[str,
+                                                     LatencyModel]]] = None,
+                 latency_scale: float = 1.0,
+                 spectrum: Optional[RamanSpectrum] = None,
+                 scan_speed: float = 20.0,
+                 move_overhead: float = 0.05,
+                 initial_wavelength: float = 600.0,
+                 dmm_gain: float = 1.0,
+                 dmm_offset: float = 0.5,
+                 dmm_noise: float = 2e-3,
+                 dmm_integration_time: float = 0.02,
+                 lockin_gain: float = 1e-3,
+                 lockin_phase: float = 30.0,
+                 lockin_noise: float = 2e-5,
+                 srq_supported: bool = False,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            latencies: 機器ごと・操作ごとの通信時間 (DEFAULT_LATENCIESを上書き)
+            latency_scale (float): 通信時間と波長送り時間に掛ける倍率 (0なら待機しない)
+            spectrum (RamanSpectrum): 指令波長に対する信号
+            scan_speed (float): CT-25の波長送り速度(nm/s)
+            move_overhead (float): 波長送り1回ごとの加減速などの固定時間(s)
+            initial_wavelength (float): CT-25の初期波長(nm)
+            dmm_gain, dmm_offset (float): DMM6500の読み値 = offset + gain * スペクトル強度
+            dmm_noise (float): 積分時間1秒あたりのDMM6500のノイズ(V)
+            dmm_integration_time (float): DMM6500の1回の積分時間(s)
+            lockin_gain (float): ロックインアンプの出力 R = gain * スペクトル強度
+            lockin_phase (float): 変調信号の位相(deg)
+            lockin_noise (float): 時定数1秒あたりのロックインアンプのノイズ(V)
+            srq_supported (bool): CT-25が動作完了時にSRQを出すか
+            seed (int): 乱数のシード
+        """
+        self.devices = {}
+        self.latencies = {
+            alias: dict(models)
+            for alias, models in DEFAULT_LATENCIES.items()
+        }
+        for alias, models in (latencies or {}).items():
+            self.latencies.setdefault(alias, {}).update(models)
+        self.latency_scale = latency_scale
+        self.spectrum = spectrum or default_spectrum()
+        self.scan_speed = scan_speed
+        self.move_overhead = move_overhead
+        self.dmm_gain = dmm_gain
+        self.dmm_offset = dmm_offset
+        self.dmm_noise = dmm_noise
+        self.dmm_integration_time = dmm_integration_time
+        self.lockin_gain = lockin_gain
+        self.lockin_phase = lockin_phase
+        self.lockin_noise = lockin_noise
+        self.srq_supported = srq_supported
+        self._rng = np.random.default_rng(seed)
+        if seed is not None:
+            random.seed(seed)
+        self._lock = threading.RLock()
+
+        #CT-25の移動履歴 (開始時刻, 終了時刻, 開始波長, 目標波長)
+        self._moves: List[Tuple[float, float, float, float]] = [
+            (-math.inf, -math.inf, initial_wavelength, initial_wavelength)
+        ]
+        self._srq_enabled = set()
+        #ロックインアンプの時定数(s)と出力の一次遅れ状態 (時刻, 信号)
+        self.time_constant = 0.1
+        self._lockin_state = (time.perf_counter(), self._signal_at(time.perf_counter()))
+        #トリガーモデル・データメモリの開始時刻とレート
+        self._trigger_start: Dict[str, float] = {}
+        self._sample_rate: Dict[str, float] = {}
+        #通信と波長送りに費やした時間の累計(s)
+        self.io_time = 0.0
+        self.motion_time = 0.0
+        print("--- SIMULATED GPIB HANDLER INITIALIZED (DEBUG MODE) ---")
+
+    # ------------------------------------------------------------------
+    # 内部処理
+    # ------------------------------------------------------------------
+    def _latency(self, alias: str, operation: str):
+        """機器・操作に応じた通信時間だけ待機する。"""
+        model = self.latencies.get(alias, {}).get(operation)
+        if model is None or self.latency_scale <= 0:
+            return
+        delay = model.sample() * self.latency_scale
+        with self._lock:
+            self.io_time += delay
+        time.sleep(delay)
+
+    def _wavelength_at(self, t: float) -> float:
+        """時刻tにおけるCT-25の波長を返す (移動中は線形に補間)。"""
+        with self._lock:
+            for start, end, origin, target in reversed(self._moves):
+                if t >= start:
+                    if t >= end or end <= start:
+                        return target
+                    return origin + (target - origin) * (t - start) / (end -
+                                                                        start)
+            return self._moves[0][3]
+
+    def _wavelengths_at(self, times: np.ndarray) -> np.ndarray:
+        return np.array([self._wavelength_at(t) for t in times])
+
+    def _move_end(self) -> float:
+        with self._lock:
+            return self._moves[-1][1]
+
+    def _signal_at(self, t: float) -> float:
+        return float(self.spectrum.intensity(self._wavelength_at(t)))
+
+    def _advance_lockin(self, now: float) -> float:
+        """
+        ロックインアンプ出力の一次遅れ応答を時刻nowまで進め、その値を返す。
+        移動中の入力変化を追えるように、時定数の1/4ごとに区切って積分する。
+        """
+        with self._lock:
+            t, value = self._lockin_state
+            tau = max(self.time_constant, 1e-6)
+            if now > t:
+                steps = min(int((now - t) / (tau / 4)) + 1, 400)
+                dt = (now - t) / steps
+                decay = math.exp(-dt / tau)
+                for k in range(1, steps + 1):
+                    target = self._signal_at(t + k * dt)
+                    value = target + (value - target) * decay
+                self._lockin_state = (now, value)
+            return value
+
+    def _lockin_values(self, signal, count: int = None):
+        """信号強度からR, θ, X, Yを作る (時定数に応じたノイズを加える)。"""
+        sigma = self.lockin_noise / math.sqrt(max(self.time_constant, 1e-6))
+        size = count if count is not None else None
+        amplitude = self.lockin_gain * np.asarray(signal)
+        x_noise = self._rng.normal(0.0, sigma, size)
+        y_noise = self._rng.normal(0.0, sigma, size)
+        phase = math.radians(self.lockin_phase)
+        X = amplitude * math.cos(phase) + x_noise
+        Y = amplitude * math.sin(phase) + y_noise
+        R = np.hypot(X, Y)
+        theta = np.degrees(np.arctan2(Y, X))
+        return R, theta, X, Y
+
+    def _dmm_values(self, times: np.ndarray) -> np.ndarray:
+        """時刻列に対するDMM6500の読み値 (積分時間に応じたノイズを加える)。"""
+        sigma = self.dmm_noise / math.sqrt(max(self.dmm_integration_time,
+                                               1e-6))
+        signal = self.spectrum.intensity(self._wavelengths_at(times))
+        return self.dmm_offset + self.dmm_gain * signal + self._rng.normal(
+            0.0, sigma, len(times))
+
+    def _buffer_count(self, alias: str) -> int:
+        """トリガーモデル開始からバッファに溜まった読み値の数を返す。"""
+        if alias not in self._trigger_start:
+            return 0
+        elapsed = time.perf_counter() - self._trigger_start[alias]
+        rate = self._sample_rate.get(alias, 1.0 / self.dmm_integration_time)
+        return max(0, int(elapsed * rate))
+
+    # ------------------------------------------------------------------
+    # GPIB_Handlerと同じインターフェース
+    # ------------------------------------------------------------------
+    def add_device(self, alias: str, adress: str):
+        """デバイス追加をシミュレートします。"""
+        self.devices[alias] = {"address": adress}
+        if tracer.level >= io_trace.IO:
+            tracer.record(io_trace.IO, "open", alias, adress)
+
+    def remove_device(self, alias: str):
+        """デバイス削除をシミュレートします。"""
+        if alias in self.devices:
+            del self.devices[alias]
+            if tracer.level >= io_trace.IO:
+                tracer.record(io_trace.IO, "close", alias)
+        else:
+            tracer.record(io_trace.ERROR, "close", alias, None,
+                          "device not found")
+
+    def clear(self, alias: str):
+        """クリア処理をシミュレートします。"""
+        self._latency(alias, "clear")
+
+    def busy_check(self, alias: str):
+        """ビジーチェックとクリアをシミュレートします。"""
+        stb = self.read_stb(alias)
+        self.clear(alias)
+        return stb
+
+    def read_stb(self, alias: str):
+        """CT-25の移動中は0以外のステータスバイトを返します。"""
+        self._latency(alias, "busy_check")
+        stb = 0
+        if alias == "CT-25":
+            stb = 1 if time.perf_counter() < self._move_end() else 0
+        if tracer.level >= io_trace.VERBOSE:
+            tracer.record(io_trace.VERBOSE, "read_stb", alias, None, stb)
+        return stb
+
+    def enable_srq(self, alias: str) -> bool:
+        """CT-25がSRQを出す設定の場合のみTrueを返します。"""
+        if self.srq_supported and alias == "CT-25":
+            self._srq_enabled.add(alias)
+            return True
+        return False
+
+    def wait_for_srq(self, alias: str, timeout_ms: int) -> bool:
+        """CT-25の移動完了(SRQ)を最大timeout_msだけ待ちます。"""
+        if alias not in self._srq_enabled:
+            time.sleep(timeout_ms / 1000)
+            return False
+        remaining = self._move_end() - time.perf_counter()
+        if remaining > timeout_ms / 1000:
+            time.sleep(timeout_ms / 1000)
+            return False
+        if remaining > 0:
+            time.sleep(remaining)
+        return True
+
+    def write(self, alias: str, command: str):
+        """コマンド送信をシミュレートし、機器の状態を更新します。"""
+        self._latency(alias, "write")
+        now = time.perf_counter()
+        if alias == "CT-25" and command.startswith("SCN,"):
+            target = float(command.split(",")[2])
+            origin = self._wavelength_at(now)
+            duration = (self.move_overhead +
+                        abs(target - origin) / self.scan_speed
+                        ) * self.latency_scale
+            with self._lock:
+                self._moves.append((now, now + duration, origin, target))
+                del self._moves[:-64]
+                self.motion_time += duration
+        elif alias == "CT-25" and command.startswith("WST,"):
+            wavelength = float(command.split(",")[1])
+            with self._lock:
+                self._moves.append((now, now, wavelength, wavelength))
+        elif command.startswith("FILT:TCON"):
+            self._advance_lockin(now)
+            self.time_constant = float(command.split()[-1])
+        elif command == ":INIT":
+            self._trigger_start[alias] = now
+        elif command == ":ABOR":
+            self._trigger_start.pop(alias, None)
+        elif command.startswith(":SAMP:RATE"):
+            self._sample_rate[alias] = float(command.split()[-1])
+        if tracer.level >= io_trace.IO:
+            tracer.record(io_trace.IO, "write", alias, command)
+
+    def read(self, alias: str):
+        """データ読み取りをシミュレートします。"""
+        self._latency(alias, "query")
+        response = "SIM_DATA"
+        if tracer.level >= io_trace.IO:
+            tracer.record(io_trace.IO, "read", alias, None, response)
+        return response
+
+    def query(self, alias: str, command: str):
+        """
+        クエリをシミュレートし、実機と同じ形式の文字列を返します。
+        """
+        self._latency(alias, "query")
+        now = time.perf_counter()
+        if command == ":TRAC:POIN:ACT?" or command.startswith(
+                ":TRAC:ACT:END?"):
+            response = str(self._buffer_count(alias))
+        elif command.startswith(":TRAC:ACT:STAR?"):
+            response = "1" if self._buffer_count(alias) else "0"
+        elif command == ":SYST:ERR?":
+            response = '+0,"No error"'
+        elif alias == "LI5650" and command == ":FETCh?":
+            R, theta, X, Y = self._lockin_values(self._advance_lockin(now))
+            response = f"0,{R:.6e},{theta:.4f},{X:.6e},{Y:.6e}"
+        elif alias == "DM6500" and command == ":READ?":
+            #1回の積分時間だけかかる
+            if self.latency_scale > 0:
+                time.sleep(self.dmm_integration_time)
+            response = f"{self._dmm_values(np.array([now]))[0]:.8e}"
+        else:
+            response = f"SIM_QUERY_RESPONSE_FOR_{command}"
+        if tracer.level >= io_trace.IO:
+            tracer.record(io_trace.IO, "query", alias, command, response)
+        return response
+
+    def query_binary_values(self,
+                            alias: str,
+                            command: str,
+                            datatype: str = 'd',
+                            is_big_endian: bool = False):
+        """
+        バイナリブロックのクエリをシミュレートします。
+        - DMM6500 ':TRAC:DATA? 開始,終了,...' -> 読み値と相対時刻を交互に並べた配列
+        - LI5650 ':TRAC:DATA? 開始,点数' -> STATUS, R, θ, X, Yを並べた配列
+        """
+        self._latency(alias, "binary")
+        match = re.match(r":TRAC:DATA\?\s*(\d+)\s*,\s*(\d+)", command)
+        if not match or alias not in self._trigger_start:
+            return np.array([])
+        start_time = self._trigger_start[alias]
+        if alias == "LI5650":
+            start, count = int(match.group(1)), int(match.group(2))
+            rate = self._sample_rate.get(alias, 1.0)
+            times = start_time + (np.arange(start, start + count) - 1) / rate
+            signal = self.spectrum.intensity(self._wavelengths_at(times))
+            R, theta, X, Y = self._lockin_values(signal, count)
+            response = np.column_stack((np.zeros(count), R, theta, X, Y))
+        else:
+            start, end = int(match.group(1)), int(match.group(2))
+            indices = np.arange(start, end + 1)
+            relative_times = (indices - 1) * self.dmm_integration_time
+            readings = self._dmm_values(start_time + relative_times)
+            response = np.column_stack((readings, relative_times))
+        dtype = np.float32 if datatype == 'f' else np.float64
+        response = response.ravel().astype(dtype)
+        if tracer.level >= io_trace.IO:
+            tracer.record(io_trace.IO, "query_binary_values", alias, command,
+                          len(response))
+        return response
+
+    def query_bytes(self, alias: str, command: str, bytes: int):
+        """
+        バイト指定のクエリをシミュレートし、CT-25の現在の波長を返します。
+        """
+        self._latency(alias, "query")
+        response = self._wavelength_at(time.perf_counter())
+        if tracer.level >= io_trace.IO:
+            tracer.record(io_trace.IO, "query_bytes", alias, command, response)
+        return response
+
+    def list_devices(self):
+        """登録デバイスのリスト表示をシミュレートします。"""
+        if self.devices:
+            print("SIM: Registered devices:")
+            for alias, device_info in self.devices.items():
+                print(f" - {alias}:{device_info['address']}")
+        else:
+            print("SIM: No devices registered.")
+
+    def close_all(self):
+        """全デバイス切断をシミュレートします。"""
+        for alias in list(self.devices):
+            self.remove_device(alias)
@@ -0,0 +1,499 @@
+import time
+from typing import List
+
+import numpy as np
+
+import io_trace
+from io_trace import tracer
+from scan_plan import DEFAULT_MOVE_OVERHEAD, DEFAULT_SCAN_SPEED
+
+
+class LockinAmpHandler:
+    """ロックインアンプ(LI5650)の操作をカプセル化するクラス。"""
+
+    #データメモリへの高速取り込みに使うコマンド
+    CAPTURE_COMMANDS = {
+        "clear": ":TRAC:CLE",
+        "points": ":TRAC:POIN {points}",
+        "rate": ":SAMP:RATE {rate}",
+        "feed": ":TRAC:FEED:CONT ALW",
+        "format": ":FORM:DATA REAL,32",
+        "byte_order": ":FORM:BORD SWAP",
+        "start": ":INIT",
+        "stop": ":ABOR",
+        "count": ":TRAC:POIN:ACT?",
+        "fetch": ":TRAC:DATA? {start},{count}",
+        "ascii": ":FORM:DATA ASC",
+        "error": ":SYST:ERR?",
+    }
+    #データメモリの容量(点)
+    CAPTURE_MEMORY_POINTS = 65536
+    #1サンプルあたりの値の数 (:DATA 31 -> STATUS, DATA1(R), DATA2(θ), DATA3(X), DATA4(Y))
+    CAPTURE_VALUES_PER_SAMPLE = 5
+
+    def __init__(self, gpib_handler, alias="LI5650"):
+        self.gpib = gpib_handler
+        self.alias = alias
+        self.capturing = False
+        self._capture_rate = 0.0
+        self._capture_next_index = 1
+
+    def setup(self, time_constant: float):
+        """ロックインアンプの初期設定を行う。"""
+        self.gpib.clear(self.alias)
+        self.gpib.write(self.alias, ":CALC1:FORM MLIN")  # R
+        self.gpib.write(self.alias, ":CALC2:FORM PHAS")  # θ
+        self.gpib.write(self.alias, ":CALC3:FORM REAL")  # X
+        self.gpib.write(self.alias, ":CALC4:FORM IMAG")  # Y
+        self.gpib.write(self.alias, ":DATA 31")
+        self.gpib.write(self.alias, f"FILT:TCON {time_constant}")
+
+    def measure(self) -> dict:
+        """測定を実行し、結果を辞書として返す。"""
+        raw_values = self.gpib.query(self.alias, ":FETCh?")
+
+        if not raw_values or not isinstance(raw_values, str):
+            print("ロックインアンプから有効な値が取得できませんでした。")
+            return {"R": 0.0, "theta": 0.0, "X": 0.0, "Y": 0.0}
+
+        # 受信した文字列を解析する
+        parts = raw_values.strip().split(',')
+        try:
+            # STATUS, DATA1(R), DATA2(θ), DATA3(X), DATA4(Y)
+            return {
+                "R": float(parts[1]),
+                "theta": float(parts[2]),
+                "X": float(parts[3]),
+                "Y": float(parts[4])
+            }
+        except (IndexError, ValueError) as e:
+            print(f"ロックインアンプのデータ解析中にエラー: {e}")
+            return {"R": 0.0, "theta": 0.0, "X": 0.0, "Y": 0.0}
+
+    @classmethod
+    def capture_fits(cls, sample_rate: float, duration: float) -> bool:
+        """duration秒分のサンプルがデータメモリに収まるかどうかを返す。"""
+        return (sample_rate * duration * cls.CAPTURE_VALUES_PER_SAMPLE
+                <= cls.CAPTURE_MEMORY_POINTS)
+
+    def start_capture(self, sample_rate: float) -> bool:
+        """
+        指定したサンプリングレートでデータメモリへの取り込みを開始する。
+        開始後にエラーキューを確認し、エラーがあれば取り込みを止める。
+
+        Args:
+            sample_rate (float): サンプリングレート(Hz)
+
+        Returns:
+            bool: 開始できた場合はTrue。バイナリ転送に対応していない場合や、
+                機器がコマンドを受け付けなかった場合はFalse
+        """
+        if not hasattr(self.gpib, "query_binary_values"):
+            return False
+        commands = self.CAPTURE_COMMANDS
+        self.gpib.write(self.alias, commands["stop"])
+        self.gpib.write(self.alias, commands["clear"])
+        self.gpib.write(
+            self.alias,
+            commands["points"].format(points=self.CAPTURE_MEMORY_POINTS))
+        self.gpib.write(self.alias, commands["rate"].format(rate=sample_rate))
+        self.gpib.write(self.alias, commands["feed"])
+        self.gpib.write(self.alias, commands["format"])
+        self.gpib.write(self.alias, commands["byte_order"])
+        self.gpib.write(self.alias, commands["start"])
+        #エラーキューの先頭が0 (No error) でなければ取り込みは始まっていない
+        response = self.gpib.query(self.alias, commands["error"])
+        try:
+            error_code = int(str(response).split(",")[0])
+        except ValueError:
+            error_code = None
+        if error_code != 0:
+            print(f"ロックインアンプのデータメモリへの取り込みを開始できません: {response}")
+            self.gpib.write(self.alias, commands["stop"])
+            self.gpib.write(self.alias, commands["ascii"])
+            return False
+        self._capture_rate = sample_rate
+        self._capture_next_index = 1
+        self.capturing = True
+        return True
+
+    def read_capture(self) -> dict:
+        """
+        前回以降にデータメモリへ溜まったサンプルをバイナリブロックでまとめて取り出す。
+
+        Returns:
+            dict: "time"(取り込み開始からの経過時間), "R", "theta", "X", "Y"の配列
+        """
+        empty = {key: np.array([]) for key in ("time", "R", "theta", "X", "Y")}
+        if not self.capturing:
+            return empty
+        commands = self.CAPTURE_COMMANDS
+        try:
+            total = int(float(self.gpib.query(self.alias, commands["count"])))
+        except (TypeError, ValueError):
+            return empty
+        count = total - self._capture_next_index + 1
+        if count <= 0:
+            return empty
+
+        data = self.gpib.query_binary_values(
+            self.alias,
+            commands["fetch"].format(start=self._capture_next_index,
+                                     count=count),
+            datatype='f')
+        if data is None or len(data) < self.CAPTURE_VALUES_PER_SAMPLE:
+            return empty
+        samples = np.asarray(data, dtype=float).reshape(
+            -1, self.CAPTURE_VALUES_PER_SAMPLE)
+        indices = np.arange(len(samples)) + self._capture_next_index
+        self._capture_next_index += len(samples)
+        return {
+            "time": (indices - 1) / self._capture_rate,
+            "R": samples[:, 1],
+            "theta": samples[:, 2],
+            "X": samples[:, 3],
+            "Y": samples[:, 4]
+        }
+
+    def stop_capture(self):
+        """データメモリへの取り込みを停止し、データ形式をASCIIに戻す。"""
+        if not self.capturing:
+            return
+        self.gpib.write(self.alias, self.CAPTURE_COMMANDS["stop"])
+        self.gpib.write(self.alias, self.CAPTURE_COMMANDS["ascii"])
+        self.capturing = False
+
+
+class CT25Handler:
+    """
+    分光器(CT-25)の波長送りと動作完了待ちをカプセル化するクラス。
+    動作完了はSRQイベントで待ち、SRQが使えない場合は短い間隔から始めて
+    徐々に間隔を広げるビジーチェックで待機する。
+    """
+
+    #移動元が分からない場合(最初の移動)に想定する移動距離(nm)
+    MAX_MOVE_DISTANCE = 1500.0
+
+    def __init__(self,
+                 gpib_handler,
+                 alias="CT-25",
+                 min_poll_interval=0.005,
+                 max_poll_interval=0.2,
+                 backoff=1.5,
+                 use_srq=True,
+                 srq_probe_moves=3,
+                 scan_speed=DEFAULT_SCAN_SPEED,
+                 move_timeout_factor=3.0,
+                 move_timeout_margin=5.0):
+        """
+        Args:
+            gpib_handler: GPIB_Handler(またはシミュレータ)のインスタンス
+            alias (str): CT-25のエイリアス名
+            min_poll_interval (float): ビジーチェックの最初の間隔(s)
+            max_poll_interval (float): ビジーチェックの最大間隔(s)
+            backoff (float): ビジーチェックごとに間隔へ掛ける倍率
+            use_srq (bool): SRQイベントによる完了待ちを試すか
+            srq_probe_moves (int): SRQを一度も受信しないままこの回数動作したらSRQ待ちをやめる
+            scan_speed (float): 波長送り速度の目安(nm/s)
+            move_timeout_factor (float): 移動距離から見積もった移動時間に掛ける倍率
+            move_timeout_margin (float): 動作完了待ちの上限に加える余裕(s)
+        """
+        self.gpib = gpib_handler
+        self.alias = alias
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff = backoff
+        self.use_srq = use_srq
+        self.srq_probe_moves = srq_probe_moves
+        self._srq_enabled = False
+        self._srq_seen = False
+        self._moves_without_srq = 0
+        self.scan_speed = scan_speed
+        self.move_timeout_factor = move_timeout_factor
+        self.move_timeout_margin = move_timeout_margin
+        self._move_start = 0.0
+        # 最後に指定した波長 (まだ移動していなければNone)
+        self._position = None
+        # 最後に開始した波長送りの目標波長と、完了を待つ最大時間(s)
+        self._move_target = None
+        self._move_timeout = None
+        # 実際にかかった波長送りの時間(s)
+        self.move_durations: List[float] = []
+
+    def setup(self):
+        """CT-25の初期設定を行う。"""
+        self.gpib.clear(self.alias)
+        self.gpib.write(self.alias, "MSW,1")  #分光器をCT-25に指定
+        self.gpib.write(self.alias,
+                        "GRT,1")  #回折格子の指定(1 -> 1200/mm, 2 -> 600/mm)
+        self.gpib.write(self.alias,
+                        "PRT,100")  #パルスレートの指定(100 -> 1200/mm用, 50 -> 600/mm用)
+        if self.use_srq:
+            self._srq_enabled = self.gpib.enable_srq(self.alias)
+
+    def scan(self, wavelength) -> float:
+        """
+        目的の波長まで分光器を回し、動作完了まで待機する。
+
+        Returns:
+            float: 波長送りにかかった時間(s)
+        """
+        self.start_move(wavelength)
+        return self.wait_for_move()
+
+    def start_move(self, wavelength):
+        """
+        波長送りのコマンドだけを送り、動作完了は待たない。
+        完了はwait_for_moveで待つ。
+        """
+        self._move_start = time.perf_counter()
+        self._move_timeout = self.move_timeout(wavelength)
+        self._move_target = wavelength
+        self._position = float(wavelength)
+        self.gpib.write(self.alias, f"SCN,2,{wavelength}")
+
+    def move_timeout(self, wavelength=None) -> float:
+        """
+        現在の波長からwavelengthまでの波長送りを待つ最大時間(s)を返す。
+        移動元か移動先が分からない場合は最大の移動距離から見積もる。
+        """
+        if self._position is None or wavelength is None:
+            distance = self.MAX_MOVE_DISTANCE
+        else:
+            distance = abs(float(wavelength) - self._position)
+        expected = DEFAULT_MOVE_OVERHEAD + distance / self.scan_speed
+        return self.move_timeout_factor * expected + self.move_timeout_margin
+
+    def wait_for_move(self) -> float:
+        """
+        start_moveで開始した波長送りの完了まで待機する。
+
+        Returns:
+            float: コマンド送信から動作完了までの時間(s)
+
+        Raises:
+            TimeoutError: 移動距離から決めた時間内に動作完了を確認できなかった場合
+        """
+        remaining = self._move_start + self._move_timeout - time.perf_counter()
+        if not self.wait_until_idle(timeout=remaining):
+            #目標の波長に着いていないため、位置は分からなくなる
+            self._position = None
+            raise TimeoutError(
+                f"CT-25の{self._move_target} nmへの波長送りが"
+                f"{self._move_timeout:.1f}秒以内に完了しませんでした。")
+        duration = time.perf_counter() - self._move_start
+        self.move_durations.append(duration)
+        return duration
+
+    def wait_until_idle(self, timeout: float = None) -> bool:
+        """
+        CT-25の動作完了まで待機する。
+        待機中はステータスバイトを読むだけにし、デバイスクリアはタイムアウトや
+        通信エラーからの復帰にだけ使う。
+
+        Args:
+            timeout (float): 最大待機時間(s)。Noneなら今から最後に開始した波長送りの
+                最大時間まで (波長送りをしていなければ最大の移動距離から見積もる)
+
+        Returns:
+            bool: 動作完了を確認できた場合はTrue、タイムアウトした場合はFalse
+        """
+        if timeout is not None:
+            deadline = time.perf_counter() + timeout
+        elif self._move_timeout is not None:
+            deadline = time.perf_counter() + self._move_timeout
+        else:
+            deadline = time.perf_counter() + self.move_timeout()
+        interval = self.min_poll_interval
+        srq_received = False
+        while True:
+            stb = self.gpib.read_stb(self.alias)
+            if stb == 0:
+                break
+            if stb is None:
+                #通信エラーの場合はデバイスクリアで復帰を試みる
+                self.gpib.clear(self.alias)
+            if time.perf_counter() > deadline:
+                tracer.record(io_trace.ERROR, "wait_until_idle", self.alias,
+                              None, "動作完了を確認できないまま待機の上限を超えました")
+                self.gpib.clear(self.alias)
+                return False
+            if self._srq_enabled:
+                # SRQを受信したら次のビジーチェックまで待たずに確認する
+                if self.gpib.wait_for_srq(self.alias, interval * 1000):
+                    srq_received = True
+                    self._srq_seen = True
+            else:
+                time.sleep(interval)
+            interval = min(interval * self.backoff, self.max_poll_interval)
+        self._update_srq_probe(srq_received)
+        return True
+
+    def _update_srq_probe(self, srq_received: bool):
+        """SRQを一度も受信しない場合は、以降SRQ待ちを使わずにビジーチェックだけにする。"""
+        if not self._srq_enabled or self._srq_seen:
+            return
+        if not srq_received:
+            self._moves_without_srq += 1
+            if self._moves_without_srq >= self.srq_probe_moves:
+                self._srq_enabled = False
+                print("CT-25からSRQを受信できないため、ビジーチェックのみで待機します。")
+
+    def reset_statistics(self):
+        """記録した波長送り時間をクリアする。"""
+        self.move_durations = []
+
+    def summary(self) -> str:
+        """記録した波長送り時間の要約を文字列で返す。"""
+        if not self.move_durations:
+            return "波長送りの記録はありません。"
+        total = sum(self.move_durations)
+        count = len(self.move_durations)
+        return (f"波長送り {count}回: 平均 {total / count:.3f} s, "
+                f"最大 {max(self.move_durations):.3f} s, 合計 {total:.1f} s")
+
+
+class DMM6500Handler:
+    """
+    デジタルマルチメータ(DMM6500)のバッファ測定をカプセル化するクラス。
+    トリガーモデルで連続測定した読み値を機器内のリーディングバッファへ溜めておき、
+    必要な時間窓の読み値だけを1回のバイナリブロック転送で取り出す。
+    """
+
+    def __init__(self,
+                 gpib_handler,
+                 alias="DM6500",
+                 buffer_name="defbuffer1",
+                 fetch_timeout=30):
+        """
+        Args:
+            gpib_handler: GPIB_Handler(またはシミュレータ)のインスタンス
+            alias (str): DMM6500のエイリアス名
+            buffer_name (str): 使用するリーディングバッファ名
+            fetch_timeout (float): 時間窓の読み値が揃うまで待つ最大時間(s)
+        """
+        self.gpib = gpib_handler
+        self.alias = alias
+        self.buffer_name = buffer_name
+        self.fetch_timeout = fetch_timeout
+        self.active = False
+        # トリガーモデルを開始したPC側の時刻 (バッファの相対時刻0に対応)
+        self._start_time = 0.0
+        # 次に取り出すバッファのインデックス
+        self._next_index = 1
+        # 取り出し済みでまだ時間窓の読み取りに使っていない読み値と、そのPC側の時刻
+        self._cached_readings = np.array([])
+        self._cached_times = np.array([])
+
+    def start_continuous(self) -> bool:
+        """
+        バッファへの連続測定を開始する。
+
+        Returns:
+            bool: 開始できた場合はTrue。バイナリ転送に対応していない場合はFalse
+        """
+        if not hasattr(self.gpib, "query_binary_values"):
+            return False
+        _buffer = f'"{self.buffer_name}"'
+        self.gpib.write(self.alias, ":ABOR")
+        self.gpib.write(self.alias, f":TRAC:CLE {_buffer}")
+        self.gpib.write(self.alias, f":TRAC:FILL:MODE CONT, {_buffer}")
+        self.gpib.write(self.alias, ":FORM:DATA REAL")  #float64のバイナリ転送
+        self.gpib.write(self.alias, ":FORM:BORD SWAP")  #リトルエンディアン
+        #中止(:ABOR)されるまで測定を繰り返すトリガーモデル
+        self.gpib.write(
+            self.alias,
+            f':TRIG:LOAD "LoopUntilEvent", "COMM", 100, "ENT", 0, {_buffer}')
+        self.gpib.write(self.alias, ":INIT")
+        self._start_time = time.perf_counter()
+        self._next_index = 1
+        self._cached_readings = np.array([])
+        self._cached_times = np.array([])
+        self.active = True
+        return True
+
+    def stop(self):
+        """連続測定を停止し、データ形式をASCIIに戻す。"""
+        if not self.active:
+            return
+        self.gpib.write(self.alias, ":ABOR")
+        self.gpib.write(self.alias, ":FORM:DATA ASC")
+        self.active = False
+
+    def _fetch_new(self):
+        """
+        前回以降にバッファへ溜まった読み値と、そのPC側の時刻を取り出す。
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (読み値, 時刻)
+        """
+        _buffer = f'"{self.buffer_name}"'
+        _start = self.gpib.query(self.alias, f":TRAC:ACT:STAR? {_buffer}")
+        _end = self.gpib.query(self.alias, f":TRAC:ACT:END? {_buffer}")
+        try:
+            start_index, end_index = int(float(_start)), int(float(_end))
+        except (TypeError, ValueError):
+            return np.array([]), np.array([])
+        #バッファが上書き・クリアされていたら先頭から読み直す
+        if self._next_index < start_index or self._next_index > end_index + 1:
+            self._next_index = start_index
+        if end_index < self._next_index or end_index == 0:
+            return np.array([]), np.array([])
+
+        data = self.gpib.query_binary_values(
+            self.alias,
+            f":TRAC:DATA? {self._next_index}, {end_index}, {_buffer}, READ, REL"
+        )
+        self._next_index = end_index + 1
+        if data is None or len(data) < 2:
+            return np.array([]), np.array([])
+        data = np.asarray(data, dtype=float)
+        #READ, RELの順に交互に並んでいる
+        return data[0::2], self._start_time + data[1::2]
+
+    def fetch(self):
+        """
+        前回以降にバッファへ溜まった読み値を取り出して返す。
+        取り出した読み値は、後のread_windowでも使えるように保持しておく。
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (読み値, PC側の時刻)
+        """
+        readings, timestamps = self._fetch_new()
+        if readings.size:
+            self._cached_readings = np.concatenate(
+                (self._cached_readings, readings))
+            self._cached_times = np.concatenate(
+                (self._cached_times, timestamps))
+        return readings, timestamps
+
+    def read_window(self, window_start: float, window_end: float):
+        """
+        PC側の時刻(time.perf_counter)で指定した時間窓に入る読み値の統計を返す。
+        時間窓に読み値が1つもない場合は、時間窓以降の最初の読み値が届くまで待つ。
+
+        Returns:
+            dict: {"mean", "std", "n"}。タイムアウトした場合はNone
+        """
+        deadline = time.perf_counter() + self.fetch_timeout
+        while True:
+            self.fetch()
+            readings, timestamps = self._cached_readings, self._cached_times
+            values = readings[(timestamps >= window_start)
+                              & (timestamps <= window_end)]
+            if not values.size:
+                #時間窓内に読み値がなければ、時間窓直後の最初の読み値を使う
+                values = readings[timestamps > window_end][:1]
+            if values.size:
+                #次の時間窓はこれより後なので、時間窓までの読み値は捨てる
+                keep = timestamps > window_end
+                self._cached_readings = readings[keep]
+                self._cached_times = timestamps[keep]
+                return {
+                    "mean": float(values.mean()),
+                    "std": float(values.std(ddof=1)) if values.size > 1 else 0.0,
+                    "n": int(values.size)
+                }
+            if time.perf_counter() > deadline:
+                return None
+            time.sleep(0.005)
@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+#トレースレベル (数値が大きいほど詳細)
+OFF = 0
+ERROR = 1  #通信エラーのみ
+IO = 2  #write / query などの通信内容
+VERBOSE = 3  #ビジーチェックやクリアなど高頻度のポーリングも含める
+
+LEVEL_NAMES = {OFF: "OFF", ERROR: "ERROR", IO: "IO", VERBOSE: "VERBOSE"}
+
+
+class IOTracer:
+    """
+    機器との通信内容を記録するクラス。
+    記録は (時刻, レベル, 種類, エイリアス, コマンド, 応答) のタプルのまま
+    リングバッファに積むだけで、文字列への整形はdumpやファイル出力の時にだけ行う。
+    呼び出し側は `if tracer.level >= IO:` で判定してから record を呼ぶことで、
+    無効時には引数の組み立ても含めて何もしない。
+    """
+
+    def __init__(self,
+                 level: int = IO,
+                 capacity: int = 1000,
+                 console_level: int = ERROR):
+        """
+        Args:
+            level (int): 記録するレベルの上限 (OFF, ERROR, IO, VERBOSE)
+            capacity (int): リングバッファに残す件数
+            console_level (int): このレベル以下の記録はコンソールにも表示する
+        """
+        self.level = level
+        self.console_level = console_level
+        self._ring = deque(maxlen=capacity)
+        self._sink = None
+
+    def record(self,
+               level: int,
+               kind: str,
+               alias: str,
+               command=None,
+               response=None):
+        """
+        通信内容を1件記録する。
+
+        Args:
+            level (int): この記録のレベル
+            kind (str): 操作の種類 (write, query, error など)
+            alias (str): 機器のエイリアス名
+            command: 送信したコマンド
+            response: 応答 (エラーの場合は例外オブジェクト)
+        """
+        if level > self.level:
+            return
+        entry = (time.time(), level, kind, alias, command, response)
+        self._ring.append(entry)
+        if level <= self.console_level:
+            print(self.format(entry))
+        sink = self._sink
+        if sink is not None:
+            sink.put(entry)
+
+    @staticmethod
+    def format(entry: tuple) -> str:
+        """記録1件を1行の文字列に整形する。"""
+        created, level, kind, alias, command, response = entry
+        timestamp = datetime.fromtimestamp(created).strftime(
+            "%Y-%m-%d %H:%M:%S.%f")[:-3]
+        line = f"[{timestamp}] [{LEVEL_NAMES.get(level, level)}] {kind} '{alias}'"
+        if command is not None:
+            line += f" {command!r}"
+        if response is not None:
+            line += f" -> {response}"
+        return line
+
+    def entries(self) -> list:
+        """リングバッファに残っている記録のリストを返す。"""
+        return list(self._ring)
+
+    def dump(self, path: str = None) -> str:
+        """
+        リングバッファの内容を整形して返す。pathを指定した場合はファイルにも書き出す。
+        """
+        text = "\n".join(self.format(entry) for entry in self.entries())
+        if path:
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(text + "\n")
+            except Exception as e:
+                print(f"通信ログを保存できませんでした: {e}")
+        return text
+
+    def open_file_sink(self, path: str, flush_interval: float = 1.0):
+        """以降の記録を別スレッドでファイルに書き出す。"""
+        self.close_file_sink()
+        self._sink = FileSink(path, flush_interval)
+
+    def close_file_sink(self):
+        """ファイルへの書き出しを終了する。"""
+        sink, self._sink = self._sink, None
+        if sink is not None:
+            sink.close()
+
+
+class FileSink:
+    """
+    IOTracerの記録を別スレッドでファイルに追記するクラス。
+    記録側はキューに積むだけなので、通信の待ち時間にディスクI/Oが加わらない。
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run,
+                                        name="IOTraceFileSink",
+                                        daemon=True)
+        self._thread.start()
+
+    def put(self, entry: tuple):
+        self._queue.put(entry)
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            last_flush = time.monotonic()
+            while True:
+                try:
+                    entry = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    entry = None
+                if entry is self._STOP:
+                    return
+                if entry is not None:
+                    f.write(IOTracer.format(entry) + "\n")
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    f.flush()
+                    last_flush = time.monotonic()
+
+
+#アプリケーション全体で共有するトレーサー
+tracer = IOTracer()
@@ -1,14 +1,36 @@
 import customtkinter as ctk
 from datetime import datetime
+import queue
+import time
 
 
 class Logger:
     """
     GUIのテキストボックスへのログ出力を専門に担当するクラス。
+    add_logはどのスレッドからでも呼べるように、ログをキューに積むだけにしている。
+    キューに溜まったログはTkのメインループ上で一定間隔ごとにまとめて書き出し、
+    テキストボックスには最新のmax_lines行だけを残す。
     """
 
-    def __init__(self, textbox: ctk.CTkTextbox):
+    def __init__(self,
+                 textbox: ctk.CTkTextbox,
+                 max_lines: int = 2000,
+                 drain_interval_ms: int = 100,
+                 max_batch: int = 500):
+        """
+        Args:
+            textbox (ctk.CTkTextbox): ログを表示するテキストボックス
+            max_lines (int): テキストボックスに残す最大行数
+            drain_interval_ms (int): キューをテキストボックスへ書き出す間隔 (ms)
+            max_batch (int): 1回の書き出しで処理する最大件数
+        """
         self.textbox = textbox
+        self.max_lines = max_lines
+        self.drain_interval_ms = drain_interval_ms
+        self.max_batch = max_batch
+        # (時刻, レベル, メッセージ) を積むスレッドセーフなキュー
+        self._queue = queue.SimpleQueue()
+        self._line_count = 0
         # ログレベルに応じた色を設定
         self.textbox.tag_config("INFO", foreground="black")
         self.textbox.tag_config("STATE", foreground="blue")
@@ -16,23 +38,60 @@ class Logger:
         self.textbox.tag_config("DATA", foreground="#653496")  # 紫色
         self.textbox.tag_config("WARN", foreground="orange")
         self.textbox.tag_config("ERROR", foreground="red")
+        # メインループ上での定期的な書き出しを開始
+        self.textbox.after(self.drain_interval_ms, self._drain)
 
     def add_log(self, message: str, level: str = "INFO"):
         """
-        指定されたレベルでテキストボックスにログメッセージを追加する。
+        指定されたレベルでログメッセージをキューに追加する。
+        テキストボックスへの反映はメインループ上で後からまとめて行われる。
 
         Args:
             message (str): ログに表示するメッセージ。
             level (str): ログのレベル (INFO, STATE, GPIB, WARN, ERRORなど)。
         """
+        self._queue.put((time.time(), level, message))
+
+    def _drain(self):
+        """
+        キューに溜まったログをまとめてテキストボックスに書き出す (メインスレッド専用)。
+        """
+        try:
+            self.flush()
+        finally:
+            self.textbox.after(self.drain_interval_ms, self._drain)
+
+    def flush(self):
+        """
+        キューに溜まったログを最大max_batch件までテキストボックスに書き出す。
+        メインスレッドから呼び出すこと。
+        """
+        records = []
+        try:
+            while len(records) < self.max_batch:
+                records.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        if not records:
+            return
+
         try:
             # テキストボックスを一時的に編集可能にする
             self.textbox.configure(state="normal")
 
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log_entry = f"[{timestamp}] [{level.upper()}] {message}\n"
+            for created, level, message in records:
+                timestamp = datetime.fromtimestamp(created).strftime(
+                    "%Y-%m-%d %H:%M:%S")
+                log_entry = f"[{timestamp}] [{level.upper()}] {message}\n"
+                self.textbox.insert("end", log_entry, level.upper())
+                self._line_count += log_entry.count("\n")
+
+            # 古い行を削除して最新のmax_lines行だけを残す
+            excess = self._line_count - self.max_lines
+            if excess > 0:
+                self.textbox.delete("1.0", f"{excess + 1}.0")
+                self._line_count -= excess
 
-            self.textbox.insert("end", log_entry, level.upper())
             self.textbox.see("end")  # 自動で最下部にスクロール
 
             # 再び編集不可に戻す
@@ -1,172 +1,80 @@
 from view import View
-from model import Model, MsrState, State_Handler, MeasurementPoint
+from model import OPTIONAL_SETTING_KEYS, Model, MsrState, Setting_Parms, State_Handler
 from save_manager import SaveManager
 from logger import Logger
 from table_manager import DataTableManager
+from acquisition_pipeline import PlotRefresher
+from measurement_engine import MeasurementEngine, validate_json
+from measurement_queue import (MeasurementQueue, QueueJob, load_queue_file,
+                               validate_jobs)
+from run_journal import check_resumable, load_journal
+from startup_profile import profiler
 import customtkinter as ctk
 from tkinter import messagebox
-from CTkMessagebox import CTkMessagebox
-import pyvisa
 import threading
+import queue
 from customtkinter import filedialog
 from dataclasses import asdict
 from typing import List
-from functools import wraps
-from datetime import datetime, timedelta
 import json
-import random
 import time
-import os
 
 # ★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★
 # ★★★ デバッグモード切り替えフラグ ★★★
-# ★★★ True: 装置なしで実行 (Mockを使用)
+# ★★★ True: 装置なしで実行 (シミュレータを使用)
 # ★★★ False: 装置ありで実行 (実機と接続)
 # ★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★
 DEBUG_MODE = True
 
-
-def measurement_handler(func):
-    """
-    測定メソッドの前処理と後処理を共通化するためのデコレーター。
-    """
-
-    @wraps(func)
-    def wrapper(self, headers: tuple, *args, **kwargs):
-        # --- ① 測定前の共通準備処理 ---
-        #ロガー出力
-        measurement_mode = self.model.setting_parms.measurement
-        self.logger.add_log(f"{measurement_mode}測定を開始します。", level="STATE")
-        #headersを受け渡し単位見出しを反映
-        self.table_manager.clear_and_set_header(*headers)
-        #保存用ディレクトリ準備
-        self.save_manager.create_new_measurement_directory()
-        #設定をファイルに保存する
-        self.save_manager.save_settings_to_file("settings.json",
-                                                self.model.setting_parms)
-        #配列のリセット
-        self.model.data_container.reset_list()
-        #測定横軸配列の作成
-        self.model.calculate_measurement_points(
-            self.model.setting_parms.measurement_wavelength,
-            self.model.setting_parms.measurement_section)
-
-        # --- 予想終了時刻の計算とログ出力 ---
-        estimated_duration = 0
-        try:
-            if measurement_mode in ["ラマン", "電場変調ラマン"]:
-                # ポイント数 × 1点あたりの時間で総時間を計算
-                num_points = sum(
-                    len(sublist)
-                    for sublist in self.model.data_container.MsrData1)
-                time_constant_ms = float(
-                    self.model.setting_parms.time_constant)
-                multiplier = float(
-                    self.model.setting_parms.time_constant_multiplier)
-                wait_per_point = (time_constant_ms * 10E-4) * multiplier
-                buffer = 2  # 待機時間以外に、機器の動作時間バッファ(s)を追加
-                estimated_duration = num_points * (wait_per_point + buffer)
-
-            elif measurement_mode == "変調信号探索":
-                # ユーザーが入力した測定総時間をそのまま使用
-                estimated_duration = float(
-                    self.model.setting_parms.total_duration)
-
-            if estimated_duration > 0:
-                end_time = datetime.now() + timedelta(
-                    seconds=estimated_duration)
-                self.logger.add_log(
-                    f"予想終了時刻: {end_time.strftime('%Y-%m-%d %H:%M:%S')}",
-                    level="INFO")
-
-        except Exception as e:
-            self.logger.add_log(f"予想終了時刻の計算中にエラーが発生しました: {e}", level="WARN")
-
-        # --- ② 本体となる測定メソッドを実行 ---
-        func(self, headers, *args, **kwargs)
-
-        # --- ③ 測定後の共通後処理 ---
-        if self.state_handler.msrstate == MsrState.measure:
-            # 正常に完了した場合
-            self.state_handler.update_state(MsrState.finish)
-            self.save_manager.save_matplotlib_figure(
-                "measurement_graph.png",
-                self.view.graph_frame.plot_manager.fig)
-            self.view.graph_frame.canvas.draw()
-            self.logger.add_log("測定が正常に完了しました。", level="INFO")
-
-        # 状態をデフォルトに戻し、ボタンの見た目を更新
-        self.state_handler.update_state(MsrState.default)
-        self.change_button_texture()
-
-    return wrapper
-
-
-class LockinAmpHandler:
-    """ロックインアンプ(LI5650)の操作をカプセル化するクラス。"""
-
-    def __init__(self, gpib_handler, alias="LI5650"):
-        self.gpib = gpib_handler
-        self.alias = alias
-
-    def setup(self, time_constant: float):
-        """ロックインアンプの初期設定を行う。"""
-        self.gpib.clear(self.alias)
-        self.gpib.write(self.alias, ":CALC1:FORM MLIN")  # R
-        self.gpib.write(self.alias, ":CALC2:FORM PHAS")  # θ
-        self.gpib.write(self.alias, ":CALC3:FORM REAL")  # X
-        self.gpib.write(self.alias, ":CALC4:FORM IMAG")  # Y
-        self.gpib.write(self.alias, ":DATA 31")
-        self.gpib.write(self.alias, f"FILT:TCON {time_constant}")
-
-    def measure(self) -> dict:
-        """測定を実行し、結果を辞書として返す。"""
-        raw_values = self.gpib.query(self.alias, ":FETCh?")
-
-        if not raw_values or not isinstance(raw_values, str):
-            print("ロックインアンプから有効な値が取得できませんでした。")
-            return {"R": 0.0, "theta": 0.0, "X": 0.0, "Y": 0.0}
-
-        # 受信した文字列を解析する
-        parts = raw_values.strip().split(',')
-        try:
-            # STATUS, DATA1(R), DATA2(θ), DATA3(X), DATA4(Y)
-            return {
-                "R": float(parts[1]),
-                "theta": float(parts[2]),
-                "X": float(parts[3]),
-                "Y": float(parts[4])
-            }
-        except (IndexError, ValueError) as e:
-            print(f"ロックインアンプのデータ解析中にエラー: {e}")
-            return {"R": 0.0, "theta": 0.0, "X": 0.0, "Y": 0.0}
+#測定スレッドなどから依頼された処理をメインスレッドで実行する間隔(ms)
+MAIN_CALL_INTERVAL_MS = 50
 
 
 class Controller():
 
-    def __init__(self, root):
+    def __init__(self, root, gpib_handler=None):
+        """
+        ウィンドウを先に表示できるよう、ここではフォームの構築とバインディングだけを行う。
+        グラフの準備はウィンドウの表示後に、機器の接続とCT-25の初期設定は
+        バックグラウンドのスレッドで行い、完了すると測定ボタンが有効になる。
+
+        Args:
+            root: Tkのルートウィンドウ
+            gpib_handler: 使用するGPIBハンドラ (省略時はDEBUG_MODEに応じて選択する)
+        """
         self.root = root
-        self.view = View(self.root, self)
-        self.model = Model(self.root)
+        with profiler.span("view"):
+            self.view = View(self.root, self)
+        with profiler.span("model"):
+            self.model = Model(self.root)
         self.save_manager = SaveManager()
         self.state_handler = State_Handler()
         self.table_manager = DataTableManager(
-            self.view.text_frame.data_textbox)
+            self.view.text_frame.data_textbox,
+            self.view.text_frame.data_scrollbar)
         self.logger = Logger(self.view.text_frame.log_textbox)
+        #グラフの更新 (グラフの準備ができてから作成する)
+        self.plot_refresher = None
         #最初のログ
         self.logger.add_log("アプリケーションを起動しました。", level="INFO")
 
-        # ★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★
-        # ★★★ デバッグモードに応じて呼び出すクラスを切り替える ★★★
-        # ★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★
-        if DEBUG_MODE:
-            from mock_gpib_handler import Mock_GPIB_Handler
-            self.gpib_handler = Mock_GPIB_Handler()
-        else:
-            from GPIB_Handler import GPIB_Handler
-            self.gpib_handler = GPIB_Handler()
-
-        self.lockin_handler = LockinAmpHandler(self.gpib_handler)
+        #GPIBハンドラと測定エンジン (機器の接続が完了してから設定する)
+        self.gpib_handler = gpib_handler
+        self.engine = None
+        self.lockin_handler = None
+        self.ct25_handler = None
+        self.dmm_handler = None
+        #接続スレッドの結果 (engine, error)
+        self._device_init = None
+        #接続完了後に実行する処理
+        self._device_ready_callbacks = []
+        #測定スレッドなどからメインスレッドでの実行を依頼された処理のキュー
+        self._main_calls = queue.SimpleQueue()
+        self.root.after(MAIN_CALL_INTERVAL_MS, self._drain_main_calls)
+        #測定キューのジョブと、実行中のキュー (実行中でなければNone)
+        self.queue_jobs: List[QueueJob] = []
+        self.queue: MeasurementQueue = None
+        self.queue_running = False
 
         #GPIB機器のエイリアス
         self.alias_CT25: str = "CT-25"
@@ -225,9 +133,20 @@ class Controller():
         #CT25ボタン
         self.view.control_button_frame.check_CT25_button.configure(
             command=self.check_CT25_button_cmd)
+        #データテーブルの行ジャンプボタン
+        self.view.text_frame.jump_row_button.configure(
+            command=self.jump_row_button_cmd)
+        self.view.text_frame.tail_row_button.configure(
+            command=self.table_manager.follow_tail)
         #測定ボタン
         self.view.control_button_frame.measure_button.configure(
             command=self.measure_button_cmd)
+        #測定再開ボタン
+        self.view.control_button_frame.resume_button.configure(
+            command=self.resume_button_cmd)
+        #測定キューボタン
+        self.view.control_button_frame.queue_button.configure(
+            command=self.queue_button_cmd)
         #停止ボタン
         self.view.control_button_frame.stop_button.configure(
             command=self.toggle_pause_cmd)
@@ -240,14 +159,175 @@ class Controller():
         #ボタンのインタラクティブを更新
         self.change_button_texture()
 
-        #GPIB機器の接続
-        self.gpib_handler.add_device(self.alias_CT25, "GPIB0::9::INSTR")
-        self.gpib_handler.add_device(self.alias_DM6500,
-                                     "USB0::0x05E6::0x6500::04425756::INSTR")
-        self.gpib_handler.add_device(self.alias_LI5650, "GPIB0::3::INSTR")
+        #ウィンドウを表示してから、グラフの準備と機器の接続を行う
+        self.root.after_idle(self._deferred_init)
+
+    def _deferred_init(self):
+        """
+        ウィンドウの表示後に呼び出され、グラフを準備して機器の接続を開始する。
+        """
+        profiler.mark("window_shown")
+        with profiler.span("graph"):
+            self.view.graph_frame.build_canvas()
+            self.plot_refresher = PlotRefresher(
+                self.view.graph_frame, self.view.graph_frame.plot_manager)
+        self.view.control_button_frame.set_device_status("接続中...", "orange")
+        self.logger.add_log("機器に接続しています...", level="INFO")
+        self.thread_device_init = threading.Thread(
+            target=self._connect_devices_thread,
+            name="DeviceInit",
+            daemon=True)
+        self.thread_device_init.start()
+        self.root.after(50, self._poll_device_init)
+
+    def call_in_main(self, func, wait: bool = False, timeout: float = 10.0):
+        """
+        funcをメインスレッドで実行する。どのスレッドからでも呼び出せる。
+        測定スレッドはTkに直接触れず、この関数を通して画面を更新する。
+
+        Args:
+            func: 引数なしで呼び出す処理
+            wait (bool): Trueなら実行が終わるまで待つ (最大timeout秒)
+            timeout (float): 待つ時間の上限(s)
+        """
+        if threading.current_thread() is threading.main_thread():
+            func()
+            return
+        done = threading.Event()
+
+        def call():
+            try:
+                func()
+            finally:
+                done.set()
+
+        self._main_calls.put(call)
+        if wait and not done.wait(timeout):
+            print("メインスレッドでの処理の完了を待てませんでした。")
 
-        #CT-25の初期設定
-        self.default_CT25_set()
+    def _drain_main_calls(self):
+        """依頼された処理を一定間隔でまとめて実行する (メインスレッド専用)。"""
+        try:
+            while True:
+                try:
+                    call = self._main_calls.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    call()
+                except Exception as e:
+                    self.logger.add_log(f"画面の更新中にエラーが発生しました: {e}",
+                                        level="ERROR")
+        finally:
+            self.root.after(MAIN_CALL_INTERVAL_MS, self._drain_main_calls)
+
+    def _create_gpib_handler(self):
+        """
+        デバッグモードに応じてシミュレータまたは実機のGPIBハンドラを作る。
+        """
+        # ★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★
+        # ★★★ デバッグモードに応じて呼び出すクラスを切り替える ★★★
+        # ★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★★
+        if DEBUG_MODE:
+            from gpib_simulator import Simulated_GPIB_Handler
+            return Simulated_GPIB_Handler()
+        from GPIB_Handler import GPIB_Handler
+        return GPIB_Handler()
+
+    def _connect_devices_thread(self):
+        """
+        GPIBハンドラと測定エンジンを作成し、機器の接続とCT-25の初期設定を行う。
+        バックグラウンドのスレッドで実行され、Tkには触れない。
+        結果は_device_initに格納し、メインスレッドの_poll_device_initが受け取る。
+        """
+        try:
+            gpib_handler = self.gpib_handler
+            if gpib_handler is None:
+                with profiler.span("gpib_handler"):
+                    gpib_handler = self._create_gpib_handler()
+            #測定エンジン (測定ループと機器ハンドラ)
+            with profiler.span("engine"):
+                engine = MeasurementEngine(gpib_handler,
+                                           self.model.setting_parms,
+                                           self.model.data_container,
+                                           save_manager=self.save_manager,
+                                           state_handler=self.state_handler,
+                                           logger=self.logger,
+                                           table_manager=self.table_manager,
+                                           plot_refresher=self.plot_refresher)
+            #GPIB機器の接続とCT-25の初期設定
+            with profiler.span("connect_devices"):
+                engine.connect_devices()
+            self._device_init = (engine, None)
+        except Exception as e:
+            self._device_init = (None, e)
+
+    def _poll_device_init(self):
+        """機器の接続が終わったかを一定間隔で確認する (メインスレッド専用)。"""
+        if self._device_init is None:
+            self.root.after(50, self._poll_device_init)
+            return
+        engine, error = self._device_init
+        if error is not None:
+            self.view.control_button_frame.set_device_status("接続失敗", "red")
+            self.logger.add_log(f"機器の接続中にエラーが発生しました: {error}",
+                                level="ERROR")
+            return
+        self._on_devices_ready(engine)
+
+    def _on_devices_ready(self, engine: MeasurementEngine):
+        """機器の接続が完了したら測定エンジンを設定し、測定を可能にする。"""
+        self.engine = engine
+        self.gpib_handler = engine.gpib_handler
+        #エンジンの処理は測定スレッドから呼ばれるため、メインスレッドで実行する
+        #(グラフは次の測定の保存先に切り替わる前に保存し終えるよう、完了を待つ)
+        self.engine.on_finish = lambda: self.call_in_main(
+            self._on_measurement_finish, wait=True)
+        self.engine.on_idle = lambda: self.call_in_main(
+            self.change_button_texture)
+        self.lockin_handler = self.engine.lockin_handler
+        self.ct25_handler = self.engine.ct25_handler
+        self.dmm_handler = self.engine.dmm_handler
+        self.view.control_button_frame.set_device_status("接続済み", "green")
+        self.logger.add_log("機器の接続とCT-25の初期設定が完了しました。", level="INFO")
+        self.change_button_texture()
+        #接続を待っていた処理を実行
+        callbacks, self._device_ready_callbacks = self._device_ready_callbacks, []
+        for callback in callbacks:
+            callback()
+        profiler.finish(self.logger)
+
+    def _when_devices_ready(self, callback):
+        """機器の接続が完了していればcallbackをすぐに、そうでなければ完了時に実行する。"""
+        if self.engine is not None:
+            callback()
+        else:
+            self._device_ready_callbacks.append(callback)
+
+    def _require_devices(self) -> bool:
+        """機器の接続が完了しているかを確認し、未完了ならログに警告を出す。"""
+        if self.engine is None:
+            self.logger.add_log("機器の接続が完了していません。", level="WARN")
+            return False
+        return True
+
+    def wait_until_ready(self, timeout: float = None) -> bool:
+        """
+        機器の接続が完了するまで、Tkのイベントを処理しながら待機する。
+        mainloopを使わずにControllerを動かす場合(benchmark.pyなど)に使う。
+
+        Returns:
+            bool: 接続が完了した場合はTrue、失敗またはタイムアウトした場合はFalse
+        """
+        start = time.perf_counter()
+        while self.engine is None:
+            if self._device_init is not None and self._device_init[1]:
+                return False
+            if timeout is not None and time.perf_counter() - start > timeout:
+                return False
+            self.root.update()
+            time.sleep(0.01)
+        return True
 
     def _on_measurement_mode_change(self, selected_mode: str):
         """測定モードのプルダウンが変更されたときに呼び出される"""
@@ -260,22 +340,15 @@ class Controller():
     def default_CT25_set(self):
         """
         CT_25の初期設定
+        起動時はバックグラウンドの接続処理(connect_devices)の中で行われる
         """
-        self.gpib_handler.clear(self.alias_CT25)
-        self.gpib_handler.write(self.alias_CT25, "MSW,1")  #分光器をCT-25に指定
-        self.gpib_handler.write(self.alias_CT25,
-                                "GRT,1")  #回折格子の指定(1 -> 1200/mm, 2 -> 600/mm)
-        self.gpib_handler.write(
-            self.alias_CT25,
-            "PRT,100")  #パルスレートの指定(100 -> 1200/mm用, 50 -> 600/mm用)
+        self.ct25_handler.setup()
 
     def scan_wavelength(self, wavelength):
         """
         目的の波長まで分光器を回す関数
         """
-        self.gpib_handler.write(self.alias_CT25, f"SCN,2,{wavelength}")
-        while self.gpib_handler.busy_check(self.alias_CT25):
-            time.sleep(1)  #ビジー状態のときは待機する
+        return self.ct25_handler.scan(wavelength)
 
     def check_CT25_button_cmd(self):
         """
@@ -285,15 +358,24 @@ class Controller():
 
     def DMM6500_button_cmd(self):
         """
-        DMM6500ボタンコマンド（タイムアウト対応版）
+        DMM6500ボタンコマンド
+        通信エラーの場合、GPIBハンドラはNoneを返す
         """
-        while True:
-            _value = self.gpib_handler.query(self.alias_DM6500, ":READ?")
+        if not self._require_devices():
+            return None
+        _value = self.gpib_handler.query(self.alias_DM6500, ":READ?")
+        print(_value)
+        return _value
 
-            if not isinstance(_value, pyvisa.errors.VisaIOError):
-                print(_value)
-                return _value  # 成功したら値を返して終了
-            time.sleep(0.01)
+    def jump_row_button_cmd(self):
+        """
+        データテーブルの行ジャンプボタンのコマンド
+        """
+        _row = self.view.text_frame.jump_row_entry.get()
+        try:
+            self.table_manager.jump_to_row(int(_row))
+        except ValueError:
+            self.logger.add_log(f"行番号が不正です: '{_row}'", level="WARN")
 
     def measure_button_cmd(self):
         """
@@ -329,47 +411,255 @@ class Controller():
         self.thread1 = threading.Thread(target=self.start_measurement_thread)
         self.thread1.start()
 
-    def start_measurement_thread(self):
+    def resume_button_cmd(self):
+        """
+        測定再開ボタンのコマンド。
+        中断した測定のフォルダを選び、ジャーナルから設定と測定済みのデータを
+        復元して、次の未測定の波長から測定を続ける。
+        """
+        if not self._require_devices():
+            return
+        _directory = filedialog.askdirectory(
+            initialdir=self.save_manager.base_directory)
+        if not _directory:  # キャンセルされた場合
+            self.root.focus_force()
+            return
+        try:
+            journal_state = load_journal(_directory)
+            check_resumable(journal_state)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("再開エラー", str(e))
+            self.root.focus_force()
+            return
+        if not self.validate_json(journal_state.settings):
+            messagebox.showerror("形式エラー", "ジャーナルの設定の内容を確認してください！")
+            self.root.focus_force()
+            return
+        #ジャーナルの設定を画面に反映
+        self.apply_setting_data(journal_state.settings)
+        self.logger.add_log(f"中断した測定を再開します: {_directory}", level="INFO")
+        self.root.focus_force()
+
+        # ステート変更
+        self.state_handler.update_state(MsrState.measure)
+        self.change_button_texture()
+
+        # 並列スレッドで測定を再開
+        self.thread1 = threading.Thread(target=self.start_measurement_thread,
+                                        args=(journal_state, ))
+        self.thread1.start()
+
+    def queue_button_cmd(self):
+        """
+        キューボタンのコマンド。
+        測定キューのウィンドウを開き、各ボタンのコマンドを設定する。
+        """
+        window = self.view.open_queue_window()
+        if window is None:  # すでに開いている場合
+            return
+        window.add_button.configure(command=self.queue_add_cmd)
+        window.load_button.configure(command=self.queue_load_cmd)
+        window.start_button.configure(command=self.queue_start_cmd)
+        window.abort_button.configure(command=self.queue_abort_cmd)
+        window.on_skip = self.queue_skip_cmd
+        window.set_jobs(self.queue_jobs, self.queue_running)
+
+    def _refresh_queue_window(self, rebuild: bool = False):
+        """測定キューのウィンドウが開いていれば表示を更新する (メインスレッド専用)。"""
+        window = self.view.queue_window
+        if window is None or not window.winfo_exists():
+            return
+        if rebuild:
+            window.set_jobs(self.queue_jobs, self.queue_running)
+        else:
+            window.update_status(self.queue_jobs, self.queue_running)
+
+    def _focus_queue_window(self):
+        """ダイアログを閉じた後、測定キューのウィンドウにフォーカスを戻す。"""
+        window = self.view.queue_window
+        if window is not None and window.winfo_exists():
+            window.focus_force()
+
+    def queue_add_cmd(self):
+        """
+        測定キューの追加ボタンのコマンド。
+        設定ファイルを選び、ファイルごとに測定名とメモを入力してキューの末尾に加える。
+        """
+        _file_paths = filedialog.askopenfilenames(initialdir="setting",
+                                                  filetypes=[("JSON files",
+                                                              "*.json")])
+        for _file_path in _file_paths:
+            dialog_result = self.view.open_name_input_dialog()
+            if not dialog_result or not dialog_result.get("name"):
+                self.logger.add_log(
+                    f"測定名が入力されなかったため、キューに追加しませんでした: {_file_path}",
+                    level="WARN")
+                continue
+            self.queue_jobs.append(
+                QueueJob(settings_path=_file_path,
+                         name=dialog_result["name"],
+                         notes=dialog_result["notes"]))
+        self._refresh_queue_window(rebuild=True)
+        self._focus_queue_window()
+
+    def queue_load_cmd(self):
+        """
+        測定キューのキュー読込ボタンのコマンド。
+        キューファイルを読み込み、現在のキューを置き換える。
+        """
+        _file_path = filedialog.askopenfilename(filetypes=[("JSON files",
+                                                            "*.json")])
+        if not _file_path:  # キャンセルされた場合
+            self._focus_queue_window()
+            return
+        try:
+            self.queue_jobs = load_queue_file(_file_path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("形式エラー", str(e))
+            self._focus_queue_window()
+            return
+        self.logger.add_log(
+            f"キューを読み込みました: {len(self.queue_jobs)}件 ({_file_path})",
+            level="INFO")
+        self._refresh_queue_window(rebuild=True)
+        self._focus_queue_window()
+
+    def queue_start_cmd(self):
+        """
+        測定キューの開始ボタンのコマンド。
+        すべての設定ファイルを検証してから、キューの測定を別スレッドで開始する。
+        """
+        if not self._require_devices():
+            return
+        if self.state_handler.msrstate in [MsrState.measure, MsrState.stop]:
+            return
+        #前回の結果を消して、すべてのジョブを待機中に戻す
+        self.queue_jobs = [
+            QueueJob(settings_path=job.settings_path,
+                     name=job.name,
+                     notes=job.notes) for job in self.queue_jobs
+        ]
+        if not self.queue_jobs:
+            self.logger.add_log("キューに測定がありません。", level="WARN")
+            return
+        #画面に入力欄がある変調信号探索の項目は、ファイルになければ画面の値を使う
+        defaults = {
+            "total_duration": self.model.var_total_duration.get(),
+            "measurement_interval": self.model.var_measurement_interval.get()
+        }
+        errors = validate_jobs(self.queue_jobs, self._validate_queue_setting,
+                               defaults)
+        self._refresh_queue_window(rebuild=True)
+        if errors:
+            for index, messages in errors.items():
+                for message in messages:
+                    self.logger.add_log(
+                        f"キュー {index + 1}. {self.queue_jobs[index].name}: {message}",
+                        level="WARN")
+            messagebox.showerror("形式エラー",
+                                 f"{len(errors)}件の設定ファイルに問題があります。ログを確認してください！")
+            self._focus_queue_window()
+            return
+
+        self.queue = MeasurementQueue(self.engine, self.queue_jobs)
+        self.queue_running = True
+        self.change_button_texture()
+        self._refresh_queue_window()
+        self.thread1 = threading.Thread(target=self._run_queue_thread,
+                                        name="MeasurementQueue")
+        self.thread1.start()
+        self.root.after(200, self._poll_queue)
+
+    def _validate_queue_setting(self, data: dict) -> List[str]:
+        """
+        キューの設定ファイルを、画面から測定する場合と同じ内容で検証する。
+        """
+        setting_parms = Setting_Parms.from_dict(data)
+        return [
+            self._error_message(error)
+            for error in self.validate_data(asdict(setting_parms))
+        ]
+
+    def _run_queue_thread(self):
+        """キューの測定を実行する (測定スレッド)。Tkには触れない。"""
+        try:
+            self.queue.run()
+        finally:
+            self.queue_running = False
+
+    def _poll_queue(self):
+        """キューの測定中、ジョブの状態を一定間隔で表示に反映する (メインスレッド専用)。"""
+        self._refresh_queue_window()
+        if self.queue_running:
+            self.root.after(200, self._poll_queue)
+            return
+        self.queue = None
+        self.change_button_texture()
+
+    def queue_skip_cmd(self, index: int):
+        """測定キューのスキップボタンのコマンド。"""
+        if self.queue is not None:
+            self.queue.skip(index)
+        elif index < len(self.queue_jobs):
+            #開始前であればキューから取り除く
+            del self.queue_jobs[index]
+            self._refresh_queue_window(rebuild=True)
+            return
+        self._refresh_queue_window()
+
+    def queue_abort_cmd(self):
+        """測定キューの全中止ボタンのコマンド。"""
+        if self.queue is not None:
+            self.queue.abort()
+            self.logger.add_log("キューの測定を中止しています...", level="STATE")
+        self._refresh_queue_window()
+
+    def start_measurement_thread(self, journal_state=None):
         """
         測定モードに応じて適切な測定メソッドを呼び出す司令塔
+
+        Args:
+            journal_state (JournalState): 指定した場合は、この測定を続きから再開する
         """
         # Modelから現在選択されている測定モードを取得
         measurement_mode = self.model.setting_parms.measurement
+        if journal_state is not None:
+            measurement_mode = journal_state.settings.get("measurement")
         self.logger.add_log(f"測定モード '{measurement_mode}' が選択されました。",
                             level="STATE")
 
-        # モード名と実行するメソッドを辞書で対応付ける
-        measurement_methods = {
-            "ラマン": self.measure_raman,
-            "電場変調ラマン": self.measure_ef_raman,
-            "変調信号探索": self.measure_modulation_search
-        }
-
-        #測定モードとテーブルヘッダーの対応辞書
-        header_definitions = {
-            "ラマン": ("#", "波長 (nm)", "測定値 (V)"),
-            "電場変調ラマン": ("#", "波長 (nm)", "X (V)"),
-            "変調信号探索": ("#", "経過時間 (s)", "位相 (deg)")
-        }
-
-        # 対応するメソッドを取得して実行
-        target_method = measurement_methods.get(measurement_mode)
-        # 未定義の場合はデフォルトのヘッダーを用意
-        headers = header_definitions.get(measurement_mode,
-                                         ("#", "Col_1", "Col_2"))
-
-        if target_method:
-            target_method(headers=headers)  # メソッドを実行
-        else:
-            # 万が一、対応するメソッドがない場合の処理
-            print(f"エラー: 不明な測定モードです - {measurement_mode}")
-            messagebox.showerror("エラー", f"未実装の測定モードです: {measurement_mode}")
-            self.change_button_texture()  # ボタンの状態を元に戻す
+        try:
+            if journal_state is not None:
+                self.engine.resume(journal_state)
+            else:
+                self.engine.run()
+        except Exception as e:
+            #設定・ジャーナル・機器の通信などのエラーで測定できなかった場合
+            self.logger.add_log(f"測定中にエラーが発生しました: {e}", level="ERROR")
+            #eはexceptを抜けると削除されるため、メッセージをここで取り出しておく
+            message = str(e)
+            self.call_in_main(lambda: messagebox.showerror("エラー", message))
+        finally:
+            #エラーで後処理の前に抜けた場合も、状態とボタンを必ず元に戻す
+            if self.state_handler.msrstate != MsrState.default:
+                self.state_handler.update_state(MsrState.default)
+                self.call_in_main(self.change_button_texture)
+
+    def _on_measurement_finish(self):
+        """
+        測定が正常に完了したときにエンジンから呼び出され、グラフを保存する。
+        (call_in_mainを通してメインスレッドで実行される)
+        """
+        self.plot_refresher.sync()
+        self.save_manager.save_matplotlib_figure(
+            "measurement_graph.png", self.view.graph_frame.plot_manager.fig)
+        self.view.graph_frame.canvas.draw()
 
     def finish_button_cmd(self):
         """
         終了ボタンのコマンド
         """
+        from CTkMessagebox import CTkMessagebox
         # CTkMessageboxを使用して確認ダイアログを表示
         msg = CTkMessagebox(
             title="終了確認",
@@ -381,8 +671,11 @@ class Controller():
         response = msg.get()
 
         if response == "はい":
+            # 機器ごとのセッションを終了
+            if self.engine is not None:
+                self.engine.close()
             # GPIBハンドラをクリーンアップ（デバッグモードでない場合）
-            if not DEBUG_MODE:
+            if not DEBUG_MODE and self.gpib_handler is not None:
                 self.gpib_handler.close_all()
 
             # Viewのクローズ処理を呼び出してウィンドウを閉じる
@@ -396,6 +689,10 @@ class Controller():
         中止ボタンのコマンド。
         測定ループを停止させ、途中データの保存を確認する。
         """
+        if self.queue is not None:
+            #キューの測定中は残りの測定もすべて中止する
+            self.queue_abort_cmd()
+            return
         if self.state_handler.msrstate in [MsrState.measure, MsrState.stop]:
             #【変更】状態を「中止」に更新
             self.state_handler.update_state(MsrState.cancel)
@@ -425,12 +722,13 @@ class Controller():
         中止後の確認ダイアログを表示し、保存処理を行うヘルパーメソッド。
         """
         # 測定データがなければ、処理を終了
-        if not self.model.data_container.points:
+        if len(self.model.data_container) == 0:
             self.logger.add_log("測定データが存在しないため、中止処理を終了します。", level="INFO")
             self.state_handler.update_state(MsrState.default)
             self.change_button_texture()
             return
 
+        from CTkMessagebox import CTkMessagebox
         # データを保存するか確認するダイアログを表示
         msg = CTkMessagebox(title="中止確認",
                             message="測定を中止しました。\nここまでのデータを保存しますか？",
@@ -444,6 +742,7 @@ class Controller():
             self.logger.add_log("途中経過のデータを保存しています...", level="INFO")
             self.save_manager.save_data_to_file(
                 "output_canceled.txt", self.model.data_container.points)
+            self.plot_refresher.sync()
             self.save_manager.save_matplotlib_figure(
                 "graph_canceled.png", self.view.graph_frame.plot_manager.fig)
             self.view.graph_frame.canvas.draw()
@@ -455,269 +754,6 @@ class Controller():
         self.state_handler.update_state(MsrState.default)
         self.change_button_texture()
 
-    def interruptible_sleep(self, duration: float) -> bool:
-        """
-        中断可能なsleep処理。
-        指定された時間(duration)、0.1秒ごとに状態をチェックしながら待機する。
-
-        Returns:
-            bool: 待機が完了した場合はTrue、途中で中断された場合はFalseを返す。
-        """
-        end_time = time.time() + duration
-        while time.time() < end_time:
-            # 既存の状態チェックメソッドを呼び出す
-            if not self._check_measurement_status():
-                self.logger.add_log("待機が中断されました。", level="WARN")
-                return False  # 中断されたらFalseを返す
-
-            # 0.1秒だけ待機する
-            time.sleep(0.1)
-
-        return True  # 最後まで待機できたらTrueを返す
-
-    def _check_measurement_status(self) -> bool:
-        """
-        測定ループ内で現在の状態をチェックするヘルパーメソッド。
-        一時停止中の待機と、中止の判定を行う。
-
-        Returns:
-            bool: 測定を継続してよい場合はTrue、中断すべき場合はFalseを返す。
-        """
-        # 一時停止状態(`stop`)なら、測定状態(`measure`)に戻るまで待機する
-        while self.state_handler.msrstate == MsrState.stop:
-            time.sleep(0.1)
-            # GUIが固まらないように更新をかける
-            self.root.update()
-
-        # 測定状態(`measure`)でない場合 (中止された場合など)
-        if self.state_handler.msrstate not in [
-                MsrState.measure, MsrState.stop
-        ]:
-            self.logger.add_log("測定がユーザーによって中断されました。", level="WARN")
-            return False
-
-        # 測定を継続してOK
-        return True
-
-    @measurement_handler
-    def measure_raman(self, headers: tuple, *args, **kwargs):
-        """
-        【プレースホルダー】ラマン測定を実行
-        """
-        #待ち時間を取得
-        wait_time_ms = float(self.model.setting_parms.time_constant)
-        multiplier = int(self.model.setting_parms.time_constant_multiplier)
-        wait_seconds = (wait_time_ms * 10E-4) * multiplier
-        #グラフ描画
-        _MsrData1 = self.model.data_container.MsrData1
-        _flattend_list = [item for sublist in _MsrData1
-                          for item in sublist]  #最大最小用に1次元配列に変換
-
-        for i, wavelength_list in enumerate(_MsrData1):
-            for j, wavelength in enumerate(wavelength_list):
-
-                # 中断すべきならループを抜ける
-                if not self._check_measurement_status():
-                    return
-
-                #------ 測定処理_start ------
-                #波長送り
-                self.scan_wavelength(wavelength)
-                #待機時間
-                if not self.interruptible_sleep(wait_seconds):
-                    return  # 待機が中断されたら、メソッドを終了
-                #測定結果を取得
-                point = MeasurementPoint(
-                    wavelength=wavelength,
-                    dmm_value=self.wait_for_measurement_dmm6500())
-                self.model.data_container.add_point(point)
-                #------ 測定処理_end ------
-
-                #測定データをテーブル出力
-                self.table_manager.add_row(point.wavelength, point.dmm_value)
-                #測定データをロガー出力
-                self.logger.add_log(
-                    f"測定: ({point.wavelength:.2f} nm, {point.dmm_value:.4f} V)",
-                    level="DATA")
-
-                # 中断すべきならループを抜ける(測定後も確認)
-                if not self._check_measurement_status():
-                    return
-
-                #グラフの更新
-                x, y = self.model.data_container.get_plot_data(
-                    'wavelength', 'dmm_value')
-                self.view.graph_frame.plot_manager.plot_data(
-                    x, y, min(_flattend_list), max(_flattend_list))
-
-                #測定データの保存
-                self.save_manager.save_data_to_file(
-                    "output.txt", self.model.data_container.points)
-
-    @measurement_handler
-    def measure_ef_raman(self, headers: tuple, *args, **kwargs):
-        """
-        【プレースホルダー】電場変調ラマン測定を実行
-        """
-        print("--- 電場変調ラマン測定モードが選択されました ---")
-
-        # 時定数と定数の読み込み
-        time_constant_ms = float(self.model.setting_parms.time_constant)
-        multiplier = float(self.model.setting_parms.time_constant_multiplier)
-        wait_seconds = (time_constant_ms * 10E-4) * multiplier
-        #ロックインアンプの設定
-        self.lockin_handler.setup(time_constant_ms * 10E-4)
-
-        #グラフ描画
-        _MsrData1 = self.model.data_container.MsrData1
-        _flattend_list = [item for sublist in _MsrData1
-                          for item in sublist]  #最大最小用に1次元配列に変換
-        for i, wavelength_list in enumerate(_MsrData1):
-            for j, wavelength in enumerate(wavelength_list):
-
-                # 中断すべきならループを抜ける
-                if not self._check_measurement_status():
-                    return
-
-                #------ 測定処理_start ------
-                #波長送り
-                self.scan_wavelength(wavelength)
-                #待機時間
-                self.logger.add_log(f"ロックインアンプ待機中... ({wait_seconds:.2f}s)",
-                                    level="INFO")
-                if not self.interruptible_sleep(wait_seconds):
-                    return  # 待機が中断されたら、メソッドを終了
-                #ロックインアンプの測定データ取得
-                li_data = self.lockin_handler.measure()
-                time.sleep(0.1)
-                #測定結果取得
-                point = MeasurementPoint(
-                    wavelength=wavelength,
-                    dmm_value=self.wait_for_measurement_dmm6500(),
-                    R=li_data["R"],
-                    theta=li_data["theta"],
-                    X=li_data["X"],
-                    Y=li_data["Y"])
-                self.model.data_container.add_point(point)
-                #------ 測定処理_end ------
-
-                #測定データをテーブル出力
-                self.table_manager.add_row(point.wavelength, point.X)
-                #測定データをロガー出力
-                self.logger.add_log(
-                    f"測定: ({point.wavelength:.2f} nm, X:{point.X:.4f} V)",
-                    level="DATA")
-
-                # 中断すべきならループを抜ける(測定後も確認)
-                if not self._check_measurement_status():
-                    return
-
-                #グラフの更新
-                x, y = self.model.data_container.get_plot_data(
-                    'wavelength', 'X')
-                self.view.graph_frame.plot_manager.plot_data(
-                    x, y, min(_flattend_list), max(_flattend_list))
-
-                #測定データの保存
-                self.save_manager.save_data_to_file(
-                    "output.txt", self.model.data_container.points)
-
-    @measurement_handler
-    def measure_modulation_search(self, headers: tuple, *args, **kwargs):
-        """
-        変調信号探索モード。ロックインアンプの位相(θ)の時間変化を測定する。
-        """
-        # --- このモード専用の準備 ---
-        time_constant_ms = float(self.model.setting_parms.time_constant)
-        self.lockin_handler.setup(time_constant_ms * 10E-4)
-
-        # 測定の総時間（秒）を定義
-        total_duration = float(self.model.setting_parms.total_duration)
-        # 測定間隔（秒）
-        interval = float(self.model.setting_parms.measurement_interval)
-
-        start_time = time.time()
-        self.logger.add_log(f"これから{total_duration}秒間、{interval}秒間隔で測定します。",
-                            level="INFO")
-
-        # --- 時間ベースの測定ループ ---
-        while True:
-            current_time = time.time()
-            elapsed_time = current_time - start_time
-
-            # 規定時間に達したらループを終了
-            if elapsed_time >= total_duration:
-                break
-
-            # 状態チェック (一時停止・中止)
-            if not self._check_measurement_status():
-                return
-
-            # --- 測定処理 ---
-            li_data = self.lockin_handler.measure()
-            point = MeasurementPoint(
-                time=elapsed_time,  # 経過時間を記録
-                R=li_data["R"],
-                theta=li_data["theta"],
-                X=li_data["X"],
-                Y=li_data["Y"])
-            self.model.data_container.add_point(point)
-            # -----------------
-
-            # テーブルとログを更新
-            self.table_manager.add_row(point.time, point.theta)
-            self.logger.add_log(
-                f"測定: (Time: {point.time:.2f} s, θ: {point.theta:.4f} deg)",
-                level="DATA")
-
-            # グラフを更新 (X軸: time, Y軸: theta)
-            x, y = self.model.data_container.get_plot_data('time', 'theta')
-            # X軸の範囲を動的に更新
-            self.view.graph_frame.plot_manager.plot_data(
-                x, y, 0, total_duration)
-
-            # データをリアルタイムで保存
-            self.save_manager.save_data_to_file(
-                "output.txt", self.model.data_container.points)
-
-            # 次の測定まで待機
-            time.sleep(interval)
-
-    def wait_for_measurement_dmm6500(self, timeout=30):
-        """
-        Args:
-            dmm6500_alias:pyvisa _instのalias名
-            timeout:タイムアウト時間（秒）
-
-        Returns:
-            float:測定値
-        """
-        start_time = time.time()
-
-        #レスポンス待機
-        while True:
-            raw_response = self.gpib_handler.query(self.alias_DM6500, ":READ?")
-
-            if raw_response is not None:
-                try:
-                    # 文字列から数値への変換を試みる
-                    _value = float(raw_response)
-                    print(_value)
-                    return _value  # 変換に成功したら値を返して終了
-                except ValueError:
-                    # floatへの変換に失敗した場合 (例: "OK1.23"など)
-                    self.logger.add_log(
-                        f"DMM6500から不正な値 '{raw_response}' を受信しました。",
-                        level="WARN")
-
-            #タイムアウトチェック
-            if time.time() - start_time > timeout:
-                self.logger.add_log(f"DMM6500からの読み取りがタイムアウトしました ({timeout}秒)",
-                                    level="ERROR")
-                return -0.1  #ダミーデータ
-
-            time.sleep(0.01)  #10ms間隔でチェック
-
     def sync_wavelength(self):
         """
         分光器の波長を同期するために子ウィンドウを表示して入力された値を連携する
@@ -726,8 +762,9 @@ class Controller():
         _wavelength = self.view.get_child_wavelength()  #入力された波長の値
         self.model.var_spectrometer_wavelength.set(
             _wavelength)  #分光器表示波長ウィジェット変数に代入
-        self.gpib_handler.write("CT-25",
-                                f"WST,{_wavelength}")  #分光器にwriteコマンドを送信
+        #分光器にwriteコマンドを送信 (起動直後は接続の完了後に送信する)
+        self._when_devices_ready(
+            lambda: self.gpib_handler.write("CT-25", f"WST,{_wavelength}"))
         self.root.focus_force()  #メインウィンドウにフォーカス
         print(_wavelength)
 
@@ -738,6 +775,8 @@ class Controller():
         state = self.state_handler.msrstate
         # 測定中かどうかの判定
         is_measuring = state in [MsrState.measure, MsrState.stop]
+        # 機器の接続が完了するまでと、キューの測定中は測定と波長送りを行えない
+        is_blocked = is_measuring or self.engine is None or self.queue_running
 
         #測定中はプルダウンを無効化
         self.view.mode_frame.measurement_combobox.configure(
@@ -749,13 +788,17 @@ class Controller():
 
         #波長送りボタン
         self.view.mode_frame.send_wavelength_button.configure(
-            state="disabled" if is_measuring else "normal",
-            fg_color="#A3A3A3" if is_measuring else "#3B8ED0"  # 通常時の色を指定
+            state="disabled" if is_blocked else "normal",
+            fg_color="#A3A3A3" if is_blocked else "#3B8ED0"  # 通常時の色を指定
         )
         # 測定ボタン
         self.view.control_button_frame.measure_button.configure(
-            state="disabled" if is_measuring else "normal",
-            fg_color="#A3A3A3" if is_measuring else "#34C491")
+            state="disabled" if is_blocked else "normal",
+            fg_color="#A3A3A3" if is_blocked else "#34C491")
+        # 測定再開ボタン
+        self.view.control_button_frame.resume_button.configure(
+            state="disabled" if is_blocked else "normal",
+            fg_color="#A3A3A3" if is_blocked else "#3B8ED0")
         # 終了ボタン
         self.view.control_button_frame.finish_button.configure(
             state="disabled" if is_measuring else "normal",
@@ -805,7 +848,6 @@ class Controller():
             "diffraction": self.view.params_frame.diffraction_combobox
         }
 
-        print(self.model.setting_parms)
         # Noneまたは空文字列を持つパラメータをチェック
         _missing_key = [
             self.model.setting_parms.get_label(key)
@@ -886,22 +928,26 @@ class Controller():
         エラー内容をUIに表示
         """
         for error in errors:
-            if error["type"] == "missing_params":
-                error_message = f"パラメータが未入力です:{', '.join(error['missing_key'])}"
-            elif error["type"] == "invalid_dropdown":
-                error_message = f"プルダウンリストが正しくありません:{', '.join(error['invalid_key'])}"
-            elif error["type"] == "missing_top_input":
-                error_message = f"一番上のテキストボックスから入力してください:{', '.join(error['missing_top_key'])}"
-            elif error["type"] == "non_continuous_input":
-                error_message = f"上から連続して入力してください:{', '.join(error['non_continuous_key'])}"
-            elif error["type"] == "faild_list_length":
-                error_message = f"測定区間に対応付けて各パラメータを設定してください"
+            error_message = self._error_message(error)
 
             #コンソールに出力
             print(error_message)
             #ロガーに出力
             self.logger.add_log(error_message, level="WARN")
 
+    def _error_message(self, error: dict) -> str:
+        """validate_dataのエラー1件を表示用のメッセージにする"""
+        if error["type"] == "missing_params":
+            return f"パラメータが未入力です:{', '.join(error['missing_key'])}"
+        elif error["type"] == "invalid_dropdown":
+            return f"プルダウンリストが正しくありません:{', '.join(error['invalid_key'])}"
+        elif error["type"] == "missing_top_input":
+            return f"一番上のテキストボックスから入力してください:{', '.join(error['missing_top_key'])}"
+        elif error["type"] == "non_continuous_input":
+            return f"上から連続して入力してください:{', '.join(error['non_continuous_key'])}"
+        elif error["type"] == "faild_list_length":
+            return f"測定区間に対応付けて各パラメータを設定してください"
+
     def save_setting_parms(self):
         """
         条件保存ボタンのコマンド
@@ -934,32 +980,7 @@ class Controller():
         """
         読み込んだデータの形式を検証する関数
         """
-        _required_keys = {
-            "measurement": str,
-            "mode": str,
-            "LIamp": str,
-            "time_constant": str,
-            "time_constant_multiplier": str,
-            "measurement_wavelength": List[str],
-            "measurement_section": List[str],
-            "filter": List[str],
-            "diffraction": List[str]
-        }
-
-        for key, expected_type in _required_keys.items():
-            if key not in data:
-                return False
-            # 各値の型が一致しているか
-            if expected_type == str:
-                if not isinstance(data[key], str):
-                    return False
-            elif expected_type == List[str]:
-                if not isinstance(data[key], list):
-                    return False
-                # リスト内の要素がすべて文字列であるか
-                if not all(isinstance(item, str) for item in data[key]):
-                    return False
-        return True
+        return validate_json(data)
 
     def load_setting_parms(self):
         """
@@ -979,6 +1000,14 @@ class Controller():
                 messagebox.showerror("形式エラー", "ファイルの内容を確認してください！")
                 self.root.focus_force()  # ポップアップ終了後にフォーカスを元のウィンドウに戻す
                 return
+        self.apply_setting_data(data)
+
+        self.root.focus_force()  # ポップアップ終了後にフォーカスを元のウィンドウに戻す
+
+    def apply_setting_data(self, data: dict):
+        """
+        設定ファイル(またはジャーナル)から読み込んだ設定を画面とsetting_parmsに反映する
+        """
         #読み込み内容を画面に反映
         self.model.var_measurement.set(data["measurement"])
         self.model.var_mode.set(data["mode"])
@@ -999,28 +1028,41 @@ class Controller():
         for i, var in enumerate(self.model.var_diffraction):
             var.set(data["diffraction"][i] if i <
                     len(data["diffraction"]) else "")
+        #画面に入力欄のない掃引の設定は、ファイルにあればそのまま反映する
+        for key in OPTIONAL_SETTING_KEYS:
+            if key in data:
+                setattr(self.model.setting_parms, key, data[key])
 
-        self.root.focus_force()  # ポップアップ終了後にフォーカスを元のウィンドウに戻す
-
-    def send_wavelength_CT25(self):
+    def send_wavelength_CT25(self, wavelength: str):
         """
         send_wavelength用
         CT25で波長送りを行う
         """
-        while self.gpib_handler.busy_check(self.alias_CT25):
-            time.sleep(1)  #ビジー状態のときは待機する
+        self.ct25_handler.wait_until_idle()  #ビジー状態のときは待機する
+        try:
+            self.ct25_handler.scan(wavelength)
+        except TimeoutError as e:
+            self.logger.add_log(str(e), level="ERROR")
         _display_wavelength = self.gpib_handler.query_bytes(
             self.alias_CT25, "WAV", 16)
-        self.model.var_spectrometer_wavelength.set(_display_wavelength)
+        self.call_in_main(lambda: self.model.var_spectrometer_wavelength.set(
+            _display_wavelength))
 
     def send_wavelength_button_cmd(self):
         """
         波長送りボタンのコマンド
         """
+        if not self._require_devices():
+            return
         _send_wavelength = self.model.var_send_wavelength.get()
-        self.gpib_handler.write(self.alias_CT25, f"SCN,2,{_send_wavelength}")
+        try:
+            float(_send_wavelength)
+        except ValueError:
+            self.logger.add_log(f"送る波長が不正です: '{_send_wavelength}'",
+                                level="WARN")
+            return
         self.thread_send_wavelength = threading.Thread(
-            target=self.send_wavelength_CT25)
+            target=self.send_wavelength_CT25, args=(_send_wavelength,))
         self.thread_send_wavelength.start()
 
 
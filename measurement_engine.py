@@ -0,0 +1,1152 @@
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from dataclasses import fields
+from functools import wraps
+from typing import List
+
+from acquisition_pipeline import AcquisitionPipeline
+from adaptive_scan import AdaptiveSampler, premove_for
+from async_gpib import AsyncGPIBHandler
+from duration_estimator import ETATracker, PhaseCosts, load_history
+from instrument_handlers import CT25Handler, DMM6500Handler, LockinAmpHandler
+from io_trace import tracer
+from model import (OPTIONAL_SETTING_KEYS, Data_Container, MeasurementPoint,
+                   MsrState, Setting_Parms, State_Handler)
+from phase_timer import PhaseTimer
+from run_journal import (JOURNAL_FILENAME, JournalState, RunJournal,
+                         check_resumable)
+from save_manager import SaveManager
+from scan_plan import ScanOrder, ScanPlan, ScanTarget
+from settle_detector import SettleDetector
+from sweep_average import SweepAverager
+
+#測定モードとテーブルヘッダーの対応辞書
+MEASUREMENT_HEADERS = {
+    "ラマン": ("#", "波長 (nm)", "測定値 (V)"),
+    "電場変調ラマン": ("#", "波長 (nm)", "X (V)"),
+    "変調信号探索": ("#", "経過時間 (s)", "位相 (deg)")
+}
+
+#測定モードと測定メソッド名の対応辞書 (ここにない測定モードは実行できない)
+MEASUREMENT_METHODS = {
+    "ラマン": "measure_raman",
+    "電場変調ラマン": "measure_ef_raman",
+    "変調信号探索": "measure_modulation_search"
+}
+
+#掃引順序と待機方法の選択肢
+SCAN_ORDERS = ("forward", "serpentine")
+SETTLE_MODES = ("fixed", "adaptive")
+
+#GPIB機器のアドレス
+DEFAULT_ADDRESSES = {
+    "CT-25": "GPIB0::9::INSTR",
+    "DM6500": "USB0::0x05E6::0x6500::04425756::INSTR",
+    "LI5650": "GPIB0::3::INSTR",
+}
+
+
+class ConsoleLogger:
+    """
+    Loggerと同じadd_logを持ち、ログを標準出力に書き出すクラス。
+    GUIなしで測定エンジンを動かすときに使う。
+    """
+
+    def __init__(self, levels=None):
+        """
+        Args:
+            levels: 表示するログレベルの集合 (Noneの場合はすべて表示)
+        """
+        self.levels = set(levels) if levels is not None else None
+
+    def add_log(self, message: str, level: str = "INFO"):
+        if self.levels is not None and level.upper() not in self.levels:
+            return
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[{timestamp}] [{level.upper()}] {message}", flush=True)
+
+
+def validate_json(data: dict) -> bool:
+    """
+    設定ファイル(setting/*.json)から読み込んだデータの形式を検証する関数
+    """
+    _required_keys = {
+        "measurement": str,
+        "mode": str,
+        "LIamp": str,
+        "time_constant": str,
+        "time_constant_multiplier": str,
+        "measurement_wavelength": List[str],
+        "measurement_section": List[str],
+        "filter": List[str],
+        "diffraction": List[str]
+    }
+
+    #古い設定ファイルにはないため、存在する場合だけ型を確認するキー
+    for key in OPTIONAL_SETTING_KEYS:
+        if key in data and not isinstance(data[key], str):
+            return False
+    for key, expected_type in _required_keys.items():
+        if key not in data:
+            return False
+        # 各値の型が一致しているか
+        if expected_type == str:
+            if not isinstance(data[key], str):
+                return False
+        elif expected_type == List[str]:
+            if not isinstance(data[key], list):
+                return False
+            # リスト内の要素がすべて文字列であるか
+            if not all(isinstance(item, str) for item in data[key]):
+                return False
+    return True
+
+
+def measurement_handler(func):
+    """
+    測定メソッドの前処理と後処理を共通化するためのデコレーター。
+    """
+
+    @wraps(func)
+    def wrapper(self, headers: tuple, *args, **kwargs):
+        # --- ① 測定前の共通準備処理 ---
+        #ロガー出力
+        measurement_mode = self.setting_parms.measurement
+        self.logger.add_log(f"{measurement_mode}測定を開始します。", level="STATE")
+        #headersを受け渡し単位見出しを反映
+        if self.table_manager is not None:
+            self.table_manager.clear_and_set_header(*headers)
+        #波長送り時間と待機時間の記録をリセット
+        self.ct25_handler.reset_statistics()
+        self.settle_times = []
+        #配列のリセット
+        self.data_container.reset_list()
+        #測定横軸配列の作成
+        self.data_container.add_measurement_list(
+            self.setting_parms.measurement_wavelength,
+            self.setting_parms.measurement_section)
+        self.data_container.scan_plan = ScanPlan.from_ranges(
+            self.data_container.measurement_wave_length_list,
+            self.data_container.measurement_section_list,
+            filters=[item for item in self.setting_parms.filter if item],
+            diffractions=[
+                item for item in self.setting_parms.diffraction if item
+            ])
+        self.data_container.MsrData1 = self.data_container.scan_plan.segment_lists(
+        )
+        #測定順序 (掃引回数・往復・バックラッシ補正)
+        self.scan_order = self.build_scan_order(self.data_container.scan_plan)
+        #適応サンプリングと掃引の平均は、波長を掃引する測定だけで行う
+        scanning = measurement_mode in ("ラマン", "電場変調ラマン")
+        #適応サンプリング (粗い刻みで測定し、変化のある所だけ細かくする)
+        self.adaptive_sampler = self.build_adaptive_sampler(
+            self.data_container.scan_plan) if scanning else None
+        if self.adaptive_sampler is not None and len(self.scan_order) > len(
+                self.data_container.scan_plan):
+            self.logger.add_log("適応サンプリングでは掃引は1回だけ行います。",
+                                level="WARN")
+        #掃引を繰り返す場合は、波長ごとの平均と標準誤差を逐次計算する
+        self.sweep_averager = self.build_sweep_averager(
+            self.data_container.scan_plan) if scanning else None
+        #保存用ディレクトリと書き込みセッション、ジャーナルを準備
+        #(再開する場合は測定済みのデータを復元する)
+        self._prepare_run_directory()
+
+        # --- 予想終了時刻の計算とログ出力 ---
+        estimated_duration = 0
+        self.eta_tracker = None
+        try:
+            if measurement_mode in ["ラマン", "電場変調ラマン"]:
+                # 過去の測定の処理時間から学習した各フェーズの時間で見積もる
+                time_constant_ms = float(self.setting_parms.time_constant)
+                multiplier = float(self.setting_parms.time_constant_multiplier)
+                wait_per_point = (time_constant_ms * 10E-4) * multiplier
+                distances = self._remaining_distances()
+                costs = PhaseCosts.fit(
+                    load_history(self.save_manager.base_directory),
+                    measurement_mode, self.setting_parms.settle_mode
+                    or "fixed")
+                estimate = costs.estimate(distances, wait_per_point)
+                self.eta_tracker = ETATracker(
+                    costs.point_costs(distances, wait_per_point))
+                self.logger.add_log(
+                    f"測定順序: {len(self.data_container.scan_plan)}点 × "
+                    f"{self.setting_parms.sweep_count}回, "
+                    f"移動距離 {self.scan_order.travel_distance():.1f} nm "
+                    f"(移動時間の目安 {self.scan_order.travel_time():.1f} s)",
+                    level="INFO")
+                #適応サンプリングでは全点を測定した場合を上限として見積もる
+                prefix = "最大 " if self.adaptive_sampler is not None else ""
+                self.logger.add_log(
+                    f"所要時間の見積もり: {prefix}{estimate.describe()}",
+                    level="INFO")
+                end_time, earliest, latest = estimate.end_times()
+                self.logger.add_log(
+                    f"予想終了時刻: {end_time.strftime('%Y-%m-%d %H:%M:%S')} "
+                    f"(95%: {earliest.strftime('%H:%M:%S')} ～ "
+                    f"{latest.strftime('%H:%M:%S')})",
+                    level="INFO")
+
+            elif measurement_mode == "変調信号探索":
+                # ユーザーが入力した測定総時間をそのまま使用
+                estimated_duration = float(self.setting_parms.total_duration)
+
+            if estimated_duration > 0:
+                end_time = datetime.now() + timedelta(
+                    seconds=estimated_duration)
+                self.logger.add_log(
+                    f"予想終了時刻: {end_time.strftime('%Y-%m-%d %H:%M:%S')}",
+                    level="INFO")
+
+        except Exception as e:
+            self.logger.add_log(f"予想終了時刻の計算中にエラーが発生しました: {e}", level="WARN")
+
+        #各処理の時間の記録を開始
+        self.phase_timer = PhaseTimer()
+        if self.plot_refresher is not None:
+            self.plot_refresher.phase_timer = self.phase_timer
+        #グラフ描画・保存ステージを開始
+        self.pipeline = AcquisitionPipeline(self.save_manager,
+                                            self.data_container,
+                                            self.plot_refresher,
+                                            phase_timer=self.phase_timer)
+        self.pipeline.start()
+
+        # --- ② 本体となる測定メソッドを実行 ---
+        try:
+            func(self, headers, *args, **kwargs)
+        except Exception:
+            #直近の通信内容を事後解析用に保存
+            _save_path = self.save_manager.get_current_save_path()
+            if _save_path:
+                tracer.dump(os.path.join(_save_path, "io_trace.txt"))
+            raise
+        else:
+            #最後まで測定できた場合は、ジャーナルに完了を記録する
+            if self.state_handler.msrstate == MsrState.measure:
+                self.journal.finish()
+        finally:
+            #DMM6500の連続測定を停止
+            self.dmm_handler.stop()
+            #分光器の移動が残っていれば完了を待つ
+            self.ct25_handler.wait_until_idle()
+            #残りのデータを書き込んでからステージを終了
+            self.pipeline.close()
+            #書き込みセッションとジャーナルを閉じる
+            self.save_manager.close_data_stream()
+            self.journal.close()
+            #適応サンプリングの結果は波長順に並べた1本のスペクトルとして保存し直す
+            if self.adaptive_sampler is not None:
+                self._merge_adaptive_result()
+            #掃引の平均を保存
+            if self.sweep_averager is not None:
+                self._save_sweep_average()
+            #各処理の時間を出力ファイルと同じディレクトリに保存
+            self.phase_timer.save(self.save_manager.get_current_save_path(),
+                                  trace=self.phase_trace_export)
+        #実際の波長送り時間を報告
+        if self.ct25_handler.move_durations:
+            self.logger.add_log(self.ct25_handler.summary(), level="INFO")
+        self.logger.add_log(self.phase_timer.summary(), level="INFO")
+        if self.settle_times:
+            self.logger.add_log(
+                f"待機時間 {len(self.settle_times)}点: 平均 "
+                f"{sum(self.settle_times) / len(self.settle_times):.3f} s, "
+                f"最大 {max(self.settle_times):.3f} s", level="INFO")
+
+        # --- ③ 測定後の共通後処理 ---
+        completed = self.state_handler.msrstate == MsrState.measure
+        if completed:
+            # 正常に完了した場合
+            self.state_handler.update_state(MsrState.finish)
+            if self.on_finish is not None:
+                self.on_finish()
+            self.logger.add_log("測定が正常に完了しました。", level="INFO")
+        elif len(self.data_container) > 0 and measurement_mode in (
+                "ラマン", "電場変調ラマン"):
+            self.logger.add_log(
+                "この測定はジャーナルから再開できます: "
+                f"{self.save_manager.get_current_save_path()}",
+                level="INFO")
+
+        # 状態をデフォルトに戻す
+        self.state_handler.update_state(MsrState.default)
+        if self.on_idle is not None:
+            self.on_idle()
+        return completed
+
+    return wrapper
+
+
+class MeasurementEngine:
+    """
+    GUIに依存しない測定エンジン。
+    機器ハンドラ・測定ループ・データ保存をまとめ、GUI(Controller)からも
+    コマンドライン(run_measurement.py)からも同じ処理で測定を行う。
+    グラフとテーブルは、渡された場合にだけ表示元を設定する。
+    """
+
+    def __init__(self,
+                 gpib_handler,
+                 setting_parms: Setting_Parms,
+                 data_container: Data_Container = None,
+                 save_manager: SaveManager = None,
+                 state_handler: State_Handler = None,
+                 logger=None,
+                 table_manager=None,
+                 plot_refresher=None):
+        """
+        Args:
+            gpib_handler: GPIB_Handler(またはシミュレータ)のインスタンス
+            setting_parms (Setting_Parms): 測定条件
+            data_container (Data_Container): 測定データの格納先
+            save_manager (SaveManager): 保存先を管理するSaveManager
+            state_handler (State_Handler): 測定状態 (一時停止・中止の判定に使う)
+            logger: add_log(message, level)を持つロガー (省略時はConsoleLogger)
+            table_manager (DataTableManager): データテーブル (省略可)
+            plot_refresher (PlotRefresher): グラフの更新 (省略可)
+        """
+        self.gpib_handler = gpib_handler
+        self.setting_parms = setting_parms
+        self.data_container = data_container or Data_Container()
+        self.save_manager = save_manager or SaveManager()
+        self.state_handler = state_handler or State_Handler()
+        self.logger = logger or ConsoleLogger()
+        self.table_manager = table_manager
+        self.plot_refresher = plot_refresher
+        self.pipeline = None
+        self.phase_timer = PhaseTimer(enabled=False)
+        #測定ごとにChromeトレース形式(trace.json)も保存するか
+        self.phase_trace_export = False
+        #ラマン測定の測定順序と適応サンプリング (measurement_handlerが測定ごとに作る)
+        self.scan_order: ScanOrder = None
+        self.adaptive_sampler: AdaptiveSampler = None
+        #掃引を繰り返す場合の波長ごとの平均 (measurement_handlerが測定ごとに作る)
+        self.sweep_averager: SweepAverager = None
+        self._average_key = None
+        #待機方法がadaptiveの場合に記録する、各点の実際の待機時間(s)
+        self.settle_times = []
+        #ラマン測定の残り時間の見積もり (measurement_handlerが測定ごとに作る)
+        self.eta_tracker: ETATracker = None
+        #測定の途中経過を記録するジャーナル (measurement_handlerが測定ごとに開く)
+        self.journal: RunJournal = None
+        #再開する測定のジャーナル (resumeが設定する) と、そこから復元した点のレコード
+        self.resume_state: JournalState = None
+        self.restored_points = []
+        self._display_source = None
+        #正常終了時・測定終了時に呼び出す処理 (GUIのグラフ保存やボタン更新など)
+        self.on_finish = None
+        self.on_idle = None
+
+        #機器ごとのセッションで並行して通信するためのハンドラ
+        self.async_gpib = AsyncGPIBHandler(self.gpib_handler)
+        self.lockin_handler = LockinAmpHandler(self.gpib_handler)
+        self.ct25_handler = CT25Handler(self.gpib_handler)
+        self.dmm_handler = DMM6500Handler(self.gpib_handler)
+        #DMM6500の読み値を平均する時間窓(待機時間の末尾, s)
+        self.dmm_window_seconds = 0.2
+        #[変調信号探索]この測定間隔(s)未満ではロックインアンプのデータメモリに取り込む
+        self.capture_interval_threshold = 0.1
+        #[変調信号探索]データメモリから読み出す周期(s)
+        self.capture_read_period = 0.25
+        #[変調信号探索]この回数続けて読み出してもサンプルが増えなければ1点ずつの読み取りに切り替える
+        self.capture_stall_periods = 4
+
+        #GPIB機器のエイリアス
+        self.alias_CT25: str = "CT-25"
+        self.alias_DM6500: str = "DM6500"
+        self.alias_LI5650: str = "LI5650"
+
+    def connect_devices(self, addresses: dict = None):
+        """
+        GPIB機器を接続し、CT-25の初期設定を行う。
+
+        Args:
+            addresses (dict): エイリアスとアドレスの対応 (省略時はDEFAULT_ADDRESSES)
+        """
+        for alias, address in (addresses or DEFAULT_ADDRESSES).items():
+            self.gpib_handler.add_device(alias, address)
+        self.ct25_handler.setup()
+
+    def run(self) -> bool:
+        """
+        setting_parmsの測定モードに応じた測定を実行する。
+        呼び出し側で状態をMsrState.measureにしてから呼ぶこと。
+
+        Returns:
+            bool: 測定が最後まで完了した場合はTrue
+
+        Raises:
+            ValueError: 未定義の測定モードの場合
+        """
+        measurement_mode = self.setting_parms.measurement
+        method_name = MEASUREMENT_METHODS.get(measurement_mode)
+        if method_name is None:
+            raise ValueError(f"未実装の測定モードです: {measurement_mode}")
+        target_method = getattr(self, method_name)
+        # 未定義の場合はデフォルトのヘッダーを用意
+        headers = MEASUREMENT_HEADERS.get(measurement_mode,
+                                          ("#", "Col_1", "Col_2"))
+        return target_method(headers=headers)
+
+    def resume(self, journal_state: JournalState) -> bool:
+        """
+        ジャーナルから中断した測定の設定と測定済みのデータを復元し、
+        次の未測定の波長から測定を再開する。
+        呼び出し側で状態をMsrState.measureにしてから呼ぶこと。
+
+        Args:
+            journal_state (JournalState): load_journalで読み込んだジャーナル
+
+        Returns:
+            bool: 測定が最後まで完了した場合はTrue
+
+        Raises:
+            ValueError: 再開できない測定の場合
+        """
+        check_resumable(journal_state)
+        if not validate_json(journal_state.settings):
+            raise ValueError("ジャーナルの設定の形式が正しくありません。")
+        for setting in fields(self.setting_parms):
+            if setting.name in journal_state.settings:
+                setattr(self.setting_parms, setting.name,
+                        journal_state.settings[setting.name])
+        self.resume_state = journal_state
+        try:
+            return self.run()
+        finally:
+            self.resume_state = None
+
+    def _prepare_run_directory(self):
+        """
+        測定フォルダ・output.txtの書き込みセッション・ジャーナルを準備する。
+        再開する場合は既存のフォルダを使い、測定済みの点をData_Containerに戻して
+        output.txtに書き直す。
+
+        Raises:
+            ValueError: ジャーナルの測定波長が現在の設定から作ったものと一致しない場合
+        """
+        state = self.resume_state
+        if state is None:
+            self.restored_points = []
+            #保存用ディレクトリ準備
+            self.save_manager.create_new_measurement_directory()
+            #設定をファイルに保存する
+            self.save_manager.save_settings_to_file("settings.json",
+                                                    self.setting_parms)
+            #測定データの書き込みセッションを開始
+            self.save_manager.open_data_stream(
+                "output.txt", settings_data=self.setting_parms)
+            self.journal = RunJournal(
+                os.path.join(self.save_manager.get_current_save_path(),
+                             JOURNAL_FILENAME))
+            self.journal.start(self.setting_parms,
+                               self.data_container.scan_plan,
+                               len(self.scan_order) if self.scan_order else 0)
+            return
+
+        scan_plan = self.data_container.scan_plan
+        if (state.grid != scan_plan.wavelengths.tolist()
+                or state.order_length != len(self.scan_order)):
+            raise ValueError("ジャーナルの測定波長が設定から作ったものと一致しません。")
+        self.save_manager.use_existing_directory(state.directory)
+        self.restored_points = state.points
+        for record in self.restored_points:
+            self.data_container.add_point(MeasurementPoint(**record["point"]))
+        #復元した点を書き直してから、続きを追記する
+        self.save_manager.open_data_stream(
+            "output.txt", settings_data=self.setting_parms)
+        self.save_manager.append_data_to_file(self.data_container)
+        self.journal = RunJournal.reopen(state)
+        self.journal.resume(len(self.restored_points))
+        self.logger.add_log(
+            f"ジャーナルから{len(self.restored_points)}点を復元しました。"
+            "続きから測定を再開します。",
+            level="INFO")
+
+    def close(self):
+        """機器ごとのセッションを終了する。"""
+        self.async_gpib.close()
+
+    def _set_display_source(self, x_key: str, y_key: str, x_min, x_max):
+        """グラフとテーブルに表示する列を設定する。"""
+        self._display_source = (x_key, y_key, x_min, x_max)
+        if self.plot_refresher is not None:
+            self.plot_refresher.set_source(self.data_container, x_key, y_key,
+                                           x_min, x_max)
+        if self.table_manager is not None:
+            self.table_manager.set_source(self.data_container, x_key, y_key)
+
+    def build_scan_order(self, scan_plan: ScanPlan) -> ScanOrder:
+        """
+        setting_parmsの掃引順序・掃引回数・バックラッシ補正から測定順序を作る。
+        バックラッシ補正を指定した場合は、すべての点に短波長側から到着させる。
+
+        Raises:
+            ValueError: 設定値が数値でない、または掃引順序が未定義の場合
+        """
+        scan_order = self.setting_parms.scan_order or "forward"
+        if scan_order not in SCAN_ORDERS:
+            raise ValueError(f"未定義の掃引順序です: {scan_order}")
+        backlash = float(self.setting_parms.backlash or 0)
+        return scan_plan.order(sweeps=int(self.setting_parms.sweep_count
+                                          or 1),
+                               serpentine=scan_order == "serpentine",
+                               approach="up" if backlash > 0 else None,
+                               backlash=backlash)
+
+    def _merge_adaptive_result(self):
+        """
+        適応サンプリングで測定順に追記したデータを波長順に並べ替え、
+        output.txtを書き直してグラフとテーブルを描き直す。
+        """
+        sampler = self.adaptive_sampler
+        self.logger.add_log(
+            f"適応サンプリング: 全{len(self.data_container.scan_plan)}点のうち"
+            f"{len(sampler)}点を測定しました。",
+            level="INFO")
+        if len(self.data_container) == 0:
+            return
+        self.data_container.sort_by("wavelength")
+        self.save_manager.save_data_to_file("output.txt",
+                                            self.data_container.points)
+        self.save_manager.save_data_columns("output.txt", self.data_container,
+                                            self.setting_parms)
+        if self._display_source is not None:
+            self._set_display_source(*self._display_source)
+            if self.plot_refresher is not None:
+                self.plot_refresher.request_update()
+
+    def build_adaptive_sampler(self, scan_plan: ScanPlan):
+        """
+        setting_parmsのadaptive_factorが2以上なら適応サンプリングを作る。
+
+        Returns:
+            AdaptiveSampler: 適応サンプリングを行わない場合はNone
+        """
+        factor = int(self.setting_parms.adaptive_factor or 1)
+        if factor <= 1:
+            return None
+        tolerance = self.setting_parms.adaptive_tolerance
+        return AdaptiveSampler(
+            scan_plan,
+            factor,
+            tolerance=None if tolerance in ("", "auto") else float(tolerance))
+
+    def build_sweep_averager(self, scan_plan: ScanPlan):
+        """
+        掃引を2回以上行う場合 (適応サンプリングを除く) は、掃引の平均を計算する
+        SweepAveragerを作る。
+
+        Returns:
+            SweepAverager: 掃引の平均を計算しない場合はNone
+        """
+        if (self.adaptive_sampler is not None or self.scan_order is None
+                or len(self.scan_order) <= len(scan_plan)):
+            return None
+        return SweepAverager(scan_plan.wavelengths)
+
+    def _end_sweep(self) -> bool:
+        """
+        1回分の掃引が終わったときに呼び出し、その時点の平均を保存してログに出力する。
+
+        Returns:
+            bool: 目標標準誤差に達したため、残りの掃引を行わない場合はTrue
+        """
+        averager = self.sweep_averager
+        averager.end_sweep()
+        self._save_sweep_average()
+        worst = averager.max_stderr()
+        self.logger.add_log(
+            f"{averager.sweeps_completed}回目の掃引が終わりました。" +
+            (f"標準誤差の最大値: {worst:.3e} V" if worst is not None else ""),
+            level="INFO")
+        target = float(self.setting_parms.target_stderr or 0)
+        if averager.converged(target):
+            self.logger.add_log(
+                f"標準誤差が目標値 {target:.3e} V 以下になったため、"
+                f"{averager.sweeps_completed}回の掃引で測定を終了します。",
+                level="INFO")
+            return True
+        return False
+
+    def _save_sweep_average(self):
+        """掃引の平均をaverage.txtに保存する。"""
+        self.save_manager.save_columns_to_file(
+            "average.txt",
+            self.sweep_averager.to_columns(self._average_key or "value"))
+
+    def _remaining_distances(self):
+        """
+        これから測定する各点の移動距離(nm)を返す (所要時間の見積もりに使う)。
+        適応サンプリングでは、残りのグリッドを順に測定した場合を上限とする。
+        最初の点は分光器の位置が分からないのでNaNとする。
+        """
+        if self.adaptive_sampler is not None:
+            distances = self.data_container.scan_plan.order().point_distances()
+        else:
+            distances = self.scan_order.point_distances()
+        distances = distances[len(self.restored_points):].copy()
+        if len(distances):
+            distances[0] = float("nan")
+        return distances
+
+    def _scan_targets(self):
+        """
+        測定する点を順にScanTargetとして返すジェネレータ。
+        send()で受け取った (測定値, 標準誤差) は適応サンプリングに渡し、
+        次に測定する点を決める。適応サンプリングでない場合はscan_orderの順に返す。
+        """
+        sampler = self.adaptive_sampler
+        backlash = float(self.setting_parms.backlash or 0)
+        restored = self.restored_points
+        if sampler is None:
+            order = self.scan_order
+            for position in range(len(restored), len(order)):
+                wavelength = float(order.wavelengths[position])
+                premove = float(order.premove[position])
+                if position == len(restored) and restored:
+                    #再開した直後は分光器の位置が分からないので、必要なら寄せてから送る
+                    premove = premove_for(None, wavelength, backlash)
+                yield ScanTarget(wavelength,
+                                 None if premove != premove else premove,
+                                 int(order.grid_index[position]),
+                                 int(order.sweep[position]))
+            return
+        grid = self.data_container.scan_plan.wavelengths
+        #再開した場合は、測定済みの点を同じ順序で登録し直して続きの点を決める
+        for record in restored:
+            index = sampler.next_index()
+            if index is None or float(grid[index]) != record["point"].get(
+                    "wavelength"):
+                raise ValueError("ジャーナルの記録が適応サンプリングの測定順序と一致しません。")
+            sampler.add(index, record["value"], record["sigma"])
+        previous = None
+        index = sampler.next_index()
+        while index is not None:
+            wavelength = float(grid[index])
+            value, sigma = yield ScanTarget(
+                wavelength, premove_for(previous, wavelength, backlash), index,
+                0)
+            sampler.add(index, value, sigma)
+            previous = wavelength
+            index = sampler.next_index()
+
+    def _start_scan_move(self, wavelength: float, premove: float = None):
+        """
+        測定波長への移動を開始する。
+        寄せが必要な点では、まず寄せる波長への移動を開始する。
+        """
+        self.ct25_handler.start_move(wavelength if premove is None else premove)
+
+    def _wait_scan_move(self, wavelength: float, premove: float = None):
+        """
+        _start_scan_moveで開始した移動の完了を待つ。
+        寄せを行った点では、続けて測定波長へ送り、その完了も待つ。
+        """
+        self.ct25_handler.wait_for_move()
+        if premove is not None:
+            self.ct25_handler.start_move(wavelength)
+            self.ct25_handler.wait_for_move()
+
+    def settle(self,
+               wait_seconds: float,
+               sample=None,
+               window: float = 0.0):
+        """
+        各点の待機を行い、実際に待機した時間を返す。
+        待機方法がadaptiveでsampleが渡された場合は、待機中にsample()で読み値を取り、
+        信号が落ち着いた時点で待機を打ち切る。待機時間の上限はwait_seconds、
+        下限は時定数のsettle_floor倍 (ただしwait_secondsを超えない)。
+
+        Args:
+            wait_seconds (float): 固定の待機時間(s)
+            sample: 読み値を (読み値の配列, 時刻の配列) として返す関数
+            window (float): 落ち着いたかを判定する時間窓の長さ(s)
+
+        Returns:
+            float: 実際の待機時間(s)。待機が中断された場合はNone
+        """
+        start = time.perf_counter()
+        if sample is None or self.setting_parms.settle_mode != "adaptive":
+            if not self.interruptible_sleep(wait_seconds):
+                return None
+            return time.perf_counter() - start
+
+        time_constant = float(self.setting_parms.time_constant) * 10E-4
+        floor = min(wait_seconds,
+                    time_constant * float(self.setting_parms.settle_floor or 0))
+        detector = SettleDetector(
+            start,
+            window,
+            tolerance=float(self.setting_parms.settle_tolerance or 2))
+        poll_interval = min(max(window / 5, 0.01), 0.1)
+        while True:
+            elapsed = time.perf_counter() - start
+            if elapsed >= wait_seconds:
+                return elapsed
+            detector.add(*sample())
+            if elapsed >= floor and detector.settled():
+                return time.perf_counter() - start
+            if not self.interruptible_sleep(
+                    min(poll_interval, wait_seconds - elapsed)):
+                return None
+
+    def interruptible_sleep(self, duration: float) -> bool:
+        """
+        中断可能なsleep処理。
+        指定された時間(duration)待機する。中止されるとすぐに待機を終え、
+        一時停止中は再開されるまで待つ。
+
+        Returns:
+            bool: 待機が完了した場合はTrue、途中で中断された場合はFalseを返す。
+        """
+        if not self.state_handler.sleep(duration):
+            self.logger.add_log("待機が中断されました。", level="WARN")
+            return False  # 中断されたらFalseを返す
+
+        return True  # 最後まで待機できたらTrueを返す
+
+    def _check_measurement_status(self) -> bool:
+        """
+        測定ループ内で現在の状態をチェックするヘルパーメソッド。
+        一時停止中の待機と、中止の判定を行う。
+
+        Returns:
+            bool: 測定を継続してよい場合はTrue、中断すべき場合はFalseを返す。
+        """
+        # 一時停止状態(`stop`)なら、再開または中止されるまで待機し、
+        # 測定状態(`measure`)でない場合 (中止された場合など) は中断する
+        if not self.state_handler.wait_while_paused():
+            self.logger.add_log("測定がユーザーによって中断されました。", level="WARN")
+            return False
+
+        # 測定を継続してOK
+        return True
+
+    @measurement_handler
+    def measure_raman(self, headers: tuple, *args, **kwargs):
+        """
+        【プレースホルダー】ラマン測定を実行
+        """
+        #待ち時間を取得
+        wait_time_ms = float(self.setting_parms.time_constant)
+        multiplier = int(self.setting_parms.time_constant_multiplier)
+        wait_seconds = (wait_time_ms * 10E-4) * multiplier
+        #グラフ・テーブルの表示元
+        scan_plan = self.data_container.scan_plan
+        self._set_display_source('wavelength', 'dmm_value', scan_plan.lower,
+                                 scan_plan.upper)
+        #DMM6500のバッファへの連続測定を開始
+        self.dmm_handler.start_continuous()
+
+        def read_point(wavelength: float, settle_start: float):
+            #測定結果を取得
+            dmm_stats = self.read_dmm6500(settle_start)
+            point = MeasurementPoint(wavelength=wavelength,
+                                     dmm_value=dmm_stats["mean"])
+            sigma = dmm_stats["std"] / math.sqrt(dmm_stats["n"])
+            message = (f"測定: ({point.wavelength:.2f} nm, {point.dmm_value:.4f} V, "
+                       f"σ={dmm_stats['std']:.2e} V, n={dmm_stats['n']})")
+            return point, sigma, message
+
+        #待機中はDMM6500のバッファの読み値で信号が落ち着いたかを判定する
+        self._wavelength_scan(
+            read_point,
+            "dmm_value",
+            wait_seconds,
+            settle_sample=self.dmm_handler.fetch
+            if self.dmm_handler.active else None,
+            settle_window=self.dmm_window_seconds)
+
+    @measurement_handler
+    def measure_ef_raman(self, headers: tuple, *args, **kwargs):
+        """
+        【プレースホルダー】電場変調ラマン測定を実行
+        """
+
+        # 時定数と定数の読み込み
+        time_constant_ms = float(self.setting_parms.time_constant)
+        multiplier = float(self.setting_parms.time_constant_multiplier)
+        wait_seconds = (time_constant_ms * 10E-4) * multiplier
+        #ロックインアンプの設定
+        self.lockin_handler.setup(time_constant_ms * 10E-4)
+
+        #グラフ・テーブルの表示元
+        scan_plan = self.data_container.scan_plan
+        self._set_display_source('wavelength', 'X', scan_plan.lower,
+                                 scan_plan.upper)
+        #DMM6500のバッファへの連続測定を開始
+        self.dmm_handler.start_continuous()
+
+        def read_point(wavelength: float, settle_start: float):
+            #ロックインアンプ(GPIB)とDMM6500(USB)の読み取りを並行して行う
+            li_data, dmm_stats = self.async_gpib.gather_sync(
+                self.async_gpib.run(self.alias_LI5650,
+                                    self.lockin_handler.measure),
+                self.async_gpib.run(self.alias_DM6500, self.read_dmm6500,
+                                    settle_start))
+            point = MeasurementPoint(wavelength=wavelength,
+                                     dmm_value=dmm_stats["mean"],
+                                     R=li_data["R"],
+                                     theta=li_data["theta"],
+                                     X=li_data["X"],
+                                     Y=li_data["Y"])
+            #ロックインアンプの読み値は1回だけなので標準誤差は分からない
+            message = f"測定: ({point.wavelength:.2f} nm, X:{point.X:.4f} V)"
+            return point, 0.0, message
+
+        def sample_lockin():
+            li_data = self.async_gpib.run_sync(
+                self.async_gpib.run(self.alias_LI5650,
+                                    self.lockin_handler.measure))
+            return [li_data["X"]], [time.perf_counter()]
+
+        #待機中はロックインアンプの出力(X)で信号が落ち着いたかを判定する
+        self._wavelength_scan(
+            read_point,
+            "X",
+            wait_seconds,
+            wait_message=f"ロックインアンプ待機中... ({wait_seconds:.2f}s)",
+            settle_sample=sample_lockin,
+            settle_window=time_constant_ms * 10E-4)
+
+    def _wavelength_scan(self,
+                         read_point,
+                         value_key: str,
+                         wait_seconds: float,
+                         wait_message: str = None,
+                         settle_sample=None,
+                         settle_window: float = 0.0):
+        """
+        ラマン測定・電場変調ラマン測定で共通の波長掃引ループ。
+        測定する波長は_scan_targetsから受け取り、1点の読み取りが終わるとすぐに
+        次の波長への移動を開始してから、データの格納・描画・ログ出力を行う。
+
+        Args:
+            read_point: read_point(wavelength, settle_start)で1点を読み取り、
+                (MeasurementPoint, 標準誤差, ログメッセージ) を返す関数
+            value_key (str): 適応サンプリングで変化を調べ、掃引の平均を計算する列名
+            wait_seconds (float): 各点の待機時間(s)
+            wait_message (str): 待機の前に出力するログ (省略可)
+            settle_sample: 待機方法がadaptiveの場合に、待機中の読み値を
+                (読み値, 時刻) として返す関数 (省略時は固定時間だけ待機する)
+            settle_window (float): 落ち着いたかを判定する時間窓の長さ(s)
+        """
+        timer = self.phase_timer
+        averager = self.sweep_averager
+        if averager is not None:
+            self._average_key = value_key
+            #再開した場合は、復元した点を掃引の平均に加え直す
+            order = self.scan_order
+            for position, record in enumerate(self.restored_points):
+                averager.add(int(order.grid_index[position]), record["value"])
+                if (position + 1 < len(order)
+                        and order.sweep[position + 1] != order.sweep[position]):
+                    averager.end_sweep()
+            #グラフには掃引の平均と標準誤差の帯を表示する
+            if self.plot_refresher is not None:
+                self.plot_refresher.set_average(averager)
+            self.logger.add_log(
+                f"掃引の平均: 最大{self.setting_parms.sweep_count}回 "
+                f"(目標標準誤差 {self.setting_parms.target_stderr} V)",
+                level="INFO")
+        #再開した場合は、復元した点をグラフとテーブルに表示する
+        if len(self.data_container) > 0:
+            self.pipeline.publish()
+        targets = self._scan_targets()
+        current = next(targets, None)
+        if current is None:
+            return
+        #最初の波長への移動を開始
+        with timer.span("start_move"):
+            self._start_scan_move(current.wavelength, current.premove)
+        tracker = self.eta_tracker
+        if tracker is not None:
+            tracker.start()
+        index = len(self.restored_points)
+        #直前の測定波長 (再開した直後は分光器の位置が分からないのでNone)
+        previous = None
+        while current is not None:
+
+            # 中断すべきならループを抜ける
+            if not self._check_measurement_status():
+                return
+
+            #------ 測定処理_start ------
+            wavelength = current.wavelength
+            #寄せを含めた移動距離を記録する (所要時間の見積もりの学習に使う)
+            distance = None
+            if previous is not None:
+                via = wavelength if current.premove is None else current.premove
+                distance = abs(via - previous) + abs(wavelength - via)
+            timer.begin_point(index, wavelength, distance)
+            #波長送りの完了待ち
+            with timer.span("scan"):
+                self._wait_scan_move(wavelength, current.premove)
+            settle_start = time.perf_counter()
+            #待機時間
+            if wait_message:
+                with timer.span("log"):
+                    self.logger.add_log(wait_message, level="INFO")
+            with timer.span("settle"):
+                settle_time = self.settle(wait_seconds, settle_sample,
+                                          settle_window)
+                if settle_time is None:
+                    return  # 待機が中断されたら、メソッドを終了
+            #測定結果を取得
+            with timer.span("read"):
+                point, sigma, message = read_point(wavelength, settle_start)
+            if self.setting_parms.settle_mode == "adaptive":
+                point.settle_time = settle_time
+                self.settle_times.append(settle_time)
+            #読み取りが終わったら、すぐに次の波長への移動を開始する
+            value = getattr(point, value_key)
+            try:
+                upcoming = targets.send((value, sigma))
+            except StopIteration:
+                upcoming = None
+            if averager is not None:
+                averager.add(current.grid_index, value)
+                #掃引の区切りで、目標標準誤差に達していれば残りの掃引を行わない
+                if upcoming is None or upcoming.sweep != current.sweep:
+                    if self._end_sweep() and upcoming is not None:
+                        targets.close()
+                        upcoming = None
+            if upcoming is not None:
+                with timer.span("start_move"):
+                    self._start_scan_move(upcoming.wavelength,
+                                          upcoming.premove)
+            with timer.span("store"):
+                self.data_container.add_point(point)
+                #異常終了しても続きから再開できるよう、1点ごとにジャーナルへ書き込む
+                self.journal.record_point(point, value, sigma)
+            #------ 測定処理_end ------
+
+            #グラフの更新と測定データの保存は別ステージで行う
+            with timer.span("publish"):
+                self.pipeline.publish()
+            #測定データをロガー出力
+            with timer.span("log"):
+                self.logger.add_log(message, level="DATA")
+                #残り時間の見積もりを実際にかかった時間で更新する
+                if tracker is not None:
+                    tracker.point_done()
+                    progress = tracker.progress_message()
+                    if progress:
+                        self.logger.add_log(progress, level="INFO")
+
+            # 中断すべきならループを抜ける(測定後も確認)
+            if not self._check_measurement_status():
+                return
+            previous = wavelength
+            current = upcoming
+            index += 1
+
+    @measurement_handler
+    def measure_modulation_search(self, headers: tuple, *args, **kwargs):
+        """
+        変調信号探索モード。ロックインアンプの位相(θ)の時間変化を測定する。
+        """
+        # --- このモード専用の準備 ---
+        time_constant_ms = float(self.setting_parms.time_constant)
+        self.lockin_handler.setup(time_constant_ms * 10E-4)
+
+        # 測定の総時間（秒）を定義
+        total_duration = float(self.setting_parms.total_duration)
+        # 測定間隔（秒）
+        interval = float(self.setting_parms.measurement_interval)
+
+        self._set_display_source('time', 'theta', 0, total_duration)
+
+        start_time = time.time()
+        self.logger.add_log(f"これから{total_duration}秒間、{interval}秒間隔で測定します。",
+                            level="INFO")
+
+        # 測定間隔が短い場合は、データメモリへの高速取り込みで測定する
+        # (取り込みが止まった場合は、残りの時間を1点ずつの読み取りで測定する)
+        if (interval < self.capture_interval_threshold
+                and self._start_lockin_capture(interval, total_duration)):
+            try:
+                finished = self._capture_modulation_search(total_duration)
+            finally:
+                self.lockin_handler.stop_capture()
+            if finished:
+                return
+
+        # --- 時間ベースの測定ループ ---
+        timer = self.phase_timer
+        while True:
+            current_time = time.time()
+            elapsed_time = current_time - start_time
+
+            # 規定時間に達したらループを終了
+            if elapsed_time >= total_duration:
+                break
+
+            # 状態チェック (一時停止・中止)
+            if not self._check_measurement_status():
+                return
+
+            # --- 測定処理 ---
+            timer.begin_point(len(self.data_container))
+            with timer.span("read_lockin"):
+                li_data = self.lockin_handler.measure()
+            with timer.span("store"):
+                point = MeasurementPoint(
+                    time=elapsed_time,  # 経過時間を記録
+                    R=li_data["R"],
+                    theta=li_data["theta"],
+                    X=li_data["X"],
+                    Y=li_data["Y"])
+                self.data_container.add_point(point)
+            # -----------------
+
+            # グラフの更新とデータの保存は別ステージで行う
+            with timer.span("publish"):
+                self.pipeline.publish()
+            # ログを更新
+            with timer.span("log"):
+                self.logger.add_log(
+                    f"測定: (Time: {point.time:.2f} s, θ: {point.theta:.4f} deg)",
+                    level="DATA")
+
+            # 次の測定まで待機 (中止されたらすぐに終了する)
+            with timer.span("settle"):
+                if not self.interruptible_sleep(interval):
+                    return
+
+    def _start_lockin_capture(self, interval: float,
+                              total_duration: float) -> bool:
+        """
+        [変調信号探索] ロックインアンプのデータメモリへの取り込みを開始する。
+        測定時間分のサンプルがデータメモリに収まらない場合は開始しない。
+
+        Returns:
+            bool: 開始できた場合はTrue
+        """
+        sample_rate = 1.0 / interval
+        if not self.lockin_handler.capture_fits(sample_rate, total_duration):
+            self.logger.add_log(
+                f"{total_duration}秒分のサンプルがロックインアンプのデータメモリ"
+                f"({LockinAmpHandler.CAPTURE_MEMORY_POINTS}点)に収まらないため、"
+                "1点ずつ読み取ります。",
+                level="WARN")
+            return False
+        if not self.lockin_handler.start_capture(sample_rate):
+            self.logger.add_log("ロックインアンプのデータメモリへの取り込みを開始できませんでした。1点ずつの読み取りに切り替えます。",
+                                level="WARN")
+            return False
+        return True
+
+    def _capture_modulation_search(self, total_duration: float) -> bool:
+        """
+        [変調信号探索] ロックインアンプのデータメモリに取り込んだサンプルを
+        一定周期でまとめて読み出し、タイムスタンプ付きの配列として格納する。
+
+        Returns:
+            bool: 規定時間分のサンプルが揃った(または中止された)場合はTrue。
+                サンプルが届かなくなった場合はFalse
+        """
+        self.logger.add_log("ロックインアンプのデータメモリへの高速取り込みで測定します。",
+                            level="INFO")
+        timer = self.phase_timer
+        stalled_periods = 0
+        while True:
+            timer.begin_point(len(self.data_container))
+            # 状態チェック (一時停止・中止) を兼ねて次の読み出しまで待機
+            with timer.span("settle"):
+                if not self.interruptible_sleep(self.capture_read_period):
+                    return True
+
+            with timer.span("read_lockin"):
+                data = self.lockin_handler.read_capture()
+            # 機器が取り込みを止めた場合は、1点ずつの読み取りに切り替える
+            if len(data["time"]) == 0:
+                stalled_periods += 1
+                if stalled_periods >= self.capture_stall_periods:
+                    self.logger.add_log(
+                        f"ロックインアンプのデータメモリに{stalled_periods}回続けて"
+                        "サンプルが届きませんでした。1点ずつの読み取りに切り替えます。",
+                        level="WARN")
+                    return False
+                continue
+            stalled_periods = 0
+            in_range = data["time"] < total_duration
+            count = int(in_range.sum())
+            if count:
+                with timer.span("store"):
+                    self.data_container.add_columns(
+                        **{key: values[in_range]
+                           for key, values in data.items()})
+                # グラフの更新とデータの保存は別ステージで行う
+                with timer.span("publish"):
+                    self.pipeline.publish()
+                self.logger.add_log(
+                    f"測定: {count}点取得 (Time: {data['time'][in_range][-1]:.3f} s, "
+                    f"θ: {data['theta'][in_range][-1]:.4f} deg)",
+                    level="DATA")
+
+            # 規定時間分のサンプルが揃ったら終了
+            if data["time"][-1] >= total_duration:
+                return True
+
+    def read_dmm6500(self, settle_start: float) -> dict:
+        """
+        待機時間の末尾(dmm_window_seconds)に入るDMM6500の読み値の統計を返す。
+        バッファ測定が使えない場合は:READ?で1点だけ読み取る。
+
+        Args:
+            settle_start: 待機を開始した時刻(time.perf_counter)
+
+        Returns:
+            dict: {"mean", "std", "n"}
+        """
+        if self.dmm_handler.active:
+            window_end = time.perf_counter()
+            window_start = max(settle_start,
+                               window_end - self.dmm_window_seconds)
+            stats = self.dmm_handler.read_window(window_start, window_end)
+            if stats is not None:
+                return stats
+            self.logger.add_log("DMM6500のバッファから読み値を取得できませんでした。1点ずつの読み取りに切り替えます。",
+                                level="WARN")
+            self.dmm_handler.stop()
+        return {"mean": self.wait_for_measurement_dmm6500(), "std": 0.0, "n": 1}
+
+    def wait_for_measurement_dmm6500(self, timeout=30):
+        """
+        Args:
+            dmm6500_alias:pyvisa _instのalias名
+            timeout:タイムアウト時間（秒）
+
+        Returns:
+            float:測定値
+        """
+        start_time = time.time()
+
+        #レスポンス待機
+        while True:
+            raw_response = self.gpib_handler.query(self.alias_DM6500, ":READ?")
+
+            if raw_response is not None:
+                try:
+                    # 文字列から数値への変換を試みる
+                    _value = float(raw_response)
+                    return _value  # 変換に成功したら値を返して終了
+                except ValueError:
+                    # floatへの変換に失敗した場合 (例: "OK1.23"など)
+                    self.logger.add_log(
+                        f"DMM6500から不正な値 '{raw_response}' を受信しました。",
+                        level="WARN")
+
+            #タイムアウトチェック
+            if time.time() - start_time > timeout:
+                self.logger.add_log(f"DMM6500からの読み取りがタイムアウトしました ({timeout}秒)",
+                                    level="ERROR")
+                return -0.1  #ダミーデータ
+
+            time.sleep(0.01)  #10ms間隔でチェック
+
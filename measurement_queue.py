@@ -0,0 +1,317 @@
+"""
+複数の設定ファイルを順番に測定する測定キュー。
+
+キューファイル(JSON)の形式:
+    [
+        {"settings": "setting/HeNe.json", "name": "HeNe 校正", "notes": ""},
+        {"settings": "setting/Si.json", "name": "Si 1回目"}
+    ]
+settingsの相対パスはキューファイルのあるフォルダからの相対パスとして扱う。
+
+すべての設定ファイルを測定前にまとめて検証し、1つでも不正なものがあれば
+測定を始めない。測定は同じMeasurementEngine (同じ機器のセッション) で続けて行い、
+結果はジョブごとに別の測定フォルダに保存される。
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, fields
+from typing import Callable, Dict, List, Optional
+
+from measurement_engine import (MEASUREMENT_METHODS, SCAN_ORDERS,
+                                SETTLE_MODES, MeasurementEngine, validate_json)
+from model import MsrState, Setting_Parms
+from scan_plan import ScanPlan
+
+#ジョブの状態
+JOB_PENDING = "待機中"
+JOB_RUNNING = "測定中"
+JOB_DONE = "完了"
+JOB_CANCELED = "中止"
+JOB_SKIPPED = "スキップ"
+JOB_FAILED = "エラー"
+
+
+@dataclass
+class QueueJob:
+    """測定キューの1件分の測定。"""
+    settings_path: str  #設定ファイルのパス
+    name: str  #測定名
+    notes: str = ""  #測定メモ
+    status: str = JOB_PENDING  #状態
+    run_directory: Optional[str] = None  #測定フォルダ
+    message: str = ""  #エラーなどの補足
+    skip_requested: bool = False  #スキップが要求されたか
+    setting_data: Optional[dict] = None  #検証済みの設定ファイルの内容
+
+
+def load_queue_file(path: str) -> List[QueueJob]:
+    """
+    キューファイルを読み込んでジョブのリストを返す。
+
+    Raises:
+        ValueError: キューファイルの形式が不正な場合
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"キューファイルの形式が正しくありません: {path}")
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for number, entry in enumerate(data, start=1):
+        if (not isinstance(entry, dict)
+                or not isinstance(entry.get("settings"), str)
+                or not isinstance(entry.get("name"), str)
+                or not entry["name"]):
+            raise ValueError(
+                f"キューファイルの{number}件目には設定ファイル(settings)と"
+                f"測定名(name)が必要です: {path}")
+        jobs.append(
+            QueueJob(settings_path=os.path.join(base, entry["settings"]),
+                     name=entry["name"],
+                     notes=str(entry.get("notes", ""))))
+    return jobs
+
+
+def check_setting_data(data: dict) -> List[str]:
+    """
+    設定ファイルの内容を、測定を始めずに確認できる範囲で検証する。
+
+    Returns:
+        List[str]: エラーメッセージのリスト (問題がなければ空)
+    """
+    if not validate_json(data):
+        return ["設定ファイルの形式が正しくありません。"]
+    setting_parms = Setting_Parms.from_dict(data)
+    if setting_parms.measurement not in MEASUREMENT_METHODS:
+        return [f"未実装の測定モードです: {setting_parms.measurement}"]
+    try:
+        float(setting_parms.time_constant)
+        float(setting_parms.time_constant_multiplier)
+        if setting_parms.measurement == "変調信号探索":
+            if (not setting_parms.total_duration
+                    or not setting_parms.measurement_interval):
+                return ["変調信号探索には測定総時間と測定間隔を設定してください。"]
+            if (float(setting_parms.total_duration) <= 0
+                    or float(setting_parms.measurement_interval) <= 0):
+                return ["測定総時間と測定間隔は正の数にしてください。"]
+        else:
+            wavelengths = [
+                float(item) for item in setting_parms.measurement_wavelength
+                if item
+            ]
+            sections = [
+                float(item) for item in setting_parms.measurement_section
+                if item
+            ]
+            if len(wavelengths) < 2 or len(sections) != len(wavelengths) - 1:
+                return ["測定区間に対応付けて測定波長と測定間隔を設定してください。"]
+            ScanPlan.from_ranges(wavelengths, sections)
+    except ValueError as e:
+        return [f"数値が正しくありません: {e}"]
+    return check_optional_settings(setting_parms)
+
+
+def check_optional_settings(setting_parms: Setting_Parms) -> List[str]:
+    """
+    設定ファイルにだけある設定(OPTIONAL_SETTING_KEYS)を、MeasurementEngineと同じ方法で
+    数値に変換して範囲を確認する。空欄は既定値として扱う。
+
+    Returns:
+        List[str]: エラーメッセージのリスト (問題がなければ空)
+    """
+    errors = []
+    if setting_parms.scan_order and setting_parms.scan_order not in SCAN_ORDERS:
+        errors.append(f"未定義の掃引順序です: {setting_parms.scan_order}")
+    if (setting_parms.settle_mode
+            and setting_parms.settle_mode not in SETTLE_MODES):
+        errors.append(f"未定義の待機方法です: {setting_parms.settle_mode}")
+    #(キー, 変換する型, 下限, 下限を含むか)
+    numeric_keys = (
+        ("sweep_count", int, 1, True),
+        ("adaptive_factor", int, 1, True),
+        ("backlash", float, 0, True),
+        ("settle_floor", float, 0, True),
+        ("settle_tolerance", float, 0, False),
+        ("target_stderr", float, 0, True),
+    )
+    for key, convert, lower, inclusive in numeric_keys:
+        text = getattr(setting_parms, key)
+        if not text:
+            continue
+        try:
+            value = convert(text)
+        except ValueError:
+            errors.append(f"{key}の値が正しくありません: {text}")
+            continue
+        if value < lower or (value == lower and not inclusive):
+            sign = "以上" if inclusive else "より大きい値"
+            errors.append(f"{key}は{lower}{sign}にしてください: {text}")
+    tolerance = setting_parms.adaptive_tolerance
+    if tolerance not in ("", "auto"):
+        try:
+            if float(tolerance) <= 0:
+                errors.append(
+                    f"adaptive_toleranceは0より大きい値にしてください: {tolerance}")
+        except ValueError:
+            errors.append(f"adaptive_toleranceの値が正しくありません: {tolerance}")
+    return errors
+
+
+def validate_jobs(jobs: List[QueueJob],
+                  validator: Callable[[dict], List[str]] = None,
+                  defaults: Dict[str, str] = None) -> Dict[int, List[str]]:
+    """
+    すべてのジョブの設定ファイルを読み込んで検証する。
+    問題のないジョブはsetting_dataに内容を保持する。
+
+    Args:
+        jobs (List[QueueJob]): 検証するジョブ
+        validator: 設定の辞書を受け取り、エラーメッセージのリストを返す追加の検証 (省略可)
+        defaults: 設定ファイルにない(または空欄の)項目に使う値 (省略可)
+
+    Returns:
+        Dict[int, List[str]]: ジョブの番号をキーとしたエラーメッセージ (問題がなければ空)
+    """
+    errors = {}
+    for index, job in enumerate(jobs):
+        try:
+            with open(job.settings_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            errors[index] = [f"設定ファイルを読み込めません: {e}"]
+            continue
+        if isinstance(data, dict):
+            for key, value in (defaults or {}).items():
+                if not data.get(key):
+                    data[key] = value
+        messages = check_setting_data(data)
+        if not messages and validator is not None:
+            messages = validator(data)
+        if messages:
+            errors[index] = messages
+        else:
+            job.setting_data = data
+    return errors
+
+
+class MeasurementQueue:
+    """
+    ジョブのリストを順番に測定するクラス。
+    runは測定スレッドで呼び出し、skipとabortは他のスレッド(GUIなど)から呼び出せる。
+    """
+
+    def __init__(self,
+                 engine: MeasurementEngine,
+                 jobs: List[QueueJob],
+                 on_change: Callable[[], None] = None):
+        """
+        Args:
+            engine (MeasurementEngine): 機器の接続が完了した測定エンジン
+            jobs (List[QueueJob]): validate_jobsで検証済みのジョブ (この順に測定する)
+            on_change: ジョブの状態が変わるたびに測定スレッドから呼び出す処理 (省略可)
+        """
+        self.engine = engine
+        self.jobs = jobs
+        self.on_change = on_change
+        #測定中のジョブの番号 (測定中でなければNone)
+        self.current: Optional[int] = None
+        self._aborted = False
+        self._lock = threading.Lock()
+
+    def run(self) -> bool:
+        """
+        待機中のジョブを順番に測定する。
+
+        Returns:
+            bool: スキップしたものを除くすべてのジョブが完了した場合はTrue
+        """
+        logger = self.engine.logger
+        state_handler = self.engine.state_handler
+        all_completed = True
+        total = len(self.jobs)
+        for index, job in enumerate(self.jobs):
+            with self._lock:
+                #スキップ・中止されたジョブは測定しない
+                if job.status != JOB_PENDING:
+                    continue
+                self.current = index
+                job.status = JOB_RUNNING
+                state_handler.update_state(MsrState.measure)
+            self._notify()
+            logger.add_log(
+                f"キュー {index + 1}/{total}: {job.name} "
+                f"({os.path.basename(job.settings_path)})",
+                level="STATE")
+            self._apply_settings(job)
+            previous_directory = self.engine.save_manager.current_save_path
+            try:
+                completed = self.engine.run()
+            except Exception as e:
+                completed = False
+                job.message = str(e)
+                logger.add_log(f"キューの測定中にエラーが発生しました: {e}",
+                               level="ERROR")
+                state_handler.update_state(MsrState.default)
+            if self.engine.save_manager.current_save_path != previous_directory:
+                job.run_directory = self.engine.save_manager.current_save_path
+            with self._lock:
+                self.current = None
+                if completed:
+                    job.status = JOB_DONE
+                elif job.message:
+                    job.status = JOB_FAILED
+                elif job.skip_requested:
+                    job.status = JOB_SKIPPED
+                else:
+                    job.status = JOB_CANCELED
+            all_completed = all_completed and (completed
+                                               or job.status == JOB_SKIPPED)
+            self._notify()
+        counts = []
+        for status in (JOB_DONE, JOB_SKIPPED, JOB_CANCELED, JOB_FAILED):
+            count = sum(job.status == status for job in self.jobs)
+            if count:
+                counts.append(f"{status} {count}件")
+        logger.add_log(f"キューの測定が終わりました: {', '.join(counts)}",
+                       level="INFO")
+        return all_completed and not self._aborted
+
+    def _apply_settings(self, job: QueueJob):
+        """ジョブの設定を測定エンジンのsetting_parmsに反映する (ない項目は既定値に戻す)。"""
+        setting_parms = Setting_Parms.from_dict(job.setting_data,
+                                                name=job.name,
+                                                notes=job.notes)
+        for setting in fields(setting_parms):
+            setattr(self.engine.setting_parms, setting.name,
+                    getattr(setting_parms, setting.name))
+
+    def skip(self, index: int):
+        """
+        ジョブをスキップする。測定中のジョブであれば測定を中止して次のジョブに進む。
+        """
+        with self._lock:
+            job = self.jobs[index]
+            if job.status not in (JOB_PENDING, JOB_RUNNING):
+                return
+            job.skip_requested = True
+            if index == self.current:
+                self.engine.state_handler.update_state(MsrState.cancel)
+            else:
+                job.status = JOB_SKIPPED
+        self._notify()
+
+    def abort(self):
+        """測定中のジョブを中止し、残りのジョブも測定しない。"""
+        with self._lock:
+            self._aborted = True
+            for job in self.jobs:
+                if job.status == JOB_PENDING:
+                    job.status = JOB_CANCELED
+            if self.current is not None:
+                self.engine.state_handler.update_state(MsrState.cancel)
+        self._notify()
+
+    def _notify(self):
+        if self.on_change is not None:
+            self.on_change()
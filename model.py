@@ -1,13 +1,33 @@
-from dataclasses import dataclass, field
-from typing import List, Optional
-import customtkinter as ctk
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Optional
+import numpy as np
 import enum
-import math
+import threading
+import time
+
+from scan_plan import ScanPlan
+
+
+def calculate_measurement_points(wavelengths: List[float],
+                                 sections: List[float]) -> List[List[float]]:
+    """
+    測定波長と測定間隔から、区間ごとの波長の2次元配列を生成する関数
+
+    wavelengths:測定波長の配列(例:[100,200,400])
+    sections:区間ごとの測定間隔の配列(例:[1,3])
+    戻り値:測定間隔を区間ごとに変化させながら並べた波長の2次元配列
+    """
+    if len(wavelengths) == 0:
+        print("Error!:ranges is Null")
+        return []
+    return ScanPlan.from_ranges(wavelengths, sections).segment_lists()
 
 
 class Model():
 
     def __init__(self, parent):
+        #GUIを使わない場合にcustomtkinterを読み込まなくて済むように、ここで読み込む
+        import customtkinter as ctk
         #ウィジェット変数
         self.var_measurement: ctk.StringVar = ctk.StringVar(parent, "")
         self.var_mode: ctk.StringVar = ctk.StringVar(parent, "")
@@ -102,28 +122,10 @@ class Model():
         if len(_ranges) == 0:
             print("Error!:ranges is Null")
             return
-        else:
-            _list = []
-            _interval_points = []
-            for i in range(len(_ranges) - 1):
-                _start = _ranges[i]
-                _end = _ranges[i + 1]
-                _step_increase = _intervals[i]
-                _num_points = math.ceil(
-                    (_end - _start) / _step_increase)  #切り上げを行う
-                _interval_points.append(_num_points)
-
-            for index, secNum in enumerate(_interval_points):
-                _points = []
-                for i in range(secNum):
-                    _wave = _ranges[index] + i * _intervals[index]
-                    _points.append(_wave)
-                _list.append(_points)
-
-            if _list:
-                _list[-1].append(_ranges[-1])
-
-            self.data_container.MsrData1 = _list  #作成した配列を格納
+        self.data_container.scan_plan = ScanPlan.from_ranges(
+            _ranges, _intervals)
+        self.data_container.MsrData1 = self.data_container.scan_plan.segment_lists(
+        )  #作成した配列を格納
 
 
 class MsrState(enum.Enum):  #ステータスの定義
@@ -137,15 +139,64 @@ class MsrState(enum.Enum):  #ステータスの定義
 class State_Handler:
     """
     GUIの状態（ステータス）を管理するクラス
+    状態の変更はthreading.Conditionで通知するため、どのスレッドから変更しても
+    wait_while_pausedやsleepで待機している測定スレッドはすぐに起きる。
     """
 
+    #sleepの最後のこの時間(s)は、Conditionのタイムアウトより精度の高いtime.sleepで待つ
+    #(WindowsではConditionのタイムアウトの分解能が約15 msのため)
+    PRECISE_TAIL = 0.02
+
     def __init__(self):
-        self.msrstate = MsrState.default
+        self._condition = threading.Condition()
+        self._msrstate = MsrState.default
+
+    @property
+    def msrstate(self) -> MsrState:
+        return self._msrstate
 
     def update_state(self, state):
-        self.msrstate = state
+        with self._condition:
+            self._msrstate = state
+            self._condition.notify_all()
         print("state:", state)
 
+    def wait_while_paused(self) -> bool:
+        """
+        一時停止中(stop)であれば、再開または中止されるまで待機する。
+
+        Returns:
+            bool: 測定を継続してよい(measure)場合はTrue、中止された場合などはFalse
+        """
+        with self._condition:
+            while self._msrstate == MsrState.stop:
+                self._condition.wait()
+            return self._msrstate == MsrState.measure
+
+    def sleep(self, duration: float) -> bool:
+        """
+        duration秒待機する。中止されるとすぐに戻り、一時停止中は再開されるまで待つ
+        (一時停止していた時間も待機時間に含める)。
+
+        Returns:
+            bool: 最後まで待機できた場合はTrue、中止された場合などはFalse
+        """
+        deadline = time.perf_counter() + duration
+        with self._condition:
+            while True:
+                if self._msrstate == MsrState.stop:
+                    self._condition.wait()
+                    continue
+                if self._msrstate != MsrState.measure:
+                    return False
+                remaining = deadline - time.perf_counter()
+                if remaining <= self.PRECISE_TAIL:
+                    break
+                self._condition.wait(remaining - self.PRECISE_TAIL)
+        if remaining > 0:
+            time.sleep(remaining)
+        return self.wait_while_paused()
+
 
 @dataclass
 class Setting_Parms:
@@ -165,6 +216,39 @@ class Setting_Parms:
     diffraction: List[str] = field(default_factory=list)  #回折格子
     total_duration: str = ""  #[変調信号探索]測定総時間
     measurement_interval: str = ""  #[変調信号探索]測定間隔
+    scan_order: str = "forward"  #掃引順序 (forward: 毎回同じ向き, serpentine: 往復)
+    sweep_count: str = "1"  #掃引回数
+    backlash: str = "0"  #バックラッシ補正の寄せ量(nm) (0なら寄せない)
+    adaptive_factor: str = "1"  #適応サンプリングの粗い刻みの倍率 (1なら全点を測定)
+    adaptive_tolerance: str = "auto"  #適応サンプリングで変化とみなす信号の差(V)
+    settle_mode: str = "fixed"  #待機方法 (fixed: 固定時間, adaptive: 落ち着いたら打ち切る)
+    settle_floor: str = "1"  #[adaptive]最短の待機時間 (時定数の何倍か)
+    settle_tolerance: str = "2"  #[adaptive]落ち着いたとみなす平均値の差 (標準誤差の何倍か)
+    target_stderr: str = "0"  #掃引の平均の標準誤差がこの値(V)以下になったら終了 (0なら無効)
+
+    @classmethod
+    def from_dict(cls,
+                  data: dict,
+                  name: str = None,
+                  notes: str = None) -> "Setting_Parms":
+        """
+        設定ファイルなどから読み込んだ辞書から作る。未定義のキーは無視し、
+        辞書にない項目は既定値になる。
+
+        Args:
+            data (dict): validate_jsonで検証済みの辞書
+            name (str): 測定名 (指定した場合は辞書の値より優先する)
+            notes (str): 測定メモ (指定した場合は辞書の値より優先する)
+        """
+        known = {setting.name for setting in fields(cls)}
+        values = {key: value for key, value in data.items() if key in known}
+        values.setdefault("measurement_name", "")
+        values.setdefault("measurement_notes", "")
+        if name is not None:
+            values["measurement_name"] = name
+        if notes is not None:
+            values["measurement_notes"] = notes
+        return cls(**values)
 
     # 日本語ラベル
     def get_label(self, field_name: str) -> str:
@@ -181,11 +265,27 @@ class Setting_Parms:
             "filter": "フィルター",
             "diffraction": "回折格子",
             "total_duration": "測定総時間",
-            "measurement_interval": "測定間隔"
+            "measurement_interval": "測定間隔",
+            "scan_order": "掃引順序",
+            "sweep_count": "掃引回数",
+            "backlash": "バックラッシ補正",
+            "adaptive_factor": "適応サンプリング倍率",
+            "adaptive_tolerance": "適応サンプリングしきい値",
+            "settle_mode": "待機方法",
+            "settle_floor": "最短待機時間",
+            "settle_tolerance": "待機判定の許容幅",
+            "target_stderr": "目標標準誤差"
         }
         return labels.get(field_name, field_name)
 
 
+# 画面に入力欄がなく、設定ファイルにあれば読み込む設定
+OPTIONAL_SETTING_KEYS = ("scan_order", "sweep_count", "backlash",
+                         "adaptive_factor", "adaptive_tolerance",
+                         "settle_mode", "settle_floor", "settle_tolerance",
+                         "target_stderr")
+
+
 # 1測定点あたりのすべてのデータを格納するデータクラス
 @dataclass
 class MeasurementPoint:
@@ -196,37 +296,141 @@ class MeasurementPoint:
     theta: Optional[float] = None
     X: Optional[float] = None
     Y: Optional[float] = None
+    settle_time: Optional[float] = None  #実際の待機時間(s) (待機方法がadaptiveの場合)
+
+
+# Data_Containerが列として保持するフィールド名 (MeasurementPointの定義順)
+MEASUREMENT_FIELDS = tuple(f.name for f in fields(MeasurementPoint))
 
 
 class Data_Container:
     """
-    測定データ（MeasurementPointのリスト）を管理するクラス。
+    測定データを列ごとのNumPy配列で管理するクラス。
+    各列は容量を倍々に拡張しながら追記され、欠損値はNaNで表す。
     """
 
-    def __init__(self):
-        # 測定データポイントのリスト
-        self.points: List[MeasurementPoint] = []
+    def __init__(self, initial_capacity: int = 1024):
+        self._initial_capacity = max(1, int(initial_capacity))
+        # 列ごとの配列 (容量分確保し、先頭の_size行だけが有効)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._nan_counts: Dict[str, int] = {}
+        self._size = 0
+        self._allocate(self._initial_capacity)
         # 測定波長の計算結果
+        self.scan_plan: Optional[ScanPlan] = None
         self.MsrData1: List[List[float]] = []
         self.measurement_wave_length_list: List[float] = []
         self.measurement_section_list: List[float] = []
 
+    def __len__(self) -> int:
+        return self._size
+
+    def _allocate(self, capacity: int):
+        """容量capacityの列配列を確保し、既存の有効データをコピーする。"""
+        new_columns = {}
+        for key in MEASUREMENT_FIELDS:
+            array = np.full(capacity, np.nan)
+            if key in self._columns:
+                array[:self._size] = self._columns[key][:self._size]
+            new_columns[key] = array
+        # 読み出し側のスレッドが古い配列を参照していても壊れないよう、辞書ごと差し替える
+        self._columns = new_columns
+
     def add_point(self, point: MeasurementPoint):
-        """新しい測定データポイントをリストに追加する。"""
-        self.points.append(point)
+        """新しい測定データポイントを各列の末尾に追加する。"""
+        if self._size >= len(self._columns[MEASUREMENT_FIELDS[0]]):
+            self._allocate(self._size * 2)
+        index = self._size
+        for key in MEASUREMENT_FIELDS:
+            value = getattr(point, key)
+            if value is None:
+                self._nan_counts[key] = self._nan_counts.get(key, 0) + 1
+            else:
+                self._columns[key][index] = value
+        # 値を書き込んでから行数を増やす (読み出し側には書き込み済みの行だけが見える)
+        self._size = index + 1
 
-    def get_plot_data(self, x_key: str,
-                      y_key: str) -> tuple[List[float], List[float]]:
-        """グラフ描画用に特定のキーのデータリストを抽出する。"""
-        x_data = [
-            getattr(p, x_key) for p in self.points
-            if getattr(p, x_key) is not None
+    def add_columns(self, **columns: np.ndarray):
+        """
+        複数のデータポイントを列ごとの配列でまとめて末尾に追加する。
+        指定しなかった列はNaNになる。
+
+        Args:
+            **columns: 列名をキーとした同じ長さの配列 (例: time=..., theta=...)
+        """
+        if not columns:
+            return
+        unknown = set(columns) - set(MEASUREMENT_FIELDS)
+        if unknown:
+            raise KeyError(f"未定義の列です: {', '.join(sorted(unknown))}")
+        count = len(next(iter(columns.values())))
+        if count == 0:
+            return
+        capacity = len(self._columns[MEASUREMENT_FIELDS[0]])
+        if self._size + count > capacity:
+            while capacity < self._size + count:
+                capacity *= 2
+            self._allocate(capacity)
+        start, end = self._size, self._size + count
+        for key in MEASUREMENT_FIELDS:
+            if key in columns:
+                self._columns[key][start:end] = columns[key]
+            else:
+                self._nan_counts[key] = self._nan_counts.get(key, 0) + count
+        # 値を書き込んでから行数を増やす (読み出し側には書き込み済みの行だけが見える)
+        self._size = end
+
+    def sort_by(self, key: str):
+        """
+        全データを列keyの昇順に並べ替える (同じ値の行は元の順序を保つ)。
+        読み出し側のスレッドが古い配列を参照していても壊れないよう、辞書ごと差し替える。
+        """
+        size = self._size
+        order = np.argsort(self._columns[key][:size], kind="stable")
+        new_columns = {}
+        for name, array in self._columns.items():
+            sorted_array = array.copy()
+            sorted_array[:size] = array[:size][order]
+            new_columns[name] = sorted_array
+        self._columns = new_columns
+
+    def column(self, key: str) -> np.ndarray:
+        """指定した列の有効部分をコピーせずにビューとして返す。"""
+        return self._columns[key][:self._size]
+
+    def present_fields(self) -> List[str]:
+        """最初のデータポイントで値を持つ (NaNでない) 列名を返す。"""
+        if self._size == 0:
+            return []
+        return [
+            key for key in MEASUREMENT_FIELDS
+            if not np.isnan(self._columns[key][0])
         ]
-        y_data = [
-            getattr(p, y_key) for p in self.points
-            if getattr(p, y_key) is not None
+
+    @property
+    def points(self) -> List[MeasurementPoint]:
+        """互換用: 全データをMeasurementPointのリストとして返す (NaNはNoneに戻す)。"""
+        size = self._size
+        columns = [self._columns[key][:size].tolist() for key in MEASUREMENT_FIELDS]
+        return [
+            MeasurementPoint(*(None if value != value else value
+                               for value in row)) for row in zip(*columns)
         ]
-        return x_data, y_data
+
+    def get_plot_data(self, x_key: str,
+                      y_key: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        グラフ描画用に特定のキーのデータ配列を抽出する。
+        x, yのどちらかが欠損している行は両方から除き、同じ長さの配列を返す。
+        欠損がない場合はコピーせずにビューを返す。
+        """
+        size = self._size
+        x_data = self._columns[x_key][:size]
+        y_data = self._columns[y_key][:size]
+        if not self._nan_counts.get(x_key) and not self._nan_counts.get(y_key):
+            return x_data, y_data
+        mask = ~(np.isnan(x_data) | np.isnan(y_data))
+        return x_data[mask], y_data[mask]
 
     def add_measurement_list(self, add_WL: List[str], add_S: List[str]):
         """空の要素を排除して新しいリストに抽出する"""
@@ -235,7 +439,11 @@ class Data_Container:
 
     def reset_list(self):
         """すべてのデータをリセットする。"""
-        self.points = []
+        self._columns = {}
+        self._nan_counts = {}
+        self._size = 0
+        self._allocate(self._initial_capacity)
+        self.scan_plan = None
         self.MsrData1 = []
         self.measurement_wave_length_list = []
         self.measurement_section_list = []
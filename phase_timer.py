@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+#ヒストグラムのビン境界 (1 µs ～ 100 s を1桁あたり10分割, ns単位)
+HISTOGRAM_EDGES_NS = np.logspace(3, 11, 81)
+
+
+class PhaseTimer:
+    """
+    測定ループの各処理(フェーズ)にかかった時間を記録するクラス。
+    span()で囲んだ区間をtime.perf_counter_nsで計測し、
+    測定点ごとの内訳とフェーズごとのヒストグラムを作る。
+    別スレッド(描画・保存)の区間も記録でき、Chromeトレース形式でも書き出せる。
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Args:
+            enabled (bool): Falseの場合は何も記録しない
+        """
+        self.enabled = enabled
+        self._origin_ns = time.perf_counter_ns()
+        # (フェーズ名, スレッドID, 開始ns, 所要ns) の記録
+        self._spans = []
+        self._thread_names: Dict[int, str] = {}
+        # 測定点ごとの記録
+        self._point_index: List[int] = []
+        self._point_wavelength: List[Optional[float]] = []
+        self._point_distance: List[Optional[float]] = []
+        self._point_phases: List[Dict[str, int]] = []
+        self._current_phases: Optional[Dict[str, int]] = None
+        self._measurement_thread = None
+        self._last_wavelength = None
+
+    def begin_point(self,
+                    index: int,
+                    wavelength: Optional[float] = None,
+                    distance: Optional[float] = None):
+        """
+        新しい測定点の記録を始める。以降のspanはこの点の内訳として集計される。
+
+        Args:
+            index (int): 測定点の番号
+            wavelength (float): 測定波長 (nm)。前の点との差を移動距離として記録する
+            distance (float): 移動距離 (nm)。寄せを含む場合など、前の点との差と
+                異なるときに指定する
+        """
+        if not self.enabled:
+            return
+        if (distance is None and wavelength is not None
+                and self._last_wavelength is not None):
+            distance = abs(wavelength - self._last_wavelength)
+        if wavelength is not None:
+            self._last_wavelength = wavelength
+        #begin_pointを呼んだスレッドを測定スレッドとみなす
+        self._measurement_thread = threading.current_thread()
+        self._current_phases = {}
+        self._point_index.append(index)
+        self._point_wavelength.append(wavelength)
+        self._point_distance.append(distance)
+        self._point_phases.append(self._current_phases)
+
+    @contextmanager
+    def span(self, name: str):
+        """
+        withで囲んだ区間の所要時間をフェーズnameとして記録する。
+        測定スレッド以外から呼ばれた場合は測定点の内訳には加えない。
+        """
+        if not self.enabled:
+            yield
+            return
+        thread = threading.current_thread()
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter_ns() - start
+            self._spans.append((name, thread.ident, start, duration))
+            if thread.ident not in self._thread_names:
+                self._thread_names[thread.ident] = thread.name
+            phases = self._current_phases
+            if phases is not None and thread is self._measurement_thread:
+                phases[name] = phases.get(name, 0) + duration
+
+    def durations(self) -> Dict[str, np.ndarray]:
+        """フェーズごとの所要時間(ns)の配列を返す。"""
+        grouped: Dict[str, list] = {}
+        for name, _, _, duration in list(self._spans):
+            grouped.setdefault(name, []).append(duration)
+        return {
+            name: np.array(values, dtype=np.int64)
+            for name, values in grouped.items()
+        }
+
+    def histograms(self) -> dict:
+        """フェーズごとの統計と対数ビンのヒストグラムを返す。"""
+        result = {}
+        for name, values in self.durations().items():
+            counts, _ = np.histogram(values, bins=HISTOGRAM_EDGES_NS)
+            values_ms = values / 1e6
+            result[name] = {
+                "count": int(len(values)),
+                "total_s": float(values.sum() / 1e9),
+                "mean_ms": float(values_ms.mean()),
+                "p50_ms": float(np.percentile(values_ms, 50)),
+                "p90_ms": float(np.percentile(values_ms, 90)),
+                "p99_ms": float(np.percentile(values_ms, 99)),
+                "max_ms": float(values_ms.max()),
+                "histogram": {
+                    "edges_us": (HISTOGRAM_EDGES_NS / 1e3).tolist(),
+                    "counts": counts.tolist()
+                }
+            }
+        return result
+
+    def summary(self, top: int = 4) -> str:
+        """合計時間の長いフェーズを並べた1行の要約を返す。"""
+        stats = sorted(self.histograms().items(),
+                       key=lambda item: item[1]["total_s"],
+                       reverse=True)[:top]
+        parts = [
+            f"{name} {s['total_s']:.2f} s (p50 {s['p50_ms']:.2f} ms)"
+            for name, s in stats
+        ]
+        return "処理時間の内訳: " + ", ".join(parts)
+
+    def _points_table(self) -> dict:
+        """測定点ごとの内訳を列ごとの配列にまとめる。"""
+        names = sorted({name for phases in self._point_phases
+                        for name in phases})
+        return {
+            "index": self._point_index,
+            "wavelength": self._point_wavelength,
+            "move_distance": self._point_distance,
+            "phases_ms": {
+                name: [
+                    phases[name] / 1e6 if name in phases else None
+                    for phases in self._point_phases
+                ]
+                for name in names
+            }
+        }
+
+    def save(self, directory: str, trace: bool = False):
+        """
+        phase_timing.json (統計・ヒストグラム・測定点ごとの内訳) を書き出す。
+        traceがTrueの場合はChromeトレース形式のtrace.jsonも書き出す
+        (chrome://tracing や https://ui.perfetto.dev で開ける)。
+        """
+        if not self.enabled or not directory:
+            return
+        timing = {
+            "wall_time_s": (time.perf_counter_ns() - self._origin_ns) / 1e9,
+            "phases": self.histograms(),
+            "points": self._points_table()
+        }
+        try:
+            with open(os.path.join(directory, "phase_timing.json"),
+                      "w",
+                      encoding="utf-8") as f:
+                json.dump(timing, f)
+            if trace:
+                with open(os.path.join(directory, "trace.json"),
+                          "w",
+                          encoding="utf-8") as f:
+                    json.dump(self.chrome_trace(), f)
+        except Exception as e:
+            print(f"処理時間の記録を保存できませんでした: {e}")
+
+    def chrome_trace(self) -> dict:
+        """Chromeトレース形式 (Trace Event Format) の辞書を返す。"""
+        pid = os.getpid()
+        events = [{
+            "name": "thread_name",
+            "ph": "M",
+            "pid": pid,
+            "tid": tid,
+            "args": {
+                "name": name
+            }
+        } for tid, name in self._thread_names.items()]
+        for name, tid, start, duration in list(self._spans):
+            events.append({
+                "name": name,
+                "ph": "X",
+                "pid": pid,
+                "tid": tid,
+                "ts": (start - self._origin_ns) / 1e3,
+                "dur": duration / 1e3
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
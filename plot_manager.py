@@ -1,48 +1,204 @@
-import matplotlib.pyplot as plt
+import matplotlib
+import numpy as np
+from matplotlib.figure import Figure
 
 
 class PlotManager:
+    """
+    測定グラフの描画を担当するクラス。
+    pyplotのグローバル状態は使わず、保持しているFigure/Axesに対して描画する。
+    測定中は1本のLine2Dのデータだけを差し替え、描画済みの線を含む背景をキャッシュして
+    新しく追加された末尾の区間だけをブリット描画することで、
+    点数によらず1点あたりの再描画コストを一定に保つ。
+    """
 
     def __init__(self):
+        matplotlib.rcParams.update({"font.size": 10})
         # figの作成
-        self.fig = plt.figure()
+        self.fig = Figure()
         self.fig.subplots_adjust(left=0.1, right=0.96, bottom=0.15, top=0.96)
         # 座標軸の作成
         self.ax = self.fig.add_subplot(1, 1, 1)
-        plt.rcParams.update({"font.size": 10})
         self.config = {"linewidth": 0.5}
         self.filepath = None
         self.df = None
+        # 測定データを表示するLine2D (測定開始時に作成)
+        self.line = None
+        # 追加された末尾の区間だけを描画するためのLine2D (ブリット専用)
+        self._tail = None
+        # 掃引の平均の標準誤差を表す帯 (PolyCollection)
+        self._band = None
+        # ブリット用にキャッシュした背景 (描画済みの線を含む)
+        self._background = None
+        # 背景に描画済みのデータ点数と、そのY方向の最小・最大値
+        self._drawn_count = 0
+        self._y_range = None
+        self._capturing_background = False
+        self._xlim = None
+        self._ylim_initialized = False
+        self._draw_event_cid = None
 
     def set_plot_style(self):
         _fontsize = 10
-        for spine in plt.gca().spines.values():
+        for spine in self.ax.spines.values():
             spine.set_linewidth(0.4)
-        plt.gca().tick_params(axis='both',
-                              which='major',
-                              top=True,
-                              right=True,
-                              width=0.4,
-                              direction='in',
-                              length=4.0)
-        plt.gca().tick_params(axis='both',
-                              which='minor',
-                              top=True,
-                              right=True,
-                              width=0.4,
-                              direction='in',
-                              length=2.0)
-        plt.gca().minorticks_on()
-        plt.xticks(fontsize=_fontsize)
-        plt.yticks(fontsize=_fontsize)
-        plt.plot()
+        self.ax.tick_params(axis='both',
+                            which='major',
+                            top=True,
+                            right=True,
+                            width=0.4,
+                            direction='in',
+                            length=4.0,
+                            labelsize=_fontsize)
+        self.ax.tick_params(axis='both',
+                            which='minor',
+                            top=True,
+                            right=True,
+                            width=0.4,
+                            direction='in',
+                            length=2.0)
+        self.ax.minorticks_on()
 
-    def plot_data(self, x, y, x_min, x_max):
-        plt.cla()
+    def _connect_canvas(self):
+        """キャンバスの再描画(リサイズ・ツールバー操作など)を検知できるようにする。"""
+        if self._draw_event_cid is None and self.fig.canvas is not None:
+            self._draw_event_cid = self.fig.canvas.mpl_connect(
+                "draw_event", self._on_draw)
+
+    def _on_draw(self, event):
+        """外部要因でキャンバスが再描画されたら、キャッシュした背景を破棄する。"""
+        if not self._capturing_background:
+            self._background = None
+
+    def reset_plot(self, x_min, x_max):
+        """
+        グラフをクリアして新しい測定用のLine2Dを作成する。
+
+        Args:
+            x_min, x_max: X軸の表示範囲
+        """
+        self._connect_canvas()
+        self.ax.cla()
         self.set_plot_style()
-        plt.plot(x, y, **self.config)
-        plt.xlim(x_min, x_max)
-        plt.draw()
+        (self.line, ) = self.ax.plot([], [], **self.config)
+        (self._tail, ) = self.ax.plot([],
+                                      [],
+                                      color=self.line.get_color(),
+                                      animated=True,
+                                      **self.config)
+        self._band = None
+        self._xlim = (x_min, x_max)
+        self.ax.set_xlim(x_min, x_max)
+        self._ylim_initialized = False
+        self._background = None
+        self._drawn_count = 0
+        self._y_range = None
+
+    def _redraw_background(self):
+        """
+        キャンバス全体を描画し、描画済みの線を含めて背景としてキャッシュする。
+        """
+        canvas = self.fig.canvas
+        self._capturing_background = True
+        try:
+            canvas.draw()
+            self._background = canvas.copy_from_bbox(self.ax.bbox)
+        finally:
+            self._capturing_background = False
+
+    def _update_ylim(self, y_min: float, y_max: float) -> bool:
+        """
+        データがY軸の表示範囲からはみ出した場合のみ範囲を広げる。
+
+        Returns:
+            bool: 範囲を変更した場合はTrue
+        """
+        lower, upper = self.ax.get_ylim()
+        if self._ylim_initialized and lower <= y_min and y_max <= upper:
+            return False
+        self._ylim_initialized = True
+        margin = (y_max - y_min) * 0.1 or abs(y_max) * 0.1 or 1.0
+        self.ax.set_ylim(y_min - margin, y_max + margin)
+        return True
+
+    def plot_data(self, x, y, x_min, x_max):
+        """
+        測定データでLine2Dを更新して再描画する。
+        データが末尾に追加されただけなら、追加区間だけを背景の上に描画する。
+        軸範囲が変わったときや既存のデータが変わったときだけ全体を描画する。
+        """
+        if self.line is None or self._xlim != (x_min, x_max):
+            self.reset_plot(x_min, x_max)
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        size = len(y)
+        self.line.set_data(x, y)
+
+        #新しく追加された区間だけでY方向の範囲を更新する
+        start = self._drawn_count if size >= self._drawn_count else 0
+        if start == 0:
+            self._y_range = None
+        new_y = y[start:]
+        new_y = new_y[~np.isnan(new_y)]
+        if len(new_y):
+            y_min, y_max = float(new_y.min()), float(new_y.max())
+            if self._y_range is not None:
+                y_min = min(y_min, self._y_range[0])
+                y_max = max(y_max, self._y_range[1])
+            self._y_range = (y_min, y_max)
+
+        limits_changed = (self._y_range is not None
+                          and self._update_ylim(*self._y_range))
+        if limits_changed or self._background is None or start == 0:
+            self._redraw_background()
+        else:
+            #1点前から描画して、既存の線と途切れないようにつなぐ
+            tail_start = max(start - 1, 0)
+            self._tail.set_data(x[tail_start:], y[tail_start:])
+            canvas = self.fig.canvas
+            canvas.restore_region(self._background)
+            self.ax.draw_artist(self._tail)
+            canvas.blit(self.ax.bbox)
+            self._background = canvas.copy_from_bbox(self.ax.bbox)
+        self._drawn_count = size
+
+    def plot_average(self, x, mean, stderr, x_min, x_max):
+        """
+        掃引の平均をLine2Dに、平均±標準誤差を帯として描画する。
+        掃引のたびに既存の点の値が変わるため、常に全体を描画する。
+
+        Args:
+            x: 波長
+            mean: 平均値
+            stderr: 平均値の標準誤差
+            x_min, x_max: X軸の表示範囲
+        """
+        if self.line is None or self._xlim != (x_min, x_max):
+            self.reset_plot(x_min, x_max)
+        x = np.asarray(x, dtype=float)
+        mean = np.asarray(mean, dtype=float)
+        stderr = np.asarray(stderr, dtype=float)
+        self.line.set_data(x, mean)
+        if self._band is not None:
+            self._band.remove()
+        self._band = self.ax.fill_between(x,
+                                          mean - stderr,
+                                          mean + stderr,
+                                          color=self.line.get_color(),
+                                          alpha=0.3,
+                                          linewidth=0)
+        if len(mean):
+            self._update_ylim(float(np.min(mean - stderr)),
+                              float(np.max(mean + stderr)))
+        self._drawn_count = len(mean)
+        self._redraw_background()
 
     def close_plt(self):
-        plt.close()
+        if self._draw_event_cid is not None and self.fig.canvas is not None:
+            self.fig.canvas.mpl_disconnect(self._draw_event_cid)
+        self._draw_event_cid = None
+        self._background = None
+        self.line = None
+        self._tail = None
+        self._band = None
+        self.fig.clf()
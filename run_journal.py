@@ -0,0 +1,187 @@
+"""
+測定の途中経過を記録するジャーナル (測定フォルダのjournal.jsonl)。
+
+1行に1つのJSONレコードを追記していく形式で、測定開始時に設定と測定波長のグリッドを、
+1点測定するごとにその点のデータを書き込む。各行は1回のwriteで書き込んでから
+flushとos.fsyncを行うため、途中で異常終了しても書き込み済みの点は失われず、
+書き込み途中の最後の1行だけが読み込み時に捨てられる。
+
+レコードの種類:
+    start:  {"type": "start", "version", "time", "settings", "grid", "order_length"}
+    point:  {"type": "point", "point", "value", "sigma"}
+    resume: {"type": "resume", "time", "points"}
+    finish: {"type": "finish", "time"}
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import List
+
+from model import MeasurementPoint, Setting_Parms
+from scan_plan import ScanPlan
+
+#ジャーナルのファイル名
+JOURNAL_FILENAME = "journal.jsonl"
+#ジャーナルの形式のバージョン
+JOURNAL_VERSION = 1
+#ジャーナルから再開できる測定の種類
+RESUMABLE_MEASUREMENTS = ("ラマン", "電場変調ラマン")
+
+
+@dataclass
+class JournalState:
+    """load_journalで読み込んだジャーナルの内容。"""
+    directory: str  #測定フォルダ
+    settings: dict  #測定開始時の設定 (Setting_Parmsの辞書)
+    grid: List[float]  #測定波長のグリッド (ScanPlan.wavelengths)
+    order_length: int  #測定順序の点数 (掃引回数分を含む)
+    points: List[dict] = field(default_factory=list)  #測定済みの点のレコード
+    finished: bool = False  #測定が最後まで完了しているか
+    size: int = 0  #正しく読み込めた部分のバイト数
+
+
+class RunJournal:
+    """
+    ジャーナルへの書き込みセッション。
+    新しい測定ではstart、再開した測定ではresumeを最初に書き込む。
+    """
+
+    def __init__(self, file_path: str, use_fsync: bool = True):
+        """
+        Args:
+            file_path (str): ジャーナルのファイルパス (存在すれば追記する)
+            use_fsync (bool): 1行ごとにos.fsyncでディスクまで書き出すか
+        """
+        self.file_path = file_path
+        self.use_fsync = use_fsync
+        self._file = open(file_path, "a", encoding="utf-8")
+
+    @classmethod
+    def reopen(cls, state: JournalState, use_fsync: bool = True) -> "RunJournal":
+        """
+        読み込んだジャーナルに追記するセッションを開く。
+        書き込み途中で終わった最後の行は、追記の前に切り詰める。
+        """
+        file_path = os.path.join(state.directory, JOURNAL_FILENAME)
+        os.truncate(file_path, state.size)
+        return cls(file_path, use_fsync=use_fsync)
+
+    def start(self, setting_parms: Setting_Parms, scan_plan: ScanPlan,
+              order_length: int):
+        """測定開始時の設定と測定波長のグリッドを書き込む。"""
+        self._write({
+            "type": "start",
+            "version": JOURNAL_VERSION,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "settings": asdict(setting_parms),
+            "grid": scan_plan.wavelengths.tolist() if scan_plan else [],
+            "order_length": order_length
+        })
+
+    def resume(self, restored: int):
+        """測定を再開したことと、復元した点数を書き込む。"""
+        self._write({
+            "type": "resume",
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "points": restored
+        })
+
+    def record_point(self, point: MeasurementPoint, value: float,
+                     sigma: float):
+        """
+        測定した1点を書き込む。
+
+        Args:
+            point (MeasurementPoint): 測定データ
+            value (float): 適応サンプリングに渡した測定値
+            sigma (float): 測定値の標準誤差
+        """
+        self._write({
+            "type": "point",
+            "point": {
+                key: value
+                for key, value in asdict(point).items() if value is not None
+            },
+            "value": value,
+            "sigma": sigma
+        })
+
+    def finish(self):
+        """測定が最後まで完了したことを書き込む。"""
+        self._write({
+            "type": "finish",
+            "time": datetime.now().isoformat(timespec="seconds")
+        })
+
+    def _write(self, record: dict):
+        """1行を1回のwriteで書き込み、ディスクまで書き出す。"""
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.use_fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """ファイルを閉じる。"""
+        if not self._file.closed:
+            self._file.close()
+
+
+def load_journal(directory: str) -> JournalState:
+    """
+    測定フォルダのジャーナルを読み込む。
+    書き込み途中で終わった最後の1行は無視する。
+
+    Raises:
+        FileNotFoundError: ジャーナルがない場合
+        ValueError: ジャーナルの形式が不正な場合
+    """
+    file_path = os.path.join(directory, JOURNAL_FILENAME)
+    with open(file_path, "rb") as f:
+        lines = f.read().split(b"\n")
+    #最後の要素は改行で終わっていない (書き込み途中の) 部分
+    complete, torn = lines[:-1], lines[-1]
+    state = None
+    size = 0
+    for number, line in enumerate(complete, start=1):
+        try:
+            record = json.loads(line.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            if number == len(complete) and not torn:
+                #改行まで書けていても中身が壊れている最後の行は、書き込み途中とみなす
+                break
+            raise ValueError(f"ジャーナルの{number}行目が読み込めません: {file_path}")
+        size += len(line) + 1
+        kind = record.get("type")
+        if kind == "start":
+            if record.get("version") != JOURNAL_VERSION:
+                raise ValueError(
+                    f"対応していないジャーナルの形式です: {record.get('version')}")
+            state = JournalState(directory=directory,
+                                 settings=record["settings"],
+                                 grid=record["grid"],
+                                 order_length=record["order_length"])
+        elif state is None:
+            raise ValueError(f"ジャーナルに測定開始の記録がありません: {file_path}")
+        elif kind == "point":
+            state.points.append(record)
+        elif kind == "finish":
+            state.finished = True
+    if state is None:
+        raise ValueError(f"ジャーナルに測定開始の記録がありません: {file_path}")
+    state.size = size
+    return state
+
+
+def check_resumable(state: JournalState):
+    """
+    ジャーナルの測定が再開できるかを確認する。
+
+    Raises:
+        ValueError: 測定が完了している、または再開できない測定の種類の場合
+    """
+    if state.finished:
+        raise ValueError(f"この測定は完了しています: {state.directory}")
+    measurement = state.settings.get("measurement")
+    if measurement not in RESUMABLE_MEASUREMENTS:
+        raise ValueError(f"{measurement}の測定は再開できません。")
@@ -0,0 +1,238 @@
+"""
+GUIなしで測定を実行するコマンドラインツール。
+
+設定ファイル(setting/*.jsonと同じ形式)を読み込み、測定が終わるまで実行する。
+Ctrl+Cで測定を中止すると、そこまでのデータを保存して終了する。
+中止・異常終了した測定は、--resumeで測定フォルダを指定すると続きから再開できる。
+--queueでキューファイル(measurement_queue.py参照)を指定すると、複数の設定ファイルを
+順番に続けて測定する。Ctrl+Cで測定中の測定を中止し、残りの測定も行わない。
+
+使い方:
+    python run_measurement.py setting/raman.json --name sample1
+    python run_measurement.py setting/raman.json --name test --simulate --output-dir ./outputdata
+    python run_measurement.py --resume ./outputdata/2025-08-07_14-30-00
+    python run_measurement.py --queue queue.json --simulate
+
+終了コード:
+    0: 測定が完了した (キューの場合はスキップしたもの以外のすべての測定が完了した)
+    1: 測定が中止された、またはエラーで終了した
+    2: 設定ファイル(または再開する測定のジャーナル、キューファイル)が不正
+"""
+import argparse
+import json
+import sys
+import threading
+
+from measurement_engine import ConsoleLogger, MeasurementEngine, validate_json
+from measurement_queue import MeasurementQueue, load_queue_file, validate_jobs
+from model import MsrState, Setting_Parms
+from run_journal import JournalState, check_resumable, load_journal
+from save_manager import SaveManager
+
+
+def load_settings(path: str, name: str, notes: str = "") -> Setting_Parms:
+    """
+    設定ファイルを読み込んでSetting_Parmsを作る。
+
+    Raises:
+        ValueError: 設定ファイルの形式が不正な場合
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not validate_json(data):
+        raise ValueError(f"設定ファイルの形式が正しくありません: {path}")
+    return Setting_Parms.from_dict(data, name=name, notes=notes)
+
+
+def create_gpib_handler(simulate: bool):
+    """実機またはシミュレータのGPIBハンドラを作る。"""
+    if simulate:
+        from gpib_simulator import Simulated_GPIB_Handler
+        return Simulated_GPIB_Handler()
+    from GPIB_Handler import GPIB_Handler
+    return GPIB_Handler()
+
+
+def load_resume_settings(directory: str):
+    """
+    中断した測定のジャーナルを読み込み、再開に使う設定と一緒に返す。
+
+    Returns:
+        tuple: (JournalState, Setting_Parms)
+
+    Raises:
+        ValueError: ジャーナルが不正、または再開できない測定の場合
+    """
+    journal_state = load_journal(directory)
+    check_resumable(journal_state)
+    if not validate_json(journal_state.settings):
+        raise ValueError(f"ジャーナルの設定の形式が正しくありません: {directory}")
+    return journal_state, Setting_Parms.from_dict(journal_state.settings)
+
+
+def run(engine: MeasurementEngine, journal_state: JournalState = None) -> bool:
+    """
+    測定を別スレッドで実行し、完了まで待つ。
+    Ctrl+Cが押された場合は測定を中止し、後処理が終わるまで待つ。
+
+    Args:
+        journal_state (JournalState): 指定した場合は、この測定を続きから再開する
+
+    Returns:
+        bool: 測定が最後まで完了した場合はTrue
+    """
+    def measure():
+        if journal_state is not None:
+            return engine.resume(journal_state)
+        return engine.run()
+
+    def cancel():
+        engine.state_handler.update_state(MsrState.cancel)
+
+    engine.state_handler.update_state(MsrState.measure)
+    return run_in_thread(engine, measure, cancel)
+
+
+def run_queue(engine: MeasurementEngine, queue: MeasurementQueue) -> bool:
+    """
+    測定キューを別スレッドで実行し、すべての測定が終わるまで待つ。
+    Ctrl+Cが押された場合は測定中の測定を中止し、残りの測定も行わない。
+
+    Returns:
+        bool: スキップしたもの以外のすべての測定が完了した場合はTrue
+    """
+    return run_in_thread(engine, queue.run, queue.abort)
+
+
+def run_in_thread(engine: MeasurementEngine, measure, cancel) -> bool:
+    """
+    measureを測定スレッドで実行して終わるまで待ち、その戻り値を返す。
+    Ctrl+Cが押された場合はcancelを呼び出し、後処理が終わるまで待つ。
+    """
+    result = {"completed": False}
+
+    def target():
+        try:
+            result["completed"] = measure()
+        except Exception as e:
+            engine.logger.add_log(f"測定中にエラーが発生しました: {e}",
+                                  level="ERROR")
+        finally:
+            done.set()
+
+    #join()の途中でKeyboardInterruptを受けると、スレッドが終了したと誤判定されて
+    #後処理の前にプロセスが終わってしまうことがあるため、Eventで終了を待つ
+    done = threading.Event()
+    thread = threading.Thread(target=target, name="Measurement")
+    thread.start()
+    while not done.is_set():
+        try:
+            done.wait(0.2)
+        except KeyboardInterrupt:
+            engine.logger.add_log("測定を中止しています...", level="WARN")
+            cancel()
+    thread.join()
+    return result["completed"]
+
+
+def print_queue_summary(queue: MeasurementQueue):
+    """キューの各測定の結果と保存先を表示する。"""
+    for number, job in enumerate(queue.jobs, start=1):
+        line = f"{number}. {job.name}: {job.status}"
+        if job.run_directory:
+            line += f" ({job.run_directory})"
+        if job.message:
+            line += f" - {job.message}"
+        print(line)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="GUIなしで測定を実行する")
+    parser.add_argument("settings",
+                        nargs="?",
+                        help="設定ファイル (setting/*.json)")
+    parser.add_argument("--name", help="測定名")
+    parser.add_argument("--notes", default="", help="測定メモ")
+    parser.add_argument("--simulate",
+                        action="store_true",
+                        help="実機の代わりにシミュレータを使う")
+    parser.add_argument("--output-dir",
+                        default="./outputdata",
+                        help="測定データを保存するフォルダ")
+    parser.add_argument("--resume",
+                        metavar="RUN_DIR",
+                        default=None,
+                        help="中断した測定のフォルダを指定し、続きから再開する")
+    parser.add_argument("--queue",
+                        metavar="QUEUE_FILE",
+                        default=None,
+                        help="キューファイルに書いた複数の設定ファイルを順番に測定する")
+    parser.add_argument("--trace",
+                        action="store_true",
+                        help="Chromeトレース形式の処理時間(trace.json)も保存する")
+    parser.add_argument("--quiet",
+                        action="store_true",
+                        help="測定値(DATA)のログを表示しない")
+    args = parser.parse_args(argv)
+    if args.resume is not None and args.queue is not None:
+        parser.error("--resumeと--queueは同時に指定できません")
+    if (args.resume is None and args.queue is None
+            and (args.settings is None or args.name is None)):
+        parser.error("設定ファイルと--nameを指定してください "
+                     "(再開する場合は--resume、キューの場合は--queue)")
+
+    journal_state = None
+    queue_jobs = None
+    try:
+        if args.queue is not None:
+            queue_jobs = load_queue_file(args.queue)
+            #機器に接続する前に、すべての設定ファイルを検証する
+            errors = validate_jobs(queue_jobs)
+            if errors:
+                for index, messages in errors.items():
+                    job = queue_jobs[index]
+                    for message in messages:
+                        print(f"{index + 1}. {job.name} ({job.settings_path}): "
+                              f"{message}",
+                              file=sys.stderr)
+                return 2
+            #各測定の設定はキューが測定のたびに反映する
+            setting_parms = Setting_Parms.from_dict(queue_jobs[0].setting_data)
+        elif args.resume is not None:
+            journal_state, setting_parms = load_resume_settings(args.resume)
+        else:
+            setting_parms = load_settings(args.settings, args.name, args.notes)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    levels = None
+    if args.quiet:
+        levels = {"INFO", "STATE", "GPIB", "WARN", "ERROR"}
+    engine = MeasurementEngine(create_gpib_handler(args.simulate),
+                               setting_parms,
+                               save_manager=SaveManager(args.output_dir),
+                               logger=ConsoleLogger(levels))
+    engine.phase_trace_export = args.trace
+    queue = None
+    if queue_jobs is not None:
+        queue = MeasurementQueue(engine, queue_jobs)
+    try:
+        engine.connect_devices()
+        if queue is not None:
+            completed = run_queue(engine, queue)
+        else:
+            completed = run(engine, journal_state)
+    finally:
+        engine.close()
+    if queue is not None:
+        print_queue_summary(queue)
+        return 0 if completed else 1
+    save_path = engine.save_manager.current_save_path
+    if save_path:
+        engine.logger.add_log(f"保存先: {save_path}", level="INFO")
+    return 0 if completed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
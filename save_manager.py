@@ -1,7 +1,8 @@
 import os
 from datetime import datetime
-from model import MeasurementPoint
-from typing import List
+from column_store import ColumnStoreWriter, column_store_path, settings_attrs
+from model import MeasurementPoint, Data_Container
+from typing import Dict, List, Optional
 from dataclasses import asdict
 import json
 
@@ -20,6 +21,10 @@ class SaveManager:
         self.base_directory = base_directory
         # 現在の測定に対応する保存フォルダのパスを保持する
         self.current_save_path = None
+        # 測定中に追記を行う書き込みセッション
+        self.data_stream: Optional[DataStreamWriter] = None
+        # 同じデータを列ごとのバイナリファイルへ追記する書き込みセッション
+        self.column_stream: Optional[ColumnStoreWriter] = None
 
     def save_settings_to_file(self, filename: str, settings_data):
         """
@@ -47,10 +52,28 @@ class SaveManager:
         例: ./outputdata/2025-08-07_14-30-00/
         """
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        self.current_save_path = os.path.join(self.base_directory, timestamp)
-        os.makedirs(self.current_save_path, exist_ok=True)
+        path = os.path.join(self.base_directory, timestamp)
+        #同じ秒に続けて測定した場合(測定キューなど)も、別のフォルダにする
+        suffix = 2
+        while os.path.exists(path):
+            path = os.path.join(self.base_directory, f"{timestamp}_{suffix}")
+            suffix += 1
+        self.current_save_path = path
+        os.makedirs(self.current_save_path)
         print(f"保存用ディレクトリを作成しました: {self.current_save_path}")
 
+    def use_existing_directory(self, path: str):
+        """
+        既存の測定フォルダを保存先にする (中断した測定を再開する場合)。
+
+        Raises:
+            FileNotFoundError: フォルダが存在しない場合
+        """
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"測定フォルダが見つかりません: {path}")
+        self.current_save_path = path
+        print(f"既存のディレクトリに保存します: {self.current_save_path}")
+
     def get_current_save_path(self):
         """
         現在使用している保存フォルダのフルパスを返す。
@@ -99,6 +122,133 @@ class SaveManager:
         except Exception as e:
             print(f"テキストデータの保存中にエラーが発生しました: {e}")
 
+    def save_columns_to_file(self, filename: str, columns: Dict[str, list]):
+        """
+        現在の測定フォルダに、列名をキーとした配列の辞書をテキストファイルとして保存する。
+        形式はsave_data_to_fileと同じタブ区切り (欠損値は空欄)。
+
+        Args:
+            filename (str): 保存するファイル名 (例: "average.txt")
+            columns (Dict[str, list]): 列名をキーとした同じ長さの配列
+        """
+        path = self.get_current_save_path()
+        if not path or not columns:
+            return
+
+        file_path = os.path.join(path, filename)
+        try:
+            with open(file_path, 'w') as file:
+                file.write("\t".join(columns) + "\n")
+                rows = zip(*(values.tolist() if hasattr(values, "tolist")
+                             else list(values)
+                             for values in columns.values()))
+                for row in rows:
+                    file.write("\t".join(
+                        str(value) if value == value else ""
+                        for value in row) + "\n")
+        except Exception as e:
+            print(f"テキストデータの保存中にエラーが発生しました: {e}")
+
+    def open_data_stream(self,
+                         filename: str,
+                         flush_interval: int = 1,
+                         use_fsync: bool = False,
+                         settings_data=None):
+        """
+        現在の測定フォルダに追記専用の書き込みセッションを開く。
+        測定ループ中は append_data_to_file で新しい行だけを追記し、
+        測定終了時に close_data_stream で閉じる。
+        テキストファイルと並べて、列ごとのバイナリファイル (例: output_columns/) にも追記する。
+
+        Args:
+            filename (str): 保存するファイル名 (例: "output.txt")
+            flush_interval (int): 何行ごとにflushするか (1なら毎行)
+            use_fsync (bool): flush時にos.fsyncでディスクまで書き出すか
+            settings_data: バイナリファイルの属性として保存する設定 (Setting_Parmsなど)
+        """
+        self.close_data_stream()
+        path = self.get_current_save_path()
+        if not path:
+            return
+
+        file_path = os.path.join(path, filename)
+        try:
+            self.data_stream = DataStreamWriter(file_path,
+                                                flush_interval=flush_interval,
+                                                use_fsync=use_fsync)
+        except Exception as e:
+            print(f"書き込みセッションの開始中にエラーが発生しました: {e}")
+        try:
+            self.column_stream = ColumnStoreWriter(
+                column_store_path(file_path), settings_attrs(settings_data))
+        except Exception as e:
+            print(f"バイナリデータの書き込みセッションの開始中にエラーが発生しました: {e}")
+
+    def append_data_to_file(self, data_container: Data_Container):
+        """
+        書き込みセッションに、まだ書き込まれていない行だけを追記する。
+
+        Args:
+            data_container (Data_Container): 測定データを保持するコンテナ
+        """
+        if self.data_stream is not None:
+            try:
+                self.data_stream.write_rows(data_container)
+            except Exception as e:
+                print(f"テキストデータの追記中にエラーが発生しました: {e}")
+        if self.column_stream is not None:
+            try:
+                self.column_stream.write_rows(data_container)
+            except Exception as e:
+                print(f"バイナリデータの追記中にエラーが発生しました: {e}")
+
+    def close_data_stream(self):
+        """
+        書き込みセッションを閉じる。開いていない場合は何もしない。
+        """
+        if self.column_stream is not None:
+            try:
+                self.column_stream.close()
+            except Exception as e:
+                print(f"バイナリデータの書き込みセッションの終了中にエラーが発生しました: {e}")
+            finally:
+                self.column_stream = None
+        if self.data_stream is None:
+            return
+        try:
+            self.data_stream.close()
+            print(f"テキストデータを保存しました: {self.data_stream.file_path}")
+        except Exception as e:
+            print(f"書き込みセッションの終了中にエラーが発生しました: {e}")
+        finally:
+            self.data_stream = None
+
+    def save_data_columns(self, filename: str, data_container: Data_Container,
+                          settings_data=None):
+        """
+        現在の測定フォルダに、data_containerの全データを列ごとのバイナリファイルとして
+        保存し直す (テキストファイル名filenameに対応するフォルダに書き込む)。
+
+        Args:
+            filename (str): 対応するテキストファイル名 (例: "output.txt")
+            data_container (Data_Container): 測定データを保持するコンテナ
+            settings_data: 属性として保存する設定 (Setting_Parmsなど)
+        """
+        path = self.get_current_save_path()
+        if not path or len(data_container) == 0:
+            return
+        writer = None
+        try:
+            writer = ColumnStoreWriter(
+                column_store_path(os.path.join(path, filename)),
+                settings_attrs(settings_data))
+            writer.write_rows(data_container)
+        except Exception as e:
+            print(f"バイナリデータの保存中にエラーが発生しました: {e}")
+        finally:
+            if writer is not None:
+                writer.close()
+
     def save_matplotlib_figure(self, filename: str, fig):
         """
         現在の測定フォルダにmatplotlibのグラフを画像として保存する。
@@ -117,3 +267,70 @@ class SaveManager:
             print(f"グラフ画像を保存しました: {file_path}")
         except Exception as e:
             print(f"グラフ画像の保存中にエラーが発生しました: {e}")
+
+
+class DataStreamWriter:
+    """
+    Data_Containerの行をタブ区切りテキストへ追記していく書き込みセッション。
+    ヘッダーは最初の書き込み時に一度だけ出力し、以降は未書き込みの行だけを追記する。
+    ファイルの形式は SaveManager.save_data_to_file と同一。
+    """
+
+    def __init__(self,
+                 file_path: str,
+                 flush_interval: int = 1,
+                 use_fsync: bool = False):
+        """
+        Args:
+            file_path (str): 書き込み先のファイルパス
+            flush_interval (int): 何行ごとにflushするか (1なら毎行)
+            use_fsync (bool): flush時にos.fsyncでディスクまで書き出すか
+        """
+        self.file_path = file_path
+        self.flush_interval = max(1, int(flush_interval))
+        self.use_fsync = use_fsync
+        self.headers: List[str] = []
+        self.rows_written = 0
+        self._rows_since_flush = 0
+        self._file = open(file_path, 'w')
+
+    def write_rows(self, data_container: Data_Container):
+        """
+        data_containerのうち、まだ書き込んでいない末尾の行だけを追記する。
+        """
+        size = len(data_container)
+        if size <= self.rows_written:
+            return
+
+        if not self.headers:
+            # 最初のデータポイントを基に、保存する列（NaNでない値を持つ列）を決定
+            self.headers = data_container.present_fields()
+            self._file.write("\t".join(self.headers) + "\n")
+
+        # 未書き込み部分の列ビューをPythonのfloatに変換してから整形する
+        columns = [
+            data_container.column(header)[self.rows_written:size].tolist()
+            for header in self.headers
+        ]
+        for row in zip(*columns):
+            self._file.write("\t".join(
+                str(value) if value == value else "" for value in row) + "\n")
+        self._rows_since_flush += size - self.rows_written
+        self.rows_written = size
+
+        if self._rows_since_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """バッファの内容をファイルへ書き出す。"""
+        self._file.flush()
+        if self.use_fsync:
+            os.fsync(self._file.fileno())
+        self._rows_since_flush = 0
+
+    def close(self):
+        """残りを書き出してファイルを閉じる。"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
@@ -0,0 +1,227 @@
+from dataclasses import dataclass
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+#波長グリッドを丸める桁数 (nm)。刻みの積み上げによる誤差を取り除く
+GRID_DECIMALS = 9
+#移動時間の見積もりに使うCT-25の波長送り速度(nm/s)と1回ごとの固定時間(s)
+DEFAULT_SCAN_SPEED = 20.0
+DEFAULT_MOVE_OVERHEAD = 0.05
+
+
+@dataclass
+class ScanSegment:
+    """測定区間1つ分の情報。"""
+    index: int  #区間番号
+    start: float  #開始波長(nm)
+    end: float  #終了波長(nm)
+    step: float  #測定間隔(nm)
+    first: int  #グリッド上の最初の点の番号
+    count: int  #区間に含まれる点数
+    filter: str = ""  #フィルター
+    diffraction: str = ""  #回折格子
+
+
+def segment_grid(start: float, end: float, step: float) -> np.ndarray:
+    """
+    startからendの手前までstep刻みの波長を返す (endは含まない)。
+    各点はstart + i * stepで直接計算するため、刻みを足し合わせた誤差は溜まらない。
+
+    Raises:
+        ValueError: stepが正でない場合
+    """
+    if step <= 0:
+        raise ValueError(f"測定間隔は正の値にしてください: {step}")
+    #(end - start) / stepが浮動小数点誤差で整数をわずかに超えても、点を増やさない
+    count = max(0, int(np.ceil(round((end - start) / step, GRID_DECIMALS))))
+    return np.round(start + np.arange(count) * step, GRID_DECIMALS)
+
+
+class ScanPlan:
+    """
+    測定波長と測定間隔から作る、区間ごとの波長グリッド。
+    全区間をつないだ1次元配列wavelengthsと、各点が属する区間の番号
+    segment_indexを持ち、区間ごとの情報はsegmentsに保持する。
+    測定順(掃引回数・往復・一方向からの送り)はorderで決める。
+    """
+
+    def __init__(self, wavelengths: np.ndarray, segment_index: np.ndarray,
+                 segments: List[ScanSegment]):
+        self.wavelengths = wavelengths
+        self.segment_index = segment_index
+        self.segments = segments
+
+    @classmethod
+    def from_ranges(cls,
+                    wavelengths: Sequence[float],
+                    sections: Sequence[float],
+                    filters: Sequence[str] = (),
+                    diffractions: Sequence[str] = ()) -> "ScanPlan":
+        """
+        測定波長(区間の境界)と区間ごとの測定間隔からグリッドを作る。
+        各区間は終了波長を含まず、最後の区間だけ最後の測定波長を含む。
+
+        Args:
+            wavelengths: 測定波長の配列(例:[100,200,400])
+            sections: 区間ごとの測定間隔の配列(例:[1,3])
+            filters, diffractions: 区間ごとのフィルター・回折格子 (省略可)
+        """
+        grids = []
+        segments = []
+        first = 0
+        for i in range(len(wavelengths) - 1):
+            start, end = float(wavelengths[i]), float(wavelengths[i + 1])
+            grid = segment_grid(start, end, float(sections[i]))
+            if i == len(wavelengths) - 2:
+                grid = np.append(grid, round(end, GRID_DECIMALS))
+            segments.append(
+                ScanSegment(index=i,
+                            start=start,
+                            end=end,
+                            step=float(sections[i]),
+                            first=first,
+                            count=len(grid),
+                            filter=filters[i] if i < len(filters) else "",
+                            diffraction=diffractions[i]
+                            if i < len(diffractions) else ""))
+            grids.append(grid)
+            first += len(grid)
+        if not grids:
+            return cls(np.array([]), np.array([], dtype=int), [])
+        return cls(
+            np.concatenate(grids),
+            np.repeat(np.arange(len(segments)),
+                      [segment.count for segment in segments]), segments)
+
+    def __len__(self) -> int:
+        return len(self.wavelengths)
+
+    @property
+    def lower(self) -> Optional[float]:
+        """グリッドの最小波長 (空の場合はNone)。"""
+        return float(self.wavelengths.min()) if len(self) else None
+
+    @property
+    def upper(self) -> Optional[float]:
+        """グリッドの最大波長 (空の場合はNone)。"""
+        return float(self.wavelengths.max()) if len(self) else None
+
+    def segment_lists(self) -> List[List[float]]:
+        """区間ごとの波長のリスト (従来のMsrData1と同じ形式) を返す。"""
+        return [
+            self.wavelengths[s.first:s.first + s.count].tolist()
+            for s in self.segments
+        ]
+
+    def order(self,
+              sweeps: int = 1,
+              serpentine: bool = False,
+              approach: Optional[str] = None,
+              backlash: float = 0.0,
+              start_position: Optional[float] = None) -> "ScanOrder":
+        """
+        グリッドを測定する順序を作る。
+
+        Args:
+            sweeps (int): 掃引回数
+            serpentine (bool): Trueなら奇数回目の掃引を逆向きに行い、
+                掃引の間に開始波長へ戻る移動をなくす
+            approach (str): "up"または"down"を指定すると、各点にその向きから
+                到着するように、逆向きの移動の前にbacklashだけ手前へ寄せる
+            backlash (float): 手前へ寄せる量(nm)。0ならapproachは無視する
+            start_position (float): 測定開始時の分光器の波長 (不明ならNone)
+        """
+        base = np.arange(len(self))
+        indices = [
+            base[::-1] if serpentine and sweep % 2 else base
+            for sweep in range(max(1, int(sweeps)))
+        ]
+        grid_index = np.concatenate(indices) if indices else base
+        sweep = np.repeat(np.arange(len(indices)), len(self))
+        wavelengths = self.wavelengths[grid_index]
+
+        premove = np.full(len(wavelengths), np.nan)
+        if approach in ("up", "down") and backlash > 0 and len(wavelengths):
+            previous = np.concatenate(
+                ([np.nan if start_position is None else start_position],
+                 wavelengths[:-1]))
+            if approach == "up":
+                #下から到着できない点(前の位置が上、または不明)は下に寄せてから送る
+                needed = ~(previous <= wavelengths)
+                premove[needed] = wavelengths[needed] - backlash
+            else:
+                needed = ~(previous >= wavelengths)
+                premove[needed] = wavelengths[needed] + backlash
+        return ScanOrder(wavelengths=wavelengths,
+                         grid_index=grid_index,
+                         sweep=sweep,
+                         premove=premove,
+                         start_position=start_position)
+
+
+class ScanTarget(NamedTuple):
+    """次に測定する1点。"""
+    wavelength: float  #測定波長
+    premove: Optional[float]  #測定前に寄せる波長 (寄せない場合はNone)
+    grid_index: int  #ScanPlan.wavelengths上の番号
+    sweep: int  #何回目の掃引か (0始まり)
+
+
+@dataclass
+class ScanOrder:
+    """
+    測定順に並べた波長と、各点の前に行う寄せ(バックラッシ補正)の移動。
+    premoveがNaNでない点は、その波長へ移動してから測定波長へ送る。
+    """
+    wavelengths: np.ndarray  #測定順の波長
+    grid_index: np.ndarray  #ScanPlan.wavelengths上の番号
+    sweep: np.ndarray  #何回目の掃引か (0始まり)
+    premove: np.ndarray  #測定前に寄せる波長 (NaNなら寄せない)
+    start_position: Optional[float] = None  #測定開始時の分光器の波長
+
+    def __len__(self) -> int:
+        return len(self.wavelengths)
+
+    def moves(self) -> np.ndarray:
+        """寄せを含めた、分光器の移動先の列を返す。"""
+        targets = np.column_stack((self.premove, self.wavelengths)).ravel()
+        return targets[~np.isnan(targets)]
+
+    def move_distances(self) -> np.ndarray:
+        """移動ごとの距離(nm)を返す。開始位置が不明な場合、最初の移動は含めない。"""
+        moves = self.moves()
+        if self.start_position is not None:
+            moves = np.concatenate(([self.start_position], moves))
+        return np.abs(np.diff(moves))
+
+    def point_distances(self) -> np.ndarray:
+        """
+        測定点ごとに、前の測定点から寄せを含めて移動する距離(nm)を返す。
+        開始位置が不明な場合、最初の点は寄せの分だけを数える。
+        """
+        previous = np.concatenate(
+            ([np.nan if self.start_position is None else self.start_position],
+             self.wavelengths[:-1]))
+        via = np.where(np.isnan(self.premove), self.wavelengths, self.premove)
+        return (np.nan_to_num(np.abs(via - previous)) +
+                np.abs(self.wavelengths - via))
+
+    def travel_distance(self) -> float:
+        """移動距離の合計(nm)を返す。"""
+        return float(self.move_distances().sum())
+
+    def travel_time(self,
+                    scan_speed: float = DEFAULT_SCAN_SPEED,
+                    move_overhead: float = DEFAULT_MOVE_OVERHEAD) -> float:
+        """
+        移動時間の合計(s)の見積もりを返す。
+
+        Args:
+            scan_speed (float): 波長送り速度(nm/s)
+            move_overhead (float): 移動1回ごとの加減速などの固定時間(s)
+        """
+        distances = self.move_distances()
+        distances = distances[distances > 0]
+        return float(len(distances) * move_overhead +
+                     distances.sum() / scan_speed)
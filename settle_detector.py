@@ -0,0 +1,64 @@
+from typing import List
+
+import numpy as np
+
+
+class SettleDetector:
+    """
+    待機中に読み取った値から、信号が落ち着いたかを判定するクラス。
+    直近の時間窓と、その1つ前の時間窓の平均値を比べ、その差が
+    2つの平均値の標準誤差から求めた許容範囲(tolerance倍)に入ったら落ち着いたとみなす。
+    """
+
+    def __init__(self,
+                 start: float,
+                 window: float,
+                 tolerance: float = 2.0,
+                 min_samples: int = 3):
+        """
+        Args:
+            start (float): 待機を開始した時刻(time.perf_counter)。これより前の読み値は使わない
+            window (float): 比べる時間窓の長さ(s)
+            tolerance (float): 平均値の差を標準誤差の何倍まで許すか
+            min_samples (int): 1つの時間窓に必要な読み値の数
+        """
+        self.start = start
+        self.window = window
+        self.tolerance = tolerance
+        self.min_samples = min_samples
+        self._values: List[float] = []
+        self._times: List[float] = []
+
+    def add(self, values, timestamps):
+        """読み値とその時刻(time.perf_counter)を追加する。"""
+        for value, timestamp in zip(np.asarray(values).tolist(),
+                                    np.asarray(timestamps).tolist()):
+            if timestamp >= self.start:
+                self._values.append(value)
+                self._times.append(timestamp)
+        #判定に使う2つの時間窓より古い読み値は捨てる
+        if self._times:
+            horizon = self._times[-1] - 2 * self.window
+            drop = 0
+            while drop < len(self._times) and self._times[drop] <= horizon:
+                drop += 1
+            del self._values[:drop]
+            del self._times[:drop]
+
+    def settled(self) -> bool:
+        """信号が落ち着いたと判定できる場合はTrueを返す。"""
+        if not self._times:
+            return False
+        times = np.array(self._times)
+        values = np.array(self._values)
+        boundary = times[-1] - self.window
+        previous = values[times <= boundary]
+        latest = values[times > boundary]
+        if len(previous) < self.min_samples or len(latest) < self.min_samples:
+            return False
+        standard_error = np.sqrt(
+            previous.var(ddof=1) / len(previous) +
+            latest.var(ddof=1) / len(latest))
+        return bool(
+            abs(latest.mean() - previous.mean()) <= self.tolerance *
+            standard_error)
@@ -0,0 +1,190 @@
+"""
+アプリケーション起動時間のプロファイラ。
+
+モジュールの読み込み(import)と、起動処理の各段階 (画面の構築・グラフの準備・
+機器の接続など) にかかった時間を記録する。通常の起動では無効で、何も記録しない。
+
+使い方:
+    python startup_profile.py
+    python startup_profile.py --output startup_profile.json
+
+main_controller.pyと同じようにアプリケーションを起動し、機器の接続が完了した
+時点でモジュールごとの読み込み時間と各段階の時間をコンソールとログに表示する。
+"""
+import argparse
+import builtins
+import json
+import runpy
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+
+class StartupProfiler:
+    """
+    起動時間の内訳を記録するクラス。
+    importの時間は組み込みの__import__を差し替えて、最も外側で読み込まれた
+    モジュール(パッケージ)ごとに、そのモジュールが読み込む依存先も含めた時間を集計する。
+    """
+
+    def __init__(self, enabled: bool = False):
+        """
+        Args:
+            enabled (bool): Falseの場合は何も記録しない
+        """
+        self.enabled = enabled
+        self.output_path = None
+        self._origin = time.perf_counter()
+        # モジュール名 -> (読み込み時間(s), 読み込んだスレッド名)
+        self._imports: Dict[str, Tuple[float, str]] = {}
+        # (段階名, 開始(s), 所要時間(s), スレッド名) の記録
+        self._spans: List[Tuple[str, float, float, str]] = []
+        # (目印名, 起動からの時間(s)) の記録
+        self._marks: List[Tuple[str, float]] = []
+        self._local = threading.local()
+        self._original_import = None
+        self._reported = False
+
+    def enable(self):
+        """記録を開始し、この時点を起動時刻とする。"""
+        self.enabled = True
+        self._origin = time.perf_counter()
+
+    def install_import_hook(self):
+        """__import__を差し替えて、モジュールの読み込み時間の記録を始める。"""
+        if self._original_import is not None:
+            return
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall_import_hook(self):
+        """__import__を元に戻す。"""
+        if self._original_import is None:
+            return
+        builtins.__import__ = self._original_import
+        self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(),
+                      level=0):
+        original = self._original_import
+        # 読み込み済みのモジュールと相対importは計測しない
+        if level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                top = name.partition(".")[0]
+                elapsed = time.perf_counter() - start
+                previous, _ = self._imports.get(top, (0.0, ""))
+                self._imports[top] = (previous + elapsed,
+                                      threading.current_thread().name)
+
+    @contextmanager
+    def span(self, name: str):
+        """withで囲んだ起動処理の段階の所要時間をnameとして記録する。"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._spans.append((name, start - self._origin,
+                                time.perf_counter() - start,
+                                threading.current_thread().name))
+
+    def mark(self, name: str):
+        """起動からの経過時間を目印nameとして記録する (ウィンドウ表示など)。"""
+        if self.enabled:
+            self._marks.append((name, time.perf_counter() - self._origin))
+
+    def to_dict(self) -> dict:
+        """記録した内容を辞書として返す (時間はms)。"""
+        return {
+            "imports": [{
+                "module": module,
+                "ms": seconds * 1e3,
+                "thread": thread
+            } for module, (seconds, thread) in sorted(
+                self._imports.items(), key=lambda item: -item[1][0])],
+            "spans": [{
+                "name": name,
+                "start_ms": start * 1e3,
+                "ms": duration * 1e3,
+                "thread": thread
+            } for name, start, duration, thread in self._spans],
+            "marks": [{
+                "name": name,
+                "ms": at * 1e3
+            } for name, at in self._marks]
+        }
+
+    def report(self, top: int = 15) -> str:
+        """読み込み時間の長いモジュールと各段階の時間を表にした文字列を返す。"""
+        data = self.to_dict()
+        lines = ["--- 起動時間のプロファイル ---", "[import] (依存先を含む)"]
+        for entry in data["imports"][:top]:
+            lines.append(f"  {entry['module']:<24} {entry['ms']:>9.1f} ms"
+                         f"  ({entry['thread']})")
+        lines.append("[初期化]")
+        for entry in data["spans"]:
+            lines.append(f"  {entry['name']:<24} {entry['ms']:>9.1f} ms"
+                         f"  (開始 {entry['start_ms']:.1f} ms, {entry['thread']})")
+        lines.append("[目印] (起動からの時間)")
+        for entry in data["marks"]:
+            lines.append(f"  {entry['name']:<24} {entry['ms']:>9.1f} ms")
+        return "\n".join(lines)
+
+    def finish(self, logger=None):
+        """
+        起動処理の完了時に一度だけ呼び出し、結果をコンソール(とロガー)に表示する。
+        output_pathが設定されていればJSONファイルにも書き出す。
+        """
+        if not self.enabled or self._reported:
+            return
+        self._reported = True
+        self.mark("ready")
+        report = self.report()
+        print(report, flush=True)
+        if logger is not None:
+            logger.add_log(report, level="INFO")
+        if self.output_path:
+            try:
+                with open(self.output_path, "w", encoding="utf-8") as f:
+                    json.dump(self.to_dict(), f, indent=4, ensure_ascii=False)
+            except OSError as e:
+                print(f"起動時間のプロファイルを保存できませんでした: {e}")
+
+
+#アプリケーション全体で共有するプロファイラ (通常は無効)
+profiler = StartupProfiler()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="起動時間の内訳を記録しながらアプリケーションを起動する")
+    parser.add_argument("--output",
+                        default=None,
+                        help="結果を書き出すJSONファイル")
+    args = parser.parse_args(argv)
+
+    #python startup_profile.pyで実行した場合も、main_controllerと同じインスタンスを使う
+    from startup_profile import profiler
+    profiler.enable()
+    profiler.output_path = args.output
+    profiler.install_import_hook()
+    try:
+        runpy.run_module("main_controller", run_name="__main__")
+    finally:
+        profiler.uninstall_import_hook()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class SweepAverager:
+    """
+    同じ波長グリッドを繰り返し掃引したときの、波長ごとの平均値と分散を
+    Welfordの方法で逐次計算するクラス。
+    生データを保持せずに、各点の測定値を受け取るたびに平均値と偏差平方和を更新する。
+    測定スレッドが更新し、メインスレッドがグラフ描画のために読み出すため、
+    更新と読み出しはロックで保護する。
+    """
+
+    #標準誤差の見積もりが安定するよう、早期終了の判定に必要な最小の掃引回数
+    MIN_SWEEPS = 3
+
+    def __init__(self, wavelengths: np.ndarray):
+        """
+        Args:
+            wavelengths (np.ndarray): 波長グリッド (ScanPlan.wavelengths)
+        """
+        self.wavelengths = np.asarray(wavelengths, dtype=float)
+        size = len(self.wavelengths)
+        self.count = np.zeros(size, dtype=int)
+        self.mean = np.zeros(size)
+        #平均値からの偏差の2乗和
+        self.m2 = np.zeros(size)
+        #最後まで終わった掃引の回数
+        self.sweeps_completed = 0
+        self._lock = threading.Lock()
+
+    def add(self, grid_index: int, value: float):
+        """グリッド上の番号grid_indexの点の測定値を1つ加える。"""
+        if value != value:
+            return
+        with self._lock:
+            count = self.count[grid_index] + 1
+            delta = value - self.mean[grid_index]
+            mean = self.mean[grid_index] + delta / count
+            self.m2[grid_index] += delta * (value - mean)
+            self.mean[grid_index] = mean
+            self.count[grid_index] = count
+
+    def end_sweep(self):
+        """1回分の掃引が終わったことを記録する。"""
+        self.sweeps_completed += 1
+
+    def stderr(self) -> np.ndarray:
+        """各点の平均値の標準誤差を返す (測定値が2つ未満の点はNaN)。"""
+        with self._lock:
+            count = self.count.copy()
+            m2 = self.m2.copy()
+        result = np.full(len(count), np.nan)
+        valid = count >= 2
+        result[valid] = np.sqrt(m2[valid] / (count[valid] - 1) /
+                                count[valid])
+        return result
+
+    def max_stderr(self) -> Optional[float]:
+        """スペクトル全体での標準誤差の最大値を返す。まだ計算できない場合はNone。"""
+        stderr = self.stderr()
+        if len(stderr) == 0 or np.isnan(stderr).any():
+            return None
+        return float(stderr.max())
+
+    def converged(self, target: float) -> bool:
+        """
+        MIN_SWEEPS回以上掃引し、すべての点の標準誤差がtarget以下になった場合はTrue。
+        """
+        if target <= 0 or self.sweeps_completed < self.MIN_SWEEPS:
+            return False
+        worst = self.max_stderr()
+        return worst is not None and worst <= target
+
+    def plot_data(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        測定済みの点の (波長, 平均値, 標準誤差) を返す。
+        測定値が1つだけの点の標準誤差は0とする。
+        """
+        with self._lock:
+            measured = self.count > 0
+            mean = self.mean[measured].copy()
+        stderr = self.stderr()[measured]
+        return (self.wavelengths[measured], mean,
+                np.nan_to_num(stderr, nan=0.0))
+
+    def to_columns(self, value_key: str) -> Dict[str, np.ndarray]:
+        """
+        平均スペクトルを、列名をキーとした配列の辞書として返す。
+
+        Args:
+            value_key (str): 平均値の列名 (例: "dmm_value")
+        """
+        with self._lock:
+            measured = self.count > 0
+            mean = self.mean[measured].copy()
+            count = self.count[measured].copy()
+        return {
+            "wavelength": self.wavelengths[measured],
+            value_key: mean,
+            "stderr": self.stderr()[measured],
+            "count": count
+        }
@@ -1,19 +1,56 @@
 import customtkinter as ctk
+import tkinter.font as tkfont
+from typing import Optional
 
 
 class DataTableManager:
     """
     GUIのデータタブへのテーブル表示を専門に担当するクラス。
+    行データはData_Containerの列配列から直接読み出し、
+    テキストボックスには画面に見えている行だけを描画する。
+    描画はTkのメインループ上で一定間隔ごとに行うため、
+    行の追加コストはテーブルの行数に依存しない。
     """
 
-    def __init__(self, textbox: ctk.CTkTextbox):
+    def __init__(self,
+                 textbox: ctk.CTkTextbox,
+                 scrollbar: Optional[ctk.CTkScrollbar] = None,
+                 refresh_interval_ms: int = 200):
+        """
+        Args:
+            textbox (ctk.CTkTextbox): テーブルを表示するテキストボックス
+            scrollbar (ctk.CTkScrollbar): テーブル全体をスクロールするスクロールバー
+            refresh_interval_ms (int): 表示を更新する間隔 (ms)
+        """
         self.textbox = textbox
+        self.scrollbar = scrollbar
+        self.refresh_interval_ms = refresh_interval_ms
         self.row_count = 0
         self.column_headers = []  # ヘッダーを保持する変数を追加
+        # 行データの取得元
+        self._data_container = None
+        self._x_key = None
+        self._y_key = None
+        # 表示中の先頭行 (0始まり) と、最新行に追従するかどうか
+        self._first_row = 0
+        self._follow_tail = True
+        # 表示内容が変わったときだけ再描画するための状態
+        self._version = 0
+        self._rendered_state = None
+        self._line_height = None
+
+        if self.scrollbar is not None:
+            self.scrollbar.configure(command=self._on_scrollbar)
+        self.textbox.bind("<MouseWheel>", self._on_mousewheel)
+        self.textbox.bind("<Button-4>", self._on_mousewheel)
+        self.textbox.bind("<Button-5>", self._on_mousewheel)
+        # メインループ上での定期的な描画を開始
+        self.textbox.after(self.refresh_interval_ms, self._refresh)
 
     def clear_and_set_header(self, *headers: str):
         """
         テーブルをクリアし、指定されたヘッダーを設定する。
+        どのスレッドからでも呼び出せる (描画はメインループ上で行う)。
 
         Args:
             *headers (str): 可変長の引数として列のヘッダー名を受け取る。
@@ -21,34 +58,124 @@ class DataTableManager:
         """
         self.row_count = 0
         self.column_headers = headers
+        self._data_container = None
+        self._first_row = 0
+        self._follow_tail = True
+        self._version += 1
 
-        #【変更】受け取ったヘッダーで見出しを生成
-        header_line = f"{headers[0]:>4} | {headers[1]:<15} | {headers[2]:<20}\n"
-        separator = "-" * (len(header_line) + 5) + "\n"
-
-        try:
-            self.textbox.configure(state="normal")
-            self.textbox.delete("1.0", "end")
-            self.textbox.insert("1.0", header_line + separator)  # ヘッダーと区切り線を挿入
-            self.textbox.configure(state="disabled")
-        except Exception as e:
-            print(f"データテーブルのヘッダー設定中にエラーが発生しました: {e}")
-
-    def add_row(self, *rowData):
+    def set_source(self, data_container, x_key: str, y_key: str):
         """
-        新しいデータ行をテーブルの末尾に追加する。
+        テーブルに表示する行データの取得元を設定する。
 
         Args:
-            *rowData: 可変長の引数として行データを受け取る。
+            data_container (Data_Container): 測定データを保持するコンテナ
+            x_key (str): 2列目に表示する列名 (例: "wavelength")
+            y_key (str): 3列目に表示する列名 (例: "dmm_value")
+        """
+        self._data_container = data_container
+        self._x_key = x_key
+        self._y_key = y_key
+        self._version += 1
+
+    def jump_to_row(self, row: int):
         """
-        self.row_count += 1
-        # フォーマットを統一
-        new_row = f"{self.row_count:>4} | {rowData[0]:<15.2f} | {rowData[1]:<20.6f}\n"
+        指定した行番号 (1始まり) が先頭に来るように表示する。
+        """
+        self._first_row = max(0, int(row) - 1)
+        self._follow_tail = False
+        self._render()
+
+    def follow_tail(self):
+        """最新の行に追従する表示に戻す。"""
+        self._follow_tail = True
+        self._render()
+
+    def _visible_rows(self) -> int:
+        """テキストボックスの高さに収まるデータ行数を返す (ヘッダー2行を除く)。"""
+        if self._line_height is None:
+            try:
+                font = tkfont.Font(font=self.textbox._textbox.cget("font"))
+                self._line_height = max(1, font.metrics("linespace"))
+            except Exception:
+                self._line_height = 16
+        height = self.textbox.winfo_height()
+        return max(1, height // self._line_height - 2)
+
+    def _refresh(self):
+        """一定間隔で呼ばれ、表示内容が変わっていれば再描画する (メインスレッド専用)。"""
+        try:
+            self._render()
+        finally:
+            self.textbox.after(self.refresh_interval_ms, self._refresh)
+
+    def _render(self):
+        """見えている範囲の行だけをテキストボックスに描画する。"""
+        container = self._data_container
+        self.row_count = len(container) if container is not None else 0
+        visible = self._visible_rows()
+        last_first = max(0, self.row_count - visible)
+        if self._follow_tail or self._first_row >= last_first:
+            self._first_row = last_first
+        first = self._first_row
+        end = min(first + visible, self.row_count)
+
+        state = (self._version, first, end, self.row_count)
+        if state == self._rendered_state:
+            return
+        self._rendered_state = state
+
+        lines = []
+        if self.column_headers:
+            headers = self.column_headers
+            #受け取ったヘッダーで見出しを生成
+            header_line = f"{headers[0]:>4} | {headers[1]:<15} | {headers[2]:<20}\n"
+            separator = "-" * (len(header_line) + 5) + "\n"
+            lines.append(header_line + separator)
+        if end > first:
+            x_values = container.column(self._x_key)[first:end].tolist()
+            y_values = container.column(self._y_key)[first:end].tolist()
+            for row, (x, y) in enumerate(zip(x_values, y_values),
+                                         start=first + 1):
+                # フォーマットを統一
+                lines.append(f"{row:>4} | {x:<15.2f} | {y:<20.6f}\n")
 
         try:
             self.textbox.configure(state="normal")
-            self.textbox.insert("end", new_row)
-            self.textbox.see("end")
+            self.textbox.delete("1.0", "end")
+            self.textbox.insert("1.0", "".join(lines))
             self.textbox.configure(state="disabled")
         except Exception as e:
-            print(f"データテーブルへの行追加中にエラーが発生しました: {e}")
+            print(f"データテーブルの描画中にエラーが発生しました: {e}")
+
+        if self.scrollbar is not None:
+            if self.row_count:
+                self.scrollbar.set(first / self.row_count,
+                                   end / self.row_count)
+            else:
+                self.scrollbar.set(0.0, 1.0)
+
+    def _scroll_to(self, first_row: int):
+        """先頭行を変更して再描画する。末尾まで到達したら最新行への追従に戻す。"""
+        last_first = max(0, self.row_count - self._visible_rows())
+        self._first_row = min(max(0, first_row), last_first)
+        self._follow_tail = self._first_row >= last_first
+        self._render()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        """スクロールバー操作のコールバック。"""
+        if action == "moveto":
+            self._scroll_to(int(float(value) * self.row_count))
+        elif action == "scroll":
+            step = self._visible_rows() if unit == "pages" else 1
+            self._scroll_to(self._first_row + int(value) * step)
+
+    def _on_mousewheel(self, event):
+        """マウスホイールでテーブル全体をスクロールする。"""
+        if event.num == 4:
+            delta = -3
+        elif event.num == 5:
+            delta = 3
+        else:
+            delta = -3 if event.delta > 0 else 3
+        self._scroll_to(self._first_row + delta)
+        return "break"
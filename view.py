@@ -1,7 +1,7 @@
+import os
 import customtkinter
 from tkinter import messagebox
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from plot_manager import PlotManager
+from measurement_queue import JOB_PENDING, JOB_RUNNING
 
 FONT_TYPE = "meiryo"
 
@@ -78,6 +78,118 @@ class NameAndNotesDialog(customtkinter.CTkToplevel):
         return self.result
 
 
+class QueueWindow(customtkinter.CTkToplevel):
+    """
+    測定キューのジョブの一覧と状態を表示するウィンドウ。
+    測定中も操作できるよう、モーダルにはしない。
+    ボタンのコマンドとスキップ時の処理(on_skip)はControllerが設定する。
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+
+        self.title("測定キュー")
+        self.geometry("560x360")
+        self.fonts = (FONT_TYPE, 12)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        #スキップボタンが押されたときに、ジョブの番号を渡して呼び出す処理
+        self.on_skip = None
+        #ジョブごとの (状態ラベル, スキップボタン)
+        self.rows = []
+
+        # --- ジョブの一覧 ---
+        self.job_frame = customtkinter.CTkScrollableFrame(self)
+        self.job_frame.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="nsew")
+        self.job_frame.grid_columnconfigure(1, weight=1)
+
+        # --- ボタンフレーム ---
+        self.button_frame = customtkinter.CTkFrame(self,
+                                                   fg_color="transparent")
+        self.button_frame.grid(row=1, column=0, padx=10, pady=(5, 10), sticky="")
+        self.add_button = customtkinter.CTkButton(self.button_frame,
+                                                  text="追加",
+                                                  font=self.fonts,
+                                                  width=90)
+        self.add_button.pack(side="left", padx=(0, 5))
+        self.load_button = customtkinter.CTkButton(self.button_frame,
+                                                   text="キュー読込",
+                                                   font=self.fonts,
+                                                   width=90)
+        self.load_button.pack(side="left", padx=5)
+        self.start_button = customtkinter.CTkButton(self.button_frame,
+                                                    text="開始",
+                                                    font=self.fonts,
+                                                    width=90,
+                                                    fg_color="#34C491")
+        self.start_button.pack(side="left", padx=5)
+        self.abort_button = customtkinter.CTkButton(self.button_frame,
+                                                    text="全中止",
+                                                    font=self.fonts,
+                                                    width=90,
+                                                    fg_color="#FF6347")
+        self.abort_button.pack(side="left", padx=(5, 0))
+
+    def set_jobs(self, jobs, running: bool):
+        """
+        ジョブの一覧を作り直す (ジョブを追加・読み込んだとき)。
+
+        Args:
+            jobs (List[QueueJob]): 表示するジョブ
+            running (bool): キューの測定中か
+        """
+        for widget in self.job_frame.winfo_children():
+            widget.destroy()
+        self.rows = []
+        for index, job in enumerate(jobs):
+            name_label = customtkinter.CTkLabel(self.job_frame,
+                                                text=f"{index + 1}. {job.name}",
+                                                font=self.fonts,
+                                                anchor="w")
+            name_label.grid(row=index, column=0, padx=(5, 10), sticky="w")
+            file_label = customtkinter.CTkLabel(
+                self.job_frame,
+                text=os.path.basename(job.settings_path),
+                font=self.fonts,
+                anchor="w")
+            file_label.grid(row=index, column=1, padx=(0, 10), sticky="we")
+            status_label = customtkinter.CTkLabel(self.job_frame,
+                                                  text="",
+                                                  font=self.fonts,
+                                                  width=60)
+            status_label.grid(row=index, column=2, padx=(0, 10))
+            skip_button = customtkinter.CTkButton(
+                self.job_frame,
+                text="スキップ",
+                font=self.fonts,
+                width=70,
+                height=24,
+                command=lambda index=index: self._skip(index))
+            skip_button.grid(row=index, column=3, padx=(0, 5), pady=2)
+            self.rows.append((status_label, skip_button))
+        self.update_status(jobs, running)
+
+    def update_status(self, jobs, running: bool):
+        """ジョブの状態の表示とボタンの有効・無効を更新する。"""
+        for job, (status_label, skip_button) in zip(jobs, self.rows):
+            text = job.status
+            if job.message:
+                text = f"{job.status}: {job.message}"
+            status_label.configure(text=text)
+            can_skip = job.status in (JOB_PENDING, JOB_RUNNING) and not job.skip_requested
+            skip_button.configure(state="normal" if can_skip else "disabled")
+        idle_state = "disabled" if running else "normal"
+        self.add_button.configure(state=idle_state)
+        self.load_button.configure(state=idle_state)
+        self.start_button.configure(state=idle_state)
+        self.abort_button.configure(state="normal" if running else "disabled")
+
+    def _skip(self, index: int):
+        if self.on_skip is not None:
+            self.on_skip(index)
+
+
 class View():
 
     def __init__(self, master, controller):
@@ -92,6 +204,8 @@ class View():
 
         #子ウィンドウで入力された波長を保持する
         self.child_wavelength: float = None
+        #測定キューのウィンドウ (開いていなければNone)
+        self.queue_window: QueueWindow = None
 
         #フォームのセットアップをする
         self.setup_form()
@@ -181,7 +295,8 @@ class View():
         """
         終了時のウィジェットを適切にクローズするための処理
         """
-        self.graph_frame.plot_manager.close_plt()  #グラフ領域を終了
+        if self.graph_frame.plot_manager is not None:
+            self.graph_frame.plot_manager.close_plt()  #グラフ領域を終了
         self.master.destroy()  # メインウィンドウを終了
         self.master.quit()
 
@@ -246,23 +361,67 @@ class View():
         dialog = NameAndNotesDialog(self.master)
         return dialog.get_input()
 
+    def open_queue_window(self):
+        """
+        測定キューのウィンドウを開く。すでに開いている場合は前面に出す。
+
+        Returns:
+            QueueWindow: 新しく開いた場合はウィンドウ、すでに開いていた場合はNone
+        """
+        if self.queue_window is not None and self.queue_window.winfo_exists():
+            self.queue_window.lift()
+            self.queue_window.focus_force()
+            return None
+        self.queue_window = QueueWindow(self.master)
+        return self.queue_window
+
 
 #グラフのフレーム
 class Graph_Frame(customtkinter.CTkFrame):
+    """
+    グラフを表示するフレーム。
+    matplotlibの読み込みとキャンバスの作成には時間がかかるため、起動時は
+    プレースホルダーだけを表示し、ウィンドウの表示後にbuild_canvasで作成する。
+    """
 
     def __init__(self, *args, header_name, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.fonts = (FONT_TYPE, 12)
         self.header_name = header_name
-        #グラフ機能のインポート
-        self.plot_manager = PlotManager()
+        #グラフ機能 (build_canvasで作成する)
+        self.plot_manager = None
+        self.canvas = None
+        self.toolbar = None
         #フォームのセットアップをする
         self.setup_form()
 
     def setup_form(self):
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(0, weight=1)
+        #グラフの準備ができるまでのプレースホルダー
+        self.placeholder_label = customtkinter.CTkLabel(self,
+                                                        text="グラフを準備中...",
+                                                        font=self.fonts)
+        self.placeholder_label.grid(row=0,
+                                    column=0,
+                                    padx=10,
+                                    pady=10,
+                                    sticky="nsew")
+
+    def build_canvas(self):
+        """
+        matplotlibを読み込み、グラフのキャンバスとツールバーを作成する。
+        2回目以降の呼び出しでは何もしない。
+        """
+        if self.plot_manager is not None:
+            return
+        from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg,
+                                                       NavigationToolbar2Tk)
+        from plot_manager import PlotManager
+        #グラフ機能のインポート
+        self.plot_manager = PlotManager()
+        self.placeholder_label.grid_forget()
         #グラフの表示（起動時）
         self.canvas = FigureCanvasTkAgg(self.plot_manager.fig, master=self)
         self.canvas.get_tk_widget().grid(row=0,
@@ -638,11 +797,48 @@ class Text_Frame(customtkinter.CTkFrame):
 
         # 「データ」タブの作成
         self.tab_view.add("データ")
+        _data_tab = self.tab_view.tab("データ")
+        _data_tab.grid_columnconfigure(0, weight=1)
+        _data_tab.grid_rowconfigure(0, weight=1)
+        # 表示範囲の行だけを描画するため、テキストボックス自身のスクロールバーは使わない
         self.data_textbox = customtkinter.CTkTextbox(
-            self.tab_view.tab("データ"), font=("Courier", 12),
-            height=_box_height)  # 等幅フォントで見やすくする
-        self.data_textbox.pack(expand=True, fill="both", padx=0, pady=0)
+            _data_tab,
+            font=("Courier", 12),
+            height=_box_height,
+            wrap="none",
+            activate_scrollbars=False)  # 等幅フォントで見やすくする
+        self.data_textbox.grid(row=0, column=0, padx=0, pady=0, sticky="nsew")
         self.data_textbox.configure(state="disabled")
+        self.data_scrollbar = customtkinter.CTkScrollbar(_data_tab,
+                                                         orientation="vertical")
+        self.data_scrollbar.grid(row=0, column=1, padx=0, pady=0, sticky="ns")
+        ##行ジャンプ
+        self.jump_row_frame = customtkinter.CTkFrame(_data_tab,
+                                                     fg_color="transparent")
+        self.jump_row_frame.grid(row=1,
+                                 column=0,
+                                 columnspan=2,
+                                 padx=0,
+                                 pady=(2, 0),
+                                 sticky="e")
+        self.jump_row_entry = customtkinter.CTkEntry(self.jump_row_frame,
+                                                     placeholder_text="行番号",
+                                                     width=80,
+                                                     height=22,
+                                                     font=self.fonts)
+        self.jump_row_entry.grid(row=0, column=0, padx=(0, 4), pady=0)
+        self.jump_row_button = customtkinter.CTkButton(self.jump_row_frame,
+                                                       text="移動",
+                                                       width=50,
+                                                       height=22,
+                                                       font=self.fonts)
+        self.jump_row_button.grid(row=0, column=1, padx=(0, 4), pady=0)
+        self.tail_row_button = customtkinter.CTkButton(self.jump_row_frame,
+                                                       text="最新",
+                                                       width=50,
+                                                       height=22,
+                                                       font=self.fonts)
+        self.tail_row_button.grid(row=0, column=2, padx=0, pady=0)
 
 
 #測定条件入力フレーム
@@ -881,6 +1077,32 @@ class Control_Button_Frame(customtkinter.CTkFrame):
                                       padx=(2, 0),
                                       pady=2,
                                       sticky="e")
+        ###中断した測定を再開するボタンを表示する
+        self.resume_button = customtkinter.CTkButton(
+            self.load_save_setting_button_frame,
+            text="測定再開",
+            font=self.fonts,
+            width=90,
+            height=26,
+            anchor="center")
+        self.resume_button.grid(row=1,
+                                column=0,
+                                padx=(0, 2),
+                                pady=2,
+                                sticky="w")
+        ###測定キューのウィンドウを開くボタンを表示する
+        self.queue_button = customtkinter.CTkButton(
+            self.load_save_setting_button_frame,
+            text="キュー",
+            font=self.fonts,
+            width=90,
+            height=26,
+            anchor="center")
+        self.queue_button.grid(row=1,
+                               column=1,
+                               padx=(2, 0),
+                               pady=2,
+                               sticky="e")
 
         #ボタンフレーム
         button_frame_button_height = 40
@@ -947,3 +1169,20 @@ class Control_Button_Frame(customtkinter.CTkFrame):
                                 padx=(2, 0),
                                 pady=(2, 0),
                                 sticky="se")
+
+        #機器の接続状態
+        self.device_status_label = customtkinter.CTkLabel(
+            self,
+            text="機器: 未接続",
+            font=self.check_GPIB_frame_fonts,
+            anchor="w")
+        self.device_status_label.grid(row=3,
+                                      column=0,
+                                      padx=5,
+                                      pady=(0, 2),
+                                      sticky="we")
+
+    def set_device_status(self, text: str, color: str = "black"):
+        """機器の接続状態の表示を更新する (メインスレッド専用)。"""
+        self.device_status_label.configure(text=f"機器: {text}",
+                                           text_color=color)